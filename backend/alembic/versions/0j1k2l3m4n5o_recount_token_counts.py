@@ -0,0 +1,82 @@
+"""recount_token_counts
+
+Revision ID: 0j1k2l3m4n5o
+Revises: 9i0j1k2l3m4n
+Create Date: 2026-10-17 02:00:00.000000
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+
+from app.core.tokens import count_tokens
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0j1k2l3m4n5o'
+down_revision: Union[str, None] = '9i0j1k2l3m4n'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+BATCH_SIZE = 1000
+
+# Stored counts came from cl100k_base, or from a 4-chars-per-token estimate
+# where that encoding could not be downloaded. Recount everything with the
+# vendored tokenizer of the served model (app/core/tokens.py), which fails
+# rather than estimates. Keyset batches in autocommit, each a short
+# transaction; an interrupted run can simply be rerun.
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    select_batch = sa.text(
+        "SELECT id, chat_id, content, token_count FROM messages "
+        "WHERE CAST(:after AS uuid) IS NULL OR id > CAST(:after AS uuid) ORDER BY id LIMIT :batch"
+    )
+    # chat_id as well, so each row's update is pruned to its partition
+    update_batch = sa.text(
+        "UPDATE messages m SET token_count = v.token_count "
+        "FROM unnest(:ids, :chat_ids, :counts) AS v(id, chat_id, token_count) "
+        "WHERE m.id = v.id AND m.chat_id = v.chat_id"
+    ).bindparams(
+        sa.bindparam('ids', type_=ARRAY(UUID(as_uuid=True))),
+        sa.bindparam('chat_ids', type_=ARRAY(UUID(as_uuid=True))),
+        sa.bindparam('counts', type_=ARRAY(sa.Integer())),
+    )
+    after, seen, changed = None, 0, 0
+    with op.get_context().autocommit_block():
+        while True:
+            rows = conn.execute(select_batch, {'after': after, 'batch': BATCH_SIZE}).fetchall()
+            if not rows:
+                break
+            stale = [(row, count_tokens(row.content)) for row in rows]
+            stale = [(row, count) for row, count in stale if count != row.token_count]
+            if stale:
+                conn.execute(update_batch, {
+                    'ids': [row.id for row, _ in stale],
+                    'chat_ids': [row.chat_id for row, _ in stale],
+                    'counts': [count for _, count in stale],
+                })
+            seen += len(rows)
+            changed += len(stale)
+            after = rows[-1].id
+            if seen % (BATCH_SIZE * 100) == 0:
+                logger.info(f'Recounted {seen} messages ({changed} changed)')
+
+        summaries = conn.execute(sa.text("SELECT id, summary FROM chats WHERE summary IS NOT NULL")).fetchall()
+        for chat in summaries:
+            conn.execute(
+                sa.text("UPDATE chats SET summary_token_count = :count WHERE id = :id"),
+                {'id': chat.id, 'count': count_tokens(chat.summary)},
+            )
+    logger.info(f'Recounted {seen} messages ({changed} changed) and {len(summaries)} chat summaries')
+
+
+def downgrade() -> None:
+    # The counts stay: the old ones were the inexact ones
+    pass
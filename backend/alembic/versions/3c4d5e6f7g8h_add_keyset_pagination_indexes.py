@@ -0,0 +1,63 @@
+"""add_keyset_pagination_indexes
+
+Revision ID: 3c4d5e6f7g8h
+Revises: 2b3c4d5e6f7g
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c4d5e6f7g8h'
+down_revision: Union[str, None] = '2b3c4d5e6f7g'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Composite indexes for keyset pagination on (created_at, id).
+    # Built CONCURRENTLY so live tables are not write-locked; the old
+    # single-column indexes are prefixes of these and become redundant.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_messages_chat_id_created_at_id', 'messages',
+            ['chat_id', 'created_at', 'id'], unique=False,
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_chats_workspace_id_created_at_id', 'chats',
+            ['workspace_id', 'created_at', 'id'], unique=False,
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.drop_index(
+            'ix_messages_chat_id', table_name='messages',
+            postgresql_concurrently=True, if_exists=True,
+        )
+        op.drop_index(
+            'ix_chats_workspace_id', table_name='chats',
+            postgresql_concurrently=True, if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_chats_workspace_id', 'chats', ['workspace_id'], unique=False,
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_messages_chat_id', 'messages', ['chat_id'], unique=False,
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.drop_index(
+            'ix_chats_workspace_id_created_at_id', table_name='chats',
+            postgresql_concurrently=True, if_exists=True,
+        )
+        op.drop_index(
+            'ix_messages_chat_id_created_at_id', table_name='messages',
+            postgresql_concurrently=True, if_exists=True,
+        )
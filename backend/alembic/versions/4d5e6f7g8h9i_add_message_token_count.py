@@ -0,0 +1,55 @@
+"""add_message_token_count
+
+Revision ID: 4d5e6f7g8h9i
+Revises: 3c4d5e6f7g8h
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.tokens import count_tokens
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d5e6f7g8h9i'
+down_revision: Union[str, None] = '3c4d5e6f7g8h'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('token_count', sa.Integer(), nullable=True))
+
+    # Backfill with the same tokenizer the app uses on insert. Keyset batches
+    # on the primary key, so each one starts where the last stopped instead of
+    # rescanning the rows already filled. Each batch commits on its own; a rerun
+    # after an interruption skips the filled rows in one pass over the index.
+    conn = op.get_bind()
+    select_batch = sa.text(
+        "SELECT id, content FROM messages "
+        "WHERE token_count IS NULL AND (CAST(:after AS uuid) IS NULL OR id > CAST(:after AS uuid)) "
+        "ORDER BY id LIMIT :batch"
+    )
+    update_row = sa.text("UPDATE messages SET token_count = :token_count WHERE id = :id")
+    after = None
+    with op.get_context().autocommit_block():
+        while True:
+            rows = conn.execute(select_batch, {"after": after, "batch": BACKFILL_BATCH_SIZE}).fetchall()
+            if not rows:
+                break
+            conn.execute(
+                update_row,
+                [{"id": row.id, "token_count": count_tokens(row.content)} for row in rows],
+            )
+            after = rows[-1].id
+
+    op.alter_column('messages', 'token_count', nullable=False)
+
+
+def downgrade() -> None:
+    op.drop_column('messages', 'token_count')
@@ -0,0 +1,33 @@
+"""add_chat_rolling_summary
+
+Revision ID: 5e6f7g8h9i0j
+Revises: 4d5e6f7g8h9i
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e6f7g8h9i0j'
+down_revision: Union[str, None] = '4d5e6f7g8h9i'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('chats', sa.Column('summary', sa.String(), nullable=True))
+    op.add_column('chats', sa.Column('summary_token_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('chats', sa.Column('summarized_until_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('chats', sa.Column('summarized_until_id', postgresql.UUID(as_uuid=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('chats', 'summarized_until_id')
+    op.drop_column('chats', 'summarized_until_at')
+    op.drop_column('chats', 'summary_token_count')
+    op.drop_column('chats', 'summary')
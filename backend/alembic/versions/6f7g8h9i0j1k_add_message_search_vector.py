@@ -0,0 +1,44 @@
+"""add_message_search_vector
+
+Revision ID: 6f7g8h9i0j1k
+Revises: 5e6f7g8h9i0j
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f7g8h9i0j1k'
+down_revision: Union[str, None] = '5e6f7g8h9i0j'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Stored generated column: Postgres computes it for existing rows here
+    # (a table rewrite under an exclusive lock, so run it in a quiet window
+    # on large tables) and keeps it current on every write after that.
+    op.add_column('messages', sa.Column(
+        'search_vector', postgresql.TSVECTOR(),
+        sa.Computed("to_tsvector('english'::regconfig, content)", persisted=True),
+        nullable=True,
+    ))
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_messages_search_vector', 'messages', ['search_vector'], unique=False,
+            postgresql_using='gin', postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_messages_search_vector', table_name='messages',
+            postgresql_concurrently=True, if_exists=True,
+        )
+    op.drop_column('messages', 'search_vector')
@@ -0,0 +1,62 @@
+"""add_chat_soft_delete
+
+Revision ID: 7g8h9i0j1k2l
+Revises: 6f7g8h9i0j1k
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7g8h9i0j1k2l'
+down_revision: Union[str, None] = '6f7g8h9i0j1k'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (constraint, table, column, referenced table)
+FOREIGN_KEYS = [
+    ('workspaces_user_id_fkey', 'workspaces', 'user_id', 'users'),
+    ('chats_workspace_id_fkey', 'chats', 'workspace_id', 'workspaces'),
+    ('messages_chat_id_fkey', 'messages', 'chat_id', 'chats'),
+]
+
+
+def _replace_foreign_keys(ondelete: Union[str, None]) -> None:
+    # Swapped in NOT VALID (a brief lock, no scan), committed, then validated
+    # under a lock that does not block reads or writes
+    for name, table, column, referred in FOREIGN_KEYS:
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(
+            name, table, referred, [column], ['id'],
+            ondelete=ondelete, postgresql_not_valid=True,
+        )
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in FOREIGN_KEYS:
+            op.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {name}')
+
+
+def upgrade() -> None:
+    op.add_column('chats', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('chats', sa.Column('cleared_at', sa.DateTime(timezone=True), nullable=True))
+    _replace_foreign_keys('CASCADE')
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_chats_purge_pending', 'chats', ['id'], unique=False,
+            postgresql_where=sa.text('deleted_at IS NOT NULL OR cleared_at IS NOT NULL'),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_chats_purge_pending', table_name='chats',
+            postgresql_concurrently=True, if_exists=True,
+        )
+    _replace_foreign_keys(None)
+    op.drop_column('chats', 'cleared_at')
+    op.drop_column('chats', 'deleted_at')
@@ -0,0 +1,211 @@
+"""add_activity_counters
+
+Revision ID: 8h9i0j1k2l3m
+Revises: 7g8h9i0j1k2l
+Create Date: 2026-10-16 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8h9i0j1k2l3m'
+down_revision: Union[str, None] = '7g8h9i0j1k2l'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Statement-level triggers with transition tables: a multi-row INSERT (the
+# write-behind flush) or a purge batch updates each affected chat once, in
+# the same transaction. Chats are visited in id order, so concurrent
+# batches touching overlapping chats cannot deadlock, and updated by
+# primary key: transition tables have no statistics, and a set-based
+# UPDATE ... FROM gets planned as a sequential scan of chats.
+#
+# Only visible messages count: none of a soft-deleted chat, and none
+# created up to a chat's cleared_at (the clear endpoint resets the counters
+# itself). Rows on both sides of cleared_at are only possible right after a
+# clear and are counted one by one.
+MESSAGE_TRIGGERS = [
+    """
+CREATE FUNCTION messages_activity_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    r record;
+BEGIN
+    FOR r IN
+        SELECT chat_id, count(*) AS added, min(created_at) AS oldest, max(created_at) AS newest
+        FROM new_rows GROUP BY chat_id ORDER BY chat_id
+    LOOP
+        UPDATE chats c
+        SET message_count = c.message_count + CASE
+                WHEN c.cleared_at IS NULL OR r.oldest > c.cleared_at THEN r.added
+                WHEN r.newest <= c.cleared_at THEN 0
+                ELSE (SELECT count(*) FROM new_rows n WHERE n.chat_id = c.id AND n.created_at > c.cleared_at)
+            END,
+            last_message_at = CASE
+                WHEN c.cleared_at IS NULL OR r.newest > c.cleared_at THEN GREATEST(c.last_message_at, r.newest)
+                ELSE c.last_message_at
+            END
+        WHERE c.id = r.chat_id AND c.deleted_at IS NULL;
+    END LOOP;
+    RETURN NULL;
+END $$
+    """,
+    """
+CREATE FUNCTION messages_activity_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    r record;
+BEGIN
+    FOR r IN
+        SELECT chat_id, count(*) AS removed, min(created_at) AS oldest, max(created_at) AS newest
+        FROM old_rows GROUP BY chat_id ORDER BY chat_id
+    LOOP
+        UPDATE chats c
+        SET message_count = GREATEST(c.message_count - CASE
+                WHEN c.cleared_at IS NULL OR r.oldest > c.cleared_at THEN r.removed
+                WHEN r.newest <= c.cleared_at THEN 0
+                ELSE (SELECT count(*) FROM old_rows o WHERE o.chat_id = c.id AND o.created_at > c.cleared_at)
+            END, 0),
+            -- Recomputed (one index probe) only when the newest message went
+            last_message_at = CASE
+                WHEN c.last_message_at IS NULL OR r.newest < c.last_message_at THEN c.last_message_at
+                ELSE (
+                    SELECT max(m.created_at) FROM messages m
+                    WHERE m.chat_id = c.id AND (c.cleared_at IS NULL OR m.created_at > c.cleared_at)
+                )
+            END
+        WHERE c.id = r.chat_id AND c.deleted_at IS NULL;
+    END LOOP;
+    RETURN NULL;
+END $$
+    """,
+    """
+CREATE TRIGGER messages_activity_insert AFTER INSERT ON messages
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION messages_activity_insert()
+    """,
+    """
+CREATE TRIGGER messages_activity_delete AFTER DELETE ON messages
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION messages_activity_delete()
+    """,
+]
+
+# Workspaces count their visible (not soft-deleted) chats
+CHAT_TRIGGERS = [
+    """
+CREATE FUNCTION chats_count_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    r record;
+BEGIN
+    FOR r IN
+        SELECT workspace_id, count(*) AS added FROM new_rows
+        WHERE deleted_at IS NULL GROUP BY workspace_id ORDER BY workspace_id
+    LOOP
+        UPDATE workspaces SET chat_count = chat_count + r.added WHERE id = r.workspace_id;
+    END LOOP;
+    RETURN NULL;
+END $$
+    """,
+    """
+CREATE FUNCTION chats_count_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    r record;
+BEGIN
+    FOR r IN
+        SELECT workspace_id, count(*) AS removed FROM old_rows
+        WHERE deleted_at IS NULL GROUP BY workspace_id ORDER BY workspace_id
+    LOOP
+        UPDATE workspaces SET chat_count = GREATEST(chat_count - r.removed, 0) WHERE id = r.workspace_id;
+    END LOOP;
+    RETURN NULL;
+END $$
+    """,
+    # Row-level: UPDATE OF triggers cannot have transition tables, and soft
+    # deletes are one chat at a time anyway
+    """
+CREATE FUNCTION chats_count_soft_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE workspaces
+    SET chat_count = GREATEST(chat_count + CASE WHEN NEW.deleted_at IS NULL THEN 1 ELSE -1 END, 0)
+    WHERE id = NEW.workspace_id;
+    RETURN NULL;
+END $$
+    """,
+    """
+CREATE TRIGGER chats_count_insert AFTER INSERT ON chats
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION chats_count_insert()
+    """,
+    """
+CREATE TRIGGER chats_count_delete AFTER DELETE ON chats
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION chats_count_delete()
+    """,
+    """
+CREATE TRIGGER chats_count_soft_delete AFTER UPDATE OF deleted_at ON chats
+    FOR EACH ROW WHEN ((OLD.deleted_at IS NULL) <> (NEW.deleted_at IS NULL))
+    EXECUTE FUNCTION chats_count_soft_delete()
+    """,
+]
+
+# Runs in the migration's transaction, after the triggers were created: the
+# trigger DDL locks out writes until commit, so no insert falls between the
+# backfill and the triggers
+BACKFILL = [
+    """
+UPDATE chats c
+SET message_count = s.visible, last_message_at = s.newest
+FROM (
+    SELECT m.chat_id, count(*) AS visible, max(m.created_at) AS newest
+    FROM messages m JOIN chats v ON v.id = m.chat_id
+    WHERE v.cleared_at IS NULL OR m.created_at > v.cleared_at
+    GROUP BY m.chat_id
+) s
+WHERE c.id = s.chat_id AND c.deleted_at IS NULL
+    """,
+    """
+UPDATE workspaces w
+SET chat_count = s.visible
+FROM (SELECT workspace_id, count(*) AS visible FROM chats WHERE deleted_at IS NULL GROUP BY workspace_id) s
+WHERE w.id = s.workspace_id
+    """,
+]
+
+
+def upgrade() -> None:
+    op.add_column('chats', sa.Column('message_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('chats', sa.Column('last_message_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('workspaces', sa.Column('chat_count', sa.Integer(), server_default='0', nullable=False))
+    # One statement per execute: the asyncpg driver prepares each one
+    for statement in MESSAGE_TRIGGERS + CHAT_TRIGGERS + BACKFILL:
+        op.execute(statement)
+    # "Recently active first" listing of a workspace's chats (list_chats?sort=activity)
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_chats_workspace_id_last_activity', 'chats',
+            ['workspace_id', sa.text('coalesce(last_message_at, created_at)'), 'id'], unique=False,
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_chats_workspace_id_last_activity', table_name='chats',
+            postgresql_concurrently=True, if_exists=True,
+        )
+    for trigger, table in [
+        ('chats_count_soft_delete', 'chats'),
+        ('chats_count_delete', 'chats'),
+        ('chats_count_insert', 'chats'),
+        ('messages_activity_delete', 'messages'),
+        ('messages_activity_insert', 'messages'),
+    ]:
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger} ON {table}')
+        op.execute(f'DROP FUNCTION IF EXISTS {trigger}()')
+    op.drop_column('workspaces', 'chat_count')
+    op.drop_column('chats', 'last_message_at')
+    op.drop_column('chats', 'message_count')
@@ -0,0 +1,187 @@
+"""partition_messages
+
+Revision ID: 9i0j1k2l3m4n
+Revises: 8h9i0j1k2l3m
+Create Date: 2026-10-17 01:00:00.000000
+
+"""
+import logging
+from typing import Optional, Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9i0j1k2l3m4n'
+down_revision: Union[str, None] = '8h9i0j1k2l3m'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+# Converts messages to a table hash-partitioned on chat_id, online:
+# 1. create the new table next to the old one, with mirror triggers on the
+#    old one that copy every later insert and delete over
+# 2. copy the existing rows in keyset batches
+# Both run statement by statement in autocommit, each a short transaction:
+# holding the new table's foreign key lock on chats while waiting for the
+# trigger's lock on messages would deadlock with writers, whose activity
+# triggers update chats.
+# 3. in one brief transaction under an exclusive lock: drop the old table,
+#    rename the new one into place, move the activity triggers
+# Writers only wait for step 3, bounded by lock_timeout. On a timeout just
+# rerun: steps 1-2 are idempotent (rows already copied are skipped).
+# Downgrade runs the same steps back to an unpartitioned table.
+#
+#   alembic -x message_partitions=32 -x backfill_batch=5000 upgrade head
+#
+# The partition count is fixed once migrated; changing it means another
+# copy. Every chat's messages live in one partition, so the per-chat
+# queries scan one partition and each partition is vacuumed on its own.
+DEFAULT_PARTITIONS = 16
+DEFAULT_BACKFILL_BATCH = 5000
+SWAP_LOCK_TIMEOUT = '10s'
+
+COLUMNS = 'id, chat_id, role, content, created_at, token_count'
+
+# Dropped with the old table in step 3; recreated on the new one. Statement
+# triggers with transition tables are allowed on a partitioned parent and
+# see the rows of every partition.
+ACTIVITY_TRIGGERS = [
+    """
+CREATE TRIGGER messages_activity_insert AFTER INSERT ON messages
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION messages_activity_insert()
+    """,
+    """
+CREATE TRIGGER messages_activity_delete AFTER DELETE ON messages
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION messages_activity_delete()
+    """,
+]
+
+
+def _x_int(name: str, default: int) -> int:
+    return int(context.get_x_argument(as_dictionary=True).get(name, default))
+
+
+def _create_table(table: str, partitions: Optional[int]) -> None:
+    # A partitioned table's primary key must contain the partition key; id
+    # leads so lookups by id alone still use it
+    primary_key = 'id, chat_id' if partitions else 'id'
+    op.execute(f"""
+CREATE TABLE IF NOT EXISTS {table} (
+    id uuid NOT NULL,
+    chat_id uuid NOT NULL,
+    role varchar NOT NULL,
+    content varchar NOT NULL,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    token_count integer NOT NULL,
+    search_vector tsvector GENERATED ALWAYS AS (to_tsvector('english'::regconfig, content)) STORED,
+    CONSTRAINT {table}_pkey PRIMARY KEY ({primary_key}),
+    CONSTRAINT {table}_chat_id_fkey FOREIGN KEY (chat_id) REFERENCES chats (id) ON DELETE CASCADE
+){f' PARTITION BY HASH (chat_id)' if partitions else ''}
+    """)
+    for remainder in range(partitions or 0):
+        op.execute(
+            f'CREATE TABLE IF NOT EXISTS messages_p{remainder:02d} PARTITION OF {table} '
+            f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})'
+        )
+    # Built on the empty table (and so on every partition); kept up to date by the copy
+    op.execute(
+        f'CREATE INDEX IF NOT EXISTS ix_{table}_chat_id_created_at_id ON {table} (chat_id, created_at, id)'
+    )
+    op.execute(f'CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING gin (search_vector)')
+
+
+def _create_mirror(target: str) -> None:
+    # Messages are never updated, so inserts and deletes are all there is
+    op.execute(f"""
+CREATE OR REPLACE FUNCTION {target}_mirror_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO {target} ({COLUMNS}) SELECT {COLUMNS} FROM new_rows ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END $$
+    """)
+    op.execute(f"""
+CREATE OR REPLACE FUNCTION {target}_mirror_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM {target} t USING old_rows o WHERE t.id = o.id AND t.chat_id = o.chat_id;
+    RETURN NULL;
+END $$
+    """)
+    # Deletes first: a row mirrored on insert must never miss its delete
+    op.execute(f'DROP TRIGGER IF EXISTS {target}_mirror_delete ON messages')
+    op.execute(f"""
+CREATE TRIGGER {target}_mirror_delete AFTER DELETE ON messages
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {target}_mirror_delete()
+    """)
+    op.execute(f'DROP TRIGGER IF EXISTS {target}_mirror_insert ON messages')
+    op.execute(f"""
+CREATE TRIGGER {target}_mirror_insert AFTER INSERT ON messages
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {target}_mirror_insert()
+    """)
+
+
+def _backfill(target: str, batch_size: int) -> None:
+    # FOR SHARE: a delete racing a batch waits for it and is then mirrored,
+    # rather than deleting a row the batch is about to copy
+    copy_batch = sa.text(f"""
+WITH batch AS (
+    SELECT {COLUMNS} FROM messages
+    WHERE CAST(:after AS uuid) IS NULL OR id > CAST(:after AS uuid)
+    ORDER BY id LIMIT :batch_size
+    FOR SHARE
+), copied AS (
+    INSERT INTO {target} ({COLUMNS}) SELECT {COLUMNS} FROM batch ON CONFLICT DO NOTHING
+)
+SELECT (SELECT count(*) FROM batch) AS rows, (SELECT id FROM batch ORDER BY id DESC LIMIT 1) AS last_id
+    """)
+    bind = op.get_bind()
+    after, copied = None, 0
+    while True:
+        batch = bind.execute(copy_batch, {'after': after, 'batch_size': batch_size}).one()
+        copied += batch.rows
+        if batch.rows < batch_size:
+            break
+        after = batch.last_id
+        if copied % (batch_size * 100) == 0:
+            logger.info(f'Copied {copied} messages into {target}')
+    op.execute(f'ANALYZE {target}')
+    logger.info(f'Copied {copied} messages into {target}')
+
+
+def _swap(target: str) -> None:
+    # Runs in the migration's transaction: the lock is held only for the
+    # renames, and released at commit together with the version stamp
+    op.execute(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'")
+    op.execute('LOCK TABLE messages IN ACCESS EXCLUSIVE MODE')
+    op.execute('DROP TABLE messages')
+    for kind in ('insert', 'delete'):
+        op.execute(f'DROP FUNCTION IF EXISTS {target}_mirror_{kind}()')
+    op.execute(f'ALTER TABLE {target} RENAME TO messages')
+    op.execute(f'ALTER TABLE messages RENAME CONSTRAINT {target}_pkey TO messages_pkey')
+    op.execute(f'ALTER TABLE messages RENAME CONSTRAINT {target}_chat_id_fkey TO messages_chat_id_fkey')
+    for index in ('chat_id_created_at_id', 'search_vector'):
+        op.execute(f'ALTER INDEX ix_{target}_{index} RENAME TO ix_messages_{index}')
+    for statement in ACTIVITY_TRIGGERS:
+        op.execute(statement)
+
+
+def _convert(target: str, partitions: Optional[int]) -> None:
+    with op.get_context().autocommit_block():
+        _create_table(target, partitions)
+        _create_mirror(target)
+        _backfill(target, _x_int('backfill_batch', DEFAULT_BACKFILL_BATCH))
+    _swap(target)
+
+
+def upgrade() -> None:
+    _convert('messages_partitioned', _x_int('message_partitions', DEFAULT_PARTITIONS))
+
+
+def downgrade() -> None:
+    _convert('messages_unpartitioned', None)
@@ -24,7 +24,7 @@ async def register(user_in: UserCreate, db: AsyncSession = Depends(get_db)):
     # Create user
     new_user = User(
         email=user_in.email,
-        hashed_password=security.get_password_hash(user_in.password)
+        hashed_password=await security.get_password_hash_async(user_in.password)
     )
     db.add(new_user)
     await db.commit()
@@ -38,7 +38,7 @@ async def login(user_in: UserLogin, db: AsyncSession = Depends(get_db)):
     result = await db.execute(query)
     user = result.scalar_one_or_none()
     
-    if not user or not security.verify_password(user_in.password, user.hashed_password):
+    if not user or not await security.verify_password_async(user_in.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
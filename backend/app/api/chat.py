@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from typing import List, Optional
+from sqlalchemy import func, select
+from typing import List, Literal, NamedTuple, Optional
 from uuid import UUID
 import logging
-from app.core.database import get_db
+import time
+from app.core.database import engine, get_db
+from app.core.pagination import keyset_page, set_cursor_headers
+from app.core import export, json_rows, message_writer, purger, titles
 from app.models.chat import Chat
 from app.models.workspace import Workspace
 from app.models.user import User
@@ -46,11 +49,14 @@ async def create_chat(
 @router.get("/", response_model=List[ChatResponse])
 async def list_chats(
     workspace_id: UUID,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    sort: Literal["created", "activity"] = "created",
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     # Verify workspace ownership first
-    query_ws = select(Workspace).where(
+    query_ws = select(Workspace.id).where(
         Workspace.id == workspace_id,
         Workspace.user_id == current_user.id
     )
@@ -63,11 +69,23 @@ async def list_chats(
             detail="Workspace not found or access denied"
         )
 
-    # Fetch chats
-    query = select(Chat).where(Chat.workspace_id == workspace_id).order_by(Chat.created_at.desc())
-    result = await db.execute(query)
-    chats = result.scalars().all()
-    return chats
+    # Fetch chats, newest first (sort=activity: most recently active first).
+    # X-Next-Cursor pages to older chats, X-Prev-Cursor back to newer ones.
+    # Cursors are only valid for the sort they came from.
+    # Plain rows straight to JSON (see app/core/json_rows.py).
+    query = select(*json_rows.columns(ChatResponse, Chat)).where(
+        Chat.workspace_id == workspace_id, Chat.deleted_at.is_(None)
+    )
+    sort_key = "created_at"
+    if sort == "activity":
+        sort_key = "last_activity_at"
+        query = query.add_columns(Chat.last_activity_at.label(sort_key))
+    chats, prev_cursor, next_cursor = await keyset_page(
+        db, query, Chat, limit, cursor, descending=True, sort_key=sort_key,
+    )
+    response = json_rows.response(chats, ChatResponse)
+    set_cursor_headers(response, prev_cursor, next_cursor)
+    return response
 
 @router.delete("/{chat_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_chat(
@@ -78,7 +96,8 @@ async def delete_chat(
     # Verify ownership
     query = select(Chat).join(Workspace).where(
         Chat.id == chat_id,
-        Workspace.user_id == current_user.id
+        Workspace.user_id == current_user.id,
+        Chat.deleted_at.is_(None)
     )
     result = await db.execute(query)
     chat = result.scalar_one_or_none()
@@ -86,10 +105,11 @@ async def delete_chat(
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
         
-    # Delete 
-    await db.execute(delete(Message).where(Message.chat_id == chat_id))
-    await db.execute(delete(Chat).where(Chat.id == chat_id))
+    # Soft delete: hidden from every read from now on; the messages and the
+    # chat itself are removed in batches by the background purger
+    chat.deleted_at = func.now()
     await db.commit()
+    purger.schedule()
 
 @router.post("/{chat_id}/clear")
 async def clear_chat(
@@ -99,7 +119,8 @@ async def clear_chat(
 ):
     query = select(Chat).join(Workspace).where(
         Chat.id == chat_id,
-        Workspace.user_id == current_user.id
+        Workspace.user_id == current_user.id,
+        Chat.deleted_at.is_(None)
     )
     result = await db.execute(query)
     chat = result.scalar_one_or_none()
@@ -107,163 +128,453 @@ async def clear_chat(
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
         
-    await db.execute(delete(Message).where(Message.chat_id == chat_id))
+    # Commit buffered messages first, so all of them fall before the mark.
+    # Messages created up to cleared_at are hidden at once and removed by the
+    # background purger.
+    if message_writer.has_pending(chat_id):
+        await message_writer.flush()
+    chat.cleared_at = message_writer.now()
+    chat.message_count = 0
+    chat.last_message_at = None
+    chat.summary = None
+    chat.summary_token_count = 0
+    chat.summarized_until_at = None
+    chat.summarized_until_id = None
     await db.commit()
+    purger.schedule()
     return {"status": "success"}
 
+@router.get("/{chat_id}/title", response_model=ChatResponse)
+async def get_chat_title(
+    chat_id: UUID,
+    wait: float = Query(0, ge=0, le=30),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Long-poll: with ?wait=N, hold the request until the background
+    # auto-title lands (or N seconds pass) instead of polling the chat list
+    query = select(Chat).join(Workspace).where(
+        Chat.id == chat_id,
+        Workspace.user_id == current_user.id,
+        Chat.deleted_at.is_(None)
+    )
+    result = await db.execute(query)
+    chat = result.scalar_one_or_none()
+
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    if wait and chat.title == titles.DEFAULT_TITLE:
+        # Release the pooled connection while waiting
+        await db.close()
+        new_title = await titles.wait_for_title(chat.id, wait)
+        if new_title:
+            chat.title = new_title
+    return chat
+
+@router.get("/{chat_id}/export")
+async def export_chat(
+    chat_id: UUID,
+    format: Literal["ndjson", "jsonl.gz"] = "ndjson",
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Full history as JSON Lines, streamed in batches (see app/core/export.py)
+    query = select(Chat.id).join(Workspace).where(
+        Chat.id == chat_id,
+        Workspace.user_id == current_user.id,
+        Chat.deleted_at.is_(None)
+    )
+    if (await db.execute(query)).scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    if message_writer.has_pending(chat_id):
+        await message_writer.flush()
+    # The export reads on its own connection; release this one
+    await db.close()
+    return export.response(format, f"chat-{chat_id}", chat_id=chat_id)
+
 # --- Streaming Implementation ---
 
+from fastapi import Header, Request
 from fastapi.responses import StreamingResponse
 from app.schemas.chat import ChatStreamRequest
 from app.models.message import Message, MessageRole
 from app.core.config import settings
-import httpx
-import json
+from app.core import background, openrouter
+from app.core import metrics, replay
+from app.core.coalesce import coalesce
+from app.core import summaries
+from app.core.tokens import MESSAGE_TOKEN_OVERHEAD
+from sqlalchemy import case, insert, literal, or_, tuple_
 
 # Constants
 MODEL = "meta-llama/llama-3.1-8b-instruct"
 MAX_TOKENS = 1000
-HISTORY_LIMIT = 10
+# Hard cap on history rows scanned per turn; the token budget normally binds first
+HISTORY_LIMIT = 100
+# How long an SSE agent stream waits for the background auto-title
+TITLE_EVENT_WAIT = 30.0
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+STREAM_TTFT = metrics.histogram(
+    "chat_stream_ttft_seconds", "Time from request arrival to the first streamed token", ("endpoint",)
+)
+STREAM_DURATION = metrics.histogram(
+    "chat_stream_duration_seconds", "Time from request arrival to the end of generation", ("endpoint",)
+)
+STREAMS_IN_FLIGHT = metrics.gauge("chat_streams_in_flight", "Generations currently running", ("endpoint",))
+
+def wants_sse(http_request: Request) -> bool:
+    return "text/event-stream" in http_request.headers.get("accept", "")
+
+def stream_response(
+    http_request: Request,
+    user: User,
+    chunks,
+    headers: Optional[dict] = None,
+    title_chat_id: Optional[UUID] = None,
+) -> StreamingResponse:
+    """
+    Plain-text stream by default. With `Accept: text/event-stream`, the
+    generation is detached into a replay buffer and sent as numbered SSE
+    events; X-Stream-Id names it for GET /chats/streams/{stream_id}.
+    """
+    headers = dict(headers or {})
+    chunks = instrumented(
+        chunks,
+        http_request.scope["route"].path,
+        getattr(http_request.state, "started_at", None) or time.perf_counter(),
+    )
+    # Fewer, larger writes: per-token sends dominate streaming CPU and syscalls
+    chunks = coalesce(chunks)
+    if not wants_sse(http_request):
+        return StreamingResponse(chunks, media_type="text/plain", headers=headers)
+
+    buffer = replay.start(user.id, chunks)
+    if title_chat_id is not None:
+        background.spawn(_title_event(buffer, title_chat_id), name=f"title-event-{buffer.id}")
+    headers["X-Stream-Id"] = buffer.id
+    return StreamingResponse(
+        replay.sse(buffer),
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, **headers},
+    )
+
+async def instrumented(chunks, endpoint: str, started: float):
+    """Records TTFT, total duration and in-flight count of one generation."""
+    ttft, duration, in_flight = (
+        STREAM_TTFT.labels(endpoint), STREAM_DURATION.labels(endpoint), STREAMS_IN_FLIGHT.labels(endpoint)
+    )
+    first = True
+    in_flight.inc()
+    try:
+        async for chunk in chunks:
+            if first:
+                ttft.observe(time.perf_counter() - started)
+                first = False
+            yield chunk
+    finally:
+        in_flight.dec()
+        duration.observe(time.perf_counter() - started)
+        await chunks.aclose()
+
+async def _title_event(buffer: replay.ReplayBuffer, chat_id: UUID) -> None:
+    title = await titles.wait_for_title(chat_id, TITLE_EVENT_WAIT)
+    if title and not buffer.done:
+        replay.append(buffer, title, event="title")
+
+async def save_assistant_message(chat_id: UUID, content: str) -> dict:
+    # Through the write-behind buffer, not the request session: a detached
+    # (SSE) generation outlives the request and its session
+    return await message_writer.add(chat_id, MessageRole.ASSISTANT, content)
+
+@router.get("/streams/{stream_id}")
+async def resume_stream(
+    stream_id: str,
+    last_event_id: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+):
+    # Reconnect to a running or recently finished SSE generation; replays
+    # every event after Last-Event-ID, then follows it live
+    buffer = replay.get(stream_id)
+    if buffer is None or buffer.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Stream not found or expired")
+
+    after = replay.parse_last_event_id(last_event_id)
+    if after < buffer.first_id - 1:
+        raise HTTPException(status_code=410, detail="Stream events no longer available")
+    return StreamingResponse(
+        replay.sse(buffer, after),
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, "X-Stream-Id": buffer.id},
+    )
+
+class Turn(NamedTuple):
+    title: Optional[str]
+    # Prompt history ending with the new user message (empty unless requested)
+    history: List[dict]
+    # Unsummarized tokens seen (capped by HISTORY_LIMIT rows), to decide when
+    # to refresh the summary
+    unsummarized_tokens: int
+
+async def open_turn(
+    user_id: UUID,
+    chat_id: UUID,
+    message: str,
+    with_history: bool = True,
+    token_budget: int = settings.HISTORY_TOKEN_BUDGET,
+) -> Optional[Turn]:
+    """
+    Everything a streaming turn needs from the database before the upstream
+    call, as one statement in autocommit mode (one round trip, no BEGIN or
+    COMMIT): checks that the user owns the (undeleted) chat, inserts the user message
+    (only if they do) and, with `with_history`, returns the prompt history.
+    Returns None if the chat does not exist or is not the user's.
+
+    History is the rolling summary (if any) followed by the newest
+    unsummarized messages whose stored token counts fit the rest of the
+    budget, oldest first: a running token total over the (chat_id,
+    created_at, id) index, cut at the budget. Messages still in the
+    write-behind buffer and the new user message are newer than any stored
+    one and are always appended.
+
+    The user message bypasses the write-behind buffer: its insert rides on
+    this statement for free and is committed before the upstream call.
+    """
+    # Taken before the query: a row committed meanwhile shows up in both and is
+    # deduplicated by id below, never in neither
+    pending = message_writer.pending(chat_id) if with_history else []
+    user_row = message_writer.new_row(chat_id, MessageRole.USER, message)
+    appended_tokens = sum(row["token_count"] + MESSAGE_TOKEN_OVERHEAD for row in pending + [user_row])
+
+    owned = (
+        select(
+            Chat.id, Chat.title, Chat.summary, Chat.summary_token_count,
+            Chat.summarized_until_at, Chat.summarized_until_id, Chat.cleared_at,
+        )
+        .join(Workspace, Workspace.id == Chat.workspace_id)
+        .where(Chat.id == chat_id, Workspace.user_id == user_id, Chat.deleted_at.is_(None))
+        .cte("owned")
+    )
+    inserted = (
+        insert(Message.__table__)
+        .from_select(
+            list(user_row),
+            select(*(
+                owned.c.id if key == "chat_id" else literal(value, Message.__table__.c[key].type)
+                for key, value in user_row.items()
+            )),
+        )
+        .returning(Message.id)
+        .cte("inserted")
+    )
+    # Referenced so it is rendered (Postgres runs it either way)
+    columns = [
+        owned.c.title, owned.c.summary,
+        select(func.count()).select_from(inserted).scalar_subquery().label("inserted"),
+    ]
+    query = select(*columns).select_from(owned)
+
+    if with_history:
+        newest_first = (Message.created_at.desc(), Message.id.desc())
+        recent = (
+            select(
+                Message.role,
+                Message.content,
+                Message.created_at,
+                Message.id,
+                func.sum(Message.token_count + MESSAGE_TOKEN_OVERHEAD)
+                    .over(order_by=newest_first).label("running_tokens"),
+            )
+            .join(owned, owned.c.id == Message.chat_id)
+            .where(
+                Message.chat_id == chat_id,
+                or_(
+                    owned.c.summarized_until_id.is_(None),
+                    tuple_(Message.created_at, Message.id)
+                        > tuple_(owned.c.summarized_until_at, owned.c.summarized_until_id),
+                ),
+                or_(owned.c.cleared_at.is_(None), Message.created_at > owned.c.cleared_at),
+            )
+            .order_by(*newest_first)
+            .limit(HISTORY_LIMIT)
+            .cte("recent")
+        )
+        budget = (
+            token_budget - appended_tokens
+            - case((owned.c.summary.is_not(None), owned.c.summary_token_count + MESSAGE_TOKEN_OVERHEAD), else_=0)
+        )
+        unsummarized_tokens = select(func.max(recent.c.running_tokens)).scalar_subquery()
+        query = (
+            select(
+                *columns, recent.c.id, recent.c.role, recent.c.content,
+                unsummarized_tokens.label("unsummarized_tokens"),
+            )
+            .select_from(owned)
+            .outerjoin(recent, recent.c.running_tokens <= budget)
+            .order_by(recent.c.created_at.asc(), recent.c.id.asc())
+        )
+
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        rows = (await conn.execute(query)).all()
+    if not rows:
+        return None
+
+    first = rows[0]
+    payload = []
+    if with_history:
+        if first.summary:
+            payload.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{first.summary}"
+            })
+        payload.extend({"role": row.role, "content": row.content} for row in rows if row.id is not None)
+        stored_ids = {row.id for row in rows}
+        payload.extend(
+            {"role": row["role"], "content": row["content"]}
+            for row in pending + [user_row] if row["id"] not in stored_ids
+        )
+    stored_tokens = (first.unsummarized_tokens or 0) if with_history else 0
+    return Turn(first.title, payload, stored_tokens + appended_tokens)
 
 @router.post("/stream", response_class=StreamingResponse)
 async def stream_chat(
     request: ChatStreamRequest,
+    http_request: Request,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    # 1. Verify chat existence and workspace ownership
-    
-    query = select(Chat).join(Workspace).where(
-        Chat.id == request.chat_id,
-        Workspace.user_id == current_user.id
-    )
-    result = await db.execute(query)
-    chat = result.scalar_one_or_none()
+    # Release the session's connection if authentication used it
+    await db.commit()
 
-    if not chat:
+    # 1-3. Verify ownership, persist the user message and fetch context
+    # (rolling summary + newest messages within the token budget): one round trip
+    turn = await open_turn(current_user.id, request.chat_id, request.message)
+    if turn is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Chat not found or access denied"
         )
-
-    # 2. Persist User Message
-    user_msg = Message(
-        chat_id=chat.id,
-        role=MessageRole.USER,
-        content=request.message
-    )
-    db.add(user_msg)
-    await db.commit()
-    
-    # 3. Fetch recent history for context
-    # Get last N messages
-    history_query = select(Message).where(
-        Message.chat_id == chat.id
-    ).order_by(Message.created_at.desc()).limit(HISTORY_LIMIT)
-    
-    history_result = await db.execute(history_query)
-    # Reverse to chronological order
-    recent_messages = sorted(history_result.scalars().all(), key=lambda x: x.created_at)
-    
-    # Prune history to avoid token limits (Safe estimate: 4 chars ~= 1 token)
-    # Target: ~3000 tokens context => ~12000 chars
-    MAX_INPUT_CHARS = 12000
-    current_chars = 0
-    pruned_messages = []
-    
-    # Process from newest to oldest
-    for msg in reversed(recent_messages):
-        msg_len = len(msg.content)
-        if current_chars + msg_len > MAX_INPUT_CHARS:
-            break
-        pruned_messages.append(msg)
-        current_chars += msg_len
-        
-    # Restore chronological order
-    pruned_messages.reverse()
-    
-    # Format for OpenRouter
-    messages_payload = [
-        {"role": msg.role, "content": msg.content} for msg in pruned_messages
-    ]
+    chat_id = request.chat_id
+    messages_payload, unsummarized_tokens = turn.history, turn.unsummarized_tokens
     
     # 4. Stream Generator
     async def generate():
         full_response = []
-        headers = {
-            "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "http://localhost:8000", 
-            "X-Title": settings.PROJECT_NAME,
-        }
-        data = {
-            "model": MODEL,
-            "messages": messages_payload,
-            "stream": True,
-            "max_tokens": MAX_TOKENS
-        }
-        
-        async with httpx.AsyncClient() as client:
+        try:
+            async for content in openrouter.stream_completion(
+                messages_payload, MODEL, max_tokens=MAX_TOKENS
+            ):
+                full_response.append(content)
+                yield content
+        except openrouter.OpenRouterError as e:
+            yield f"Error: {e.status_code}"
+            return
+        except Exception as e:
+            yield f"Stream Error: {str(e)}"
+
+        # 5. Persist Assistant Message (Accumulated)
+        text_content = "".join(full_response)
+        if text_content:
             try:
-                async with client.stream("POST", "https://openrouter.ai/api/v1/chat/completions", headers=headers, json=data) as response:
-                    if response.status_code != 200:
-                        yield f"Error: {response.status_code}".encode('utf-8')
-                        return
-
-                    async for line in response.aiter_lines():
-                        if line.startswith("data: "):
-                            line_content = line[6:]
-                            if line_content == "[DONE]":
-                                break
-                            try:
-                                chunk = json.loads(line_content)
-                                if chunk["choices"]:
-                                    delta = chunk["choices"][0]["delta"]
-                                    content = delta.get("content", "")
-                                    if content:
-                                        full_response.append(content)
-                                        yield content.encode('utf-8')
-                            except json.JSONDecodeError:
-                                continue
+                asst_msg = await save_assistant_message(chat_id, text_content)
+                # Fold older turns into the summary off the request path
+                if summaries.should_summarize(unsummarized_tokens + asst_msg["token_count"]):
+                    summaries.schedule(chat_id)
             except Exception as e:
-                yield f"Stream Error: {str(e)}".encode('utf-8')
-            
-            # 5. Persist Assistant Message (Accumulated)
-            text_content = "".join(full_response)
-            if text_content:
-                try:
-                    asst_msg = Message(
-                        chat_id=chat.id,
-                        role=MessageRole.ASSISTANT,
-                        content=text_content
-                    )
-                    db.add(asst_msg)
-                    await db.commit()
-                except Exception as e:
-                    # In a real app, log this error
-                    logger.error(f"Failed to save assistant message: {e}")
-
-    return StreamingResponse(generate(), media_type="text/plain")
-
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage
+                # In a real app, log this error
+                logger.error(f"Failed to save assistant message: {e}")
+
+    return stream_response(http_request, current_user, generate())
+
 import asyncio
+import re
 import tavily_client
+from app.core.cache import TTLCache
+from app.core.singleflight import SingleFlight
 
 # --- RAG Implementation ---
 
-def get_tavily_context(query: str) -> Optional[str]:
+SEARCH_MAX_RESULTS = 3
+SEARCH_DEPTH = "basic"
+
+# Live-search results shared across users, keyed on the normalized query
+search_cache = TTLCache(
+    max_entries=settings.SEARCH_CACHE_MAX_ENTRIES,
+    max_bytes=settings.SEARCH_CACHE_MAX_BYTES,
+    ttl=settings.SEARCH_CACHE_TTL,
+    sizeof=lambda results: sum(len(str(v)) for r in results for v in r.values()),
+)
+
+search_flight = SingleFlight()
+
+TAVILY_DURATION = metrics.histogram(
+    "tavily_request_duration_seconds", "Tavily search latency (cache misses only)"
+).labels()
+TAVILY_ERRORS = metrics.counter(
+    "tavily_errors_total", "Failed Tavily searches by HTTP status or exception type", ("reason",)
+)
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_query(query: str) -> str:
+    """Case-, whitespace- and punctuation-insensitive form of a search query."""
+    query = _PUNCTUATION_RE.sub(" ", query.casefold())
+    return _WHITESPACE_RE.sub(" ", query).strip()
+
+async def search_tavily(
+    query: str,
+    max_results: int = SEARCH_MAX_RESULTS,
+    search_depth: str = SEARCH_DEPTH,
+    use_cache: bool = True,
+) -> List[dict]:
+    """
+    Runs a Tavily search through the shared result cache and single-flight layer.
+    Only non-empty results are cached; errors fan out to every concurrent
+    caller of the same query and are never cached.
+    """
+    key = (normalize_query(query), max_results, search_depth)
+    if use_cache:
+        cached = search_cache.get(key)
+        if cached is not None:
+            return cached
+
+    async def fetch() -> List[dict]:
+        start = time.perf_counter()
+        try:
+            results = await tavily_client.async_search(
+                query,
+                max_results=max_results,
+                search_depth=search_depth,
+                api_key=settings.TAVILY_API_KEY
+            )
+        except Exception as e:
+            TAVILY_ERRORS.labels(str(getattr(e, "status_code", None) or type(e).__name__)).inc()
+            raise
+        finally:
+            TAVILY_DURATION.observe(time.perf_counter() - start)
+        if results:
+            # Filled by the shared call, so it lands even if every waiter disconnected.
+            # Bypassed requests still refresh the entry for everyone else.
+            search_cache.set(key, results)
+        return results
+
+    # Identical concurrent queries share one upstream call
+    return await search_flight.do(key, fetch)
+
+async def get_tavily_context(query: str, use_cache: bool = True) -> Optional[str]:
     """
     Fetches context from Tavily, normalizes it, and returns a single formatted string.
     Returns None if search fails or no results found.
+    Pass use_cache=False for time-sensitive questions to force a live search.
     """
     try:
         logger.info(f"Fetching Tavily context for: {query}")
-        results = tavily_client.search(
-            query,
-            max_results=3,
-            api_key=settings.TAVILY_API_KEY
-        )
+        results = await search_tavily(query, use_cache=use_cache)
         if not results:
             logger.warning("Tavily returned no results.")
             return None
@@ -293,51 +604,24 @@ def get_tavily_context(query: str) -> Optional[str]:
 @router.post("/agent/stream", response_class=StreamingResponse)
 async def stream_agent_chat(
     request: ChatStreamRequest,
+    http_request: Request,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    # 1. Verify workspace/chat
-    query = select(Chat).join(Workspace).where(
-        Chat.id == request.chat_id,
-        Workspace.user_id == current_user.id
-    )
-    result = await db.execute(query)
-    chat = result.scalar_one_or_none()
+    # Release the session's connection if authentication used it
+    await db.commit()
 
-    if not chat:
+    # 1-2. Verify workspace/chat and persist the user message: one round trip
+    turn = await open_turn(current_user.id, request.chat_id, request.message, with_history=False)
+    if turn is None:
         raise HTTPException(status_code=404, detail="Chat not found")
+    chat_id = request.chat_id
 
-    # 2. Persist User Message
-    user_msg = Message(
-        chat_id=chat.id,
-        role=MessageRole.USER,
-        content=request.message
-    )
-    db.add(user_msg)
-    
-    # Auto-Rename if first message
-    if chat.title == "New Chat":
-        try:
-             # Summarize
-             llm_title = ChatOpenAI(
-                api_key=settings.OPENROUTER_API_KEY,
-                base_url="https://openrouter.ai/api/v1",
-                model="meta-llama/llama-3.1-8b-instruct",
-                temperature=0,
-                max_tokens=15
-             )
-             # Basic prompt
-             title_resp = await llm_title.ainvoke(
-                 [HumanMessage(content=f"Summarize this in 3-5 words for a chat title: {request.message}")]
-             )
-             new_title = title_resp.content.strip().replace('"', '')
-             if new_title:
-                 chat.title = new_title
-                 db.add(chat) 
-        except Exception as e:
-             logger.error(f"Auto-rename failed: {e}")
-
-    await db.commit()
+    # Auto-Rename if first message: titled in the background, batched with other chats.
+    # Poll GET /chats/{chat_id}/title?wait=... to receive it.
+    title_pending = turn.title == titles.DEFAULT_TITLE
+    if title_pending:
+        titles.enqueue(chat_id, request.message)
 
     # 3. RAG Pipeline Generator
     async def generate_rag_stream():
@@ -345,10 +629,9 @@ async def stream_agent_chat(
         cancelled = False
 
         try:
-            # 1. Fetch search context (blocking moved off event loop)
-            loop = asyncio.get_running_loop()
-            context = await loop.run_in_executor(
-                None, get_tavily_context, request.message
+            # 1. Fetch search context (native async, pooled Tavily client)
+            context = await get_tavily_context(
+                request.message, use_cache=not (request.bypass_cache or request.bypass_search_cache)
             )
 
             # 2. If search failed completely → honest failure
@@ -357,7 +640,7 @@ async def stream_agent_chat(
                     "I couldn’t find any relevant results from live search "
                     "for this query."
                 )
-                yield msg.encode("utf-8")
+                yield msg
                 final_answer = msg
                 return
 
@@ -371,25 +654,23 @@ async def stream_agent_chat(
             )
 
             full_prompt = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(
-                    content=f"Search results:\n{context}\n\nUser question: {request.message}"
-                )
+                {"role": "system", "content": system_prompt},
+                {
+                    "role": "user",
+                    "content": f"Search results:\n{context}\n\nUser question: {request.message}"
+                }
             ]
 
-            # 4. Stream summarized answer
-            llm = ChatOpenAI(
-                api_key=settings.OPENROUTER_API_KEY,
-                base_url="https://openrouter.ai/api/v1",
-                model=MODEL,
-                streaming=True,
-                temperature=0
-            )
-
-            async for chunk in llm.astream(full_prompt):
-                if chunk.content:
-                    final_answer += chunk.content
-                    yield chunk.content.encode("utf-8")
+            # 4. Stream summarized answer over the shared upstream pool.
+            # Same context + question at temperature 0 → replay the cached answer
+            async for content in openrouter.stream_completion_cached(
+                full_prompt,
+                MODEL,
+                use_cache=not (request.bypass_cache or request.bypass_completion_cache),
+                temperature=0,
+            ):
+                final_answer += content
+                yield content
 
         except asyncio.CancelledError:
             logger.info("Search-reporting stream cancelled")
@@ -398,20 +679,20 @@ async def stream_agent_chat(
         except Exception as e:
             logger.error(f"Search-reporting agent error: {e}")
             err = "An error occurred while fetching or summarizing search results."
-            yield err.encode("utf-8")
+            yield err
             final_answer = err
 
         # 5. Persist assistant message
         if final_answer and not cancelled:
             try:
-                asst_msg = Message(
-                    chat_id=chat.id,
-                    role=MessageRole.ASSISTANT,
-                    content=final_answer
-                )
-                db.add(asst_msg)
-                await db.commit()
+                await save_assistant_message(chat_id, final_answer)
             except Exception as e:
                 logger.error(f"Failed to save assistant message: {e}")
 
-    return StreamingResponse(generate_rag_stream(), media_type="text/plain")
+    return stream_response(
+        http_request,
+        current_user,
+        generate_rag_stream(),
+        headers={"X-Title-Pending": "true"} if title_pending else None,
+        title_chat_id=chat_id if title_pending else None,
+    )
@@ -1,26 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List
+from sqlalchemy import Row, Select, any_, exists, func, literal, select, text, tuple_
+from sqlalchemy.dialects import postgresql
+from typing import List, Optional, Tuple
 from uuid import UUID
+import html
+from app.core import json_rows, message_writer
 from app.core.database import get_db
-from app.models.message import Message
+from app.core.pagination import (
+    decode_rank_cursor, encode_rank_cursor, keyset_page, set_cursor_headers,
+)
+from app.models.message import Message, SEARCH_CONFIG
 from app.models.chat import Chat
 from app.models.workspace import Workspace
-from app.schemas.message import MessageCreate, MessageResponse
+from app.schemas.message import MessageCreate, MessageResponse, MessageSearchHit
 from app.dependencies import get_current_user
 from app.models.user import User
 
 router = APIRouter(prefix="/messages", tags=["messages"])
 
-async def verify_chat_access(chat_id: UUID, user_id: UUID, db: AsyncSession):
-    # Join Chat -> Workspace to verify User ownership
-    query = select(Chat).join(Workspace).where(
+async def verify_chat_access(chat_id: UUID, user_id: UUID, db: AsyncSession) -> Row:
+    # Join Chat -> Workspace to verify User ownership; returns (id, cleared_at)
+    query = select(Chat.id, Chat.cleared_at).join(Workspace).where(
         Chat.id == chat_id,
-        Workspace.user_id == user_id
+        Workspace.user_id == user_id,
+        Chat.deleted_at.is_(None)
     )
     result = await db.execute(query)
-    chat = result.scalar_one_or_none()
+    chat = result.one_or_none()
     if not chat:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -35,26 +42,139 @@ async def create_message(
     db: AsyncSession = Depends(get_db)
 ):
     await verify_chat_access(message_in.chat_id, current_user.id, db)
-    
-    new_message = Message(
-        chat_id=message_in.chat_id,
-        role=message_in.role,
-        content=message_in.content
-    )
-    db.add(new_message)
+
+    # Inserted directly, but with new_row()'s created_at (the write-behind
+    # clock), so it orders correctly against the chat's buffered messages
+    row = message_writer.new_row(message_in.chat_id, message_in.role, message_in.content)
+    await db.execute(message_writer.insert_statement([row]))
     await db.commit()
-    await db.refresh(new_message)
-    return new_message
+    return row
 
 @router.get("/", response_model=List[MessageResponse])
 async def list_messages(
     chat_id: UUID,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    await verify_chat_access(chat_id, current_user.id, db)
+    chat = await verify_chat_access(chat_id, current_user.id, db)
+    # Read-your-writes: commit this chat's buffered messages before reading
+    if message_writer.has_pending(chat_id):
+        await message_writer.flush()
     
-    query = select(Message).where(Message.chat_id == chat_id).order_by(Message.created_at.asc())
-    result = await db.execute(query)
-    messages = result.scalars().all()
-    return messages
+    # Chronological order; without a cursor, the newest page.
+    # X-Prev-Cursor pages to older messages, X-Next-Cursor to newer ones.
+    # Plain rows straight to JSON (see app/core/json_rows.py).
+    query = select(*json_rows.columns(MessageResponse, Message)).where(Message.chat_id == chat_id)
+    if chat.cleared_at is not None:
+        # Cleared messages not yet purged
+        query = query.where(Message.created_at > chat.cleared_at)
+    messages, prev_cursor, next_cursor = await keyset_page(
+        db, query, Message, limit, cursor, start_at_end=True
+    )
+    response = json_rows.response(messages, MessageResponse)
+    set_cursor_headers(response, prev_cursor, next_cursor)
+    return response
+
+# Control characters as match delimiters, so the excerpt can be HTML-escaped
+# before they are turned into <mark> tags
+_MARK_START, _MARK_END = "\x02", "\x03"
+HEADLINE_OPTIONS = (
+    f"StartSel={_MARK_START}, StopSel={_MARK_END}, "
+    "MaxWords=30, MinWords=10, MaxFragments=2, FragmentDelimiter=\" … \""
+)
+
+def build_search_query(
+    user_id: UUID,
+    q: str,
+    limit: int,
+    workspace_id: Optional[UUID] = None,
+    chat_id: Optional[UUID] = None,
+    after: Optional[Tuple[float, UUID]] = None,
+) -> Select:
+    """
+    Best-ranked matches of `q` (web-search syntax: "phrases", or, -exclude)
+    among the user's messages, after the (rank, id) cursor position.
+    Candidates come from one GIN index scan; chat/workspace context and
+    excerpts are only built for the page.
+    """
+    tsquery = postgresql.websearch_to_tsquery(SEARCH_CONFIG, q)
+    rank = func.ts_rank(Message.search_vector, tsquery)
+
+    # The user's chat ids as one array, so the GIN index is scanned once
+    # rather than once per chat by a nested-loop join
+    chat_ids = select(Chat.id).join(Workspace, Workspace.id == Chat.workspace_id).where(
+        Workspace.user_id == user_id, Chat.deleted_at.is_(None)
+    )
+    if workspace_id is not None:
+        chat_ids = chat_ids.where(Chat.workspace_id == workspace_id)
+    if chat_id is not None:
+        chat_ids = chat_ids.where(Chat.id == chat_id)
+    # Cleared chats awaiting the purger (normally none): their older messages
+    # are dropped by an anti-join against this small set
+    cleared = chat_ids.add_columns(Chat.cleared_at).where(Chat.cleared_at.is_not(None)).cte("cleared")
+
+    hits = select(
+        Message.id, Message.chat_id, Message.role, Message.content, Message.created_at,
+        rank.label("rank"),
+    ).where(
+        Message.search_vector.op("@@")(tsquery),
+        Message.chat_id == any_(func.array(chat_ids.scalar_subquery())),
+        ~exists().where(cleared.c.id == Message.chat_id, Message.created_at <= cleared.c.cleared_at),
+    )
+    if chat_id is not None:
+        # Unlike the array above, known when planning: only the chat's partition
+        # of messages is scanned. Across chats, every partition holding one is.
+        hits = hits.where(Message.chat_id == chat_id)
+    if after is not None:
+        hits = hits.where(tuple_(rank, Message.id) < tuple_(literal(after[0]), literal(after[1])))
+    hits = hits.order_by(rank.desc(), Message.id.desc()).limit(limit).subquery()
+
+    return (
+        select(
+            hits.c.id, hits.c.chat_id,
+            Chat.title.label("chat_title"), Chat.workspace_id, Workspace.name.label("workspace_name"),
+            hits.c.role, hits.c.created_at, hits.c.rank,
+            postgresql.ts_headline(SEARCH_CONFIG, hits.c.content, tsquery, HEADLINE_OPTIONS).label("highlight"),
+        )
+        .join(Chat, Chat.id == hits.c.chat_id)
+        .join(Workspace, Workspace.id == Chat.workspace_id)
+        .order_by(hits.c.rank.desc(), hits.c.id.desc())
+    )
+
+async def run_search(db: AsyncSession, query: Select) -> List[Row]:
+    # Plan for this query text: a cached generic plan cannot know how many
+    # messages match and picks badly for very common or absent terms
+    await db.execute(text("SET LOCAL plan_cache_mode = force_custom_plan"))
+    return list((await db.execute(query)).all())
+
+def _highlight(headline: str) -> str:
+    return html.escape(headline).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+@router.get("/search", response_model=List[MessageSearchHit])
+async def search_messages(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=256),
+    workspace_id: Optional[UUID] = None,
+    chat_id: Optional[UUID] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Best match first across all of the user's chats (optionally one
+    # workspace or chat). X-Next-Cursor pages to lower-ranked hits.
+    # Messages still in the write-behind buffer show up once flushed.
+    after = decode_rank_cursor(cursor) if cursor else None
+    query = build_search_query(current_user.id, q, limit + 1, workspace_id, chat_id, after)
+    rows = await run_search(db, query)
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if has_more:
+        set_cursor_headers(response, None, encode_rank_cursor(rows[-1].rank, rows[-1].id))
+    return [
+        MessageSearchHit(**{**row._mapping, "highlight": _highlight(row.highlight)})
+        for row in rows
+    ]
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import List, Literal
+from uuid import UUID
+from app.core import export, json_rows, message_writer
 from app.core.database import get_db
 from app.models.workspace import Workspace
 from app.models.user import User
@@ -30,7 +32,24 @@ async def list_workspaces(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    query = select(Workspace).where(Workspace.user_id == current_user.id)
+    # Plain rows straight to JSON (see app/core/json_rows.py)
+    query = select(*json_rows.columns(WorkspaceResponse, Workspace)).where(Workspace.user_id == current_user.id)
     result = await db.execute(query)
-    workspaces = result.scalars().all()
-    return workspaces
+    return json_rows.response(result, WorkspaceResponse)
+
+@router.get("/{workspace_id}/export")
+async def export_workspace(
+    workspace_id: UUID,
+    format: Literal["ndjson", "jsonl.gz"] = "ndjson",
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Every chat's history as JSON Lines, chat by chat, oldest chat first
+    query = select(Workspace.id).where(Workspace.id == workspace_id, Workspace.user_id == current_user.id)
+    if (await db.execute(query)).scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Workspace not found or access denied")
+
+    # Include buffered messages; the export reads on its own connection
+    await message_writer.flush()
+    await db.close()
+    return export.response(format, f"workspace-{workspace_id}", workspace_id=workspace_id)
@@ -0,0 +1,39 @@
+import asyncio
+import logging
+from typing import Coroutine, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Fire-and-forget work that must outlive the request that started it.
+# Holding a strong reference keeps tasks from being garbage collected
+# mid-flight, and lets the lifespan drain them on shutdown.
+_tasks: Set[asyncio.Task] = set()
+
+
+def spawn(coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+    task = asyncio.create_task(coro, name=name)
+    _tasks.add(task)
+    task.add_done_callback(_on_done)
+    return task
+
+
+def _on_done(task: asyncio.Task) -> None:
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background task {task.get_name()} failed: {task.exception()!r}")
+
+
+def pending() -> int:
+    return len(_tasks)
+
+
+async def shutdown(timeout: float = 10.0) -> None:
+    """Gives running tasks `timeout` seconds to finish, then cancels the rest."""
+    if not _tasks:
+        return
+    done, still_running = await asyncio.wait(set(_tasks), timeout=timeout)
+    for task in still_running:
+        task.cancel()
+    if still_running:
+        logger.warning(f"Cancelled {len(still_running)} background task(s) on shutdown")
+        await asyncio.gather(*still_running, return_exceptions=True)
@@ -10,15 +10,122 @@ class Settings(BaseSettings):
     POSTGRES_DB: str
     POSTGRES_PORT: int
     DATABASE_URL: Optional[str] = None
+
+    # Database connection pool, per worker (see app/core/database.py)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = False
+    # Prepared statements cached per connection; 0 behind PgBouncer in transaction mode
+    DB_STATEMENT_CACHE_SIZE: int = 100
+
+    # Prometheus metrics at GET /metrics; the request-timing middleware is
+    # only installed when enabled (see app/core/metrics.py)
+    METRICS_ENABLED: bool = True
+    # GET /stats/db and /stats/caches (pool internals, cache hit rates): off by
+    # default, enable only where the app is not reachable from the internet
+    STATS_ENABLED: bool = False
     
     OPENROUTER_API_KEY: str
     OPENROUTER_API_KEY: str
     TAVILY_API_KEY: str
 
+    # Shared OpenRouter connection pool (see app/core/openrouter.py)
+    OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
+    OPENROUTER_HTTP2: bool = True
+    OPENROUTER_MAX_CONNECTIONS: int = 200
+    OPENROUTER_MAX_KEEPALIVE_CONNECTIONS: int = 50
+    OPENROUTER_KEEPALIVE_EXPIRY: float = 60.0
+    OPENROUTER_CONNECT_TIMEOUT: float = 5.0
+    OPENROUTER_READ_TIMEOUT: float = 60.0
+    OPENROUTER_WRITE_TIMEOUT: float = 10.0
+    OPENROUTER_POOL_TIMEOUT: float = 10.0
+
+    # Prompt context: tokenizer used for Message.token_count, and the token
+    # budget for history sent with each /chats/stream turn. The rank file is
+    # not in the repo: fetched at deploy time (python -m app.core.tokens) to
+    # TOKENIZER_PATH, default backend/tokenizers/<encoding>.tiktoken
+    TOKENIZER_ENCODING: str = "llama3"
+    TOKENIZER_PATH: str = ""
+    HISTORY_TOKEN_BUDGET: int = 3000
+
+    # Rolling chat summaries: once unsummarized history exceeds the trigger,
+    # everything but the newest SUMMARY_KEEP_RECENT_TOKENS is folded into
+    # Chat.summary in the background (trigger 0 disables)
+    SUMMARY_MODEL: str = "meta-llama/llama-3.1-8b-instruct"
+    SUMMARY_TRIGGER_TOKENS: int = 2000
+    SUMMARY_KEEP_RECENT_TOKENS: int = 1000
+    SUMMARY_MAX_TOKENS: int = 300
+
+    # Background chat auto-titling (see app/core/titles.py)
+    TITLE_MODEL: str = "meta-llama/llama-3.1-8b-instruct"
+    TITLE_BATCH_SIZE: int = 20
+    TITLE_BATCH_WINDOW: float = 0.2
+    TITLE_MAX_RETRIES: int = 3
+    TITLE_RETRY_BACKOFF: float = 1.0
+
+    # Exact-match cache for deterministic (temperature=0) completions; TTL 0 disables
+    COMPLETION_CACHE_TTL: float = 3600.0
+    COMPLETION_CACHE_MAX_ENTRIES: int = 5000
+    COMPLETION_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+
+    # Write-behind message persistence (see app/core/message_writer.py)
+    MESSAGE_FLUSH_INTERVAL: float = 0.05
+    MESSAGE_FLUSH_BATCH_SIZE: int = 500
+    # Backoff after a failed flush: doubles from RETRY_DELAY up to RETRY_MAX_DELAY
+    MESSAGE_FLUSH_RETRY_DELAY: float = 1.0
+    MESSAGE_FLUSH_RETRY_MAX_DELAY: float = 30.0
+    MESSAGE_BUFFER_MAX: int = 10000
+    # true: add() returns only once its batch committed (no acknowledged loss on crash)
+    MESSAGE_WAIT_FOR_COMMIT: bool = False
+
+    # Background purge of deleted and cleared chats (see app/core/purger.py):
+    # messages per delete transaction, pause between batches, rescan interval
+    PURGE_BATCH_SIZE: int = 1000
+    PURGE_BATCH_DELAY: float = 0.1
+    PURGE_POLL_INTERVAL: float = 60.0
+
+    # Streaming history export (see app/core/export.py): rows per cursor fetch, gzip level
+    EXPORT_BATCH_SIZE: int = 1000
+    EXPORT_GZIP_LEVEL: int = 6
+
+    # Token stream coalescing: flush at this many bytes or after this delay (first token is immediate)
+    STREAM_COALESCE_MIN_BYTES: int = 32
+    STREAM_COALESCE_MAX_DELAY: float = 0.02
+    # Upstream read-ahead per stream while the client is slower; reading pauses past it
+    STREAM_COALESCE_MAX_BUFFER_BYTES: int = 64 * 1024
+
+    # Resumable SSE streams (see app/core/replay.py)
+    STREAM_REPLAY_TTL: float = 120.0
+    STREAM_REPLAY_MAX_STREAMS: int = 10000
+    STREAM_REPLAY_MAX_BYTES: int = 64 * 1024 * 1024
+    STREAM_REPLAY_MAX_STREAM_BYTES: int = 256 * 1024
+
+    # Shared Tavily client (see tavily_client.open_client)
+    TAVILY_MAX_CONNECTIONS: int = 20
+    TAVILY_MAX_CONCURRENCY: int = 10
+    TAVILY_TIMEOUT: float = 10.0
+    TAVILY_ACQUIRE_TIMEOUT: Optional[float] = 5.0
+    TAVILY_SEARCH_URL: str = "https://api.tavily.com/search"
+
+    # Live-search result cache (see search_cache in app/api/chat.py)
+    SEARCH_CACHE_TTL: float = 300.0
+    SEARCH_CACHE_MAX_ENTRIES: int = 1000
+    SEARCH_CACHE_MAX_BYTES: int = 8 * 1024 * 1024
+
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Password hashing: bcrypt work factor and dedicated worker pool size
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+
+    # Verified-principal cache in get_current_user (0 disables)
+    PRINCIPAL_CACHE_TTL: float = 60.0
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True, extra="ignore")
 
     @property
@@ -1,9 +1,59 @@
+import time
+
+from sqlalchemy import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
+from app.core import metrics
+from app.core.metrics import Histogram
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long each checkout waited for a connection
+    (including opening a new one) and how many gave up at DB_POOL_TIMEOUT.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_time = Histogram()
+        self.timeouts = 0
+
+    def recreate(self):
+        # Keep the counters when the pool is recreated (e.g. after invalidation)
+        pool = super().recreate()
+        pool.wait_time, pool.timeouts = self.wait_time, self.timeouts
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.wait_time.observe(time.perf_counter() - start)
+
 
 # Create async engine
-engine = create_async_engine(settings.ASYNC_DATABASE_URL, echo=False)
+engine = create_async_engine(
+    # SQLAlchemy's asyncpg dialect keeps its own prepared-statement cache next to asyncpg's
+    make_url(settings.ASYNC_DATABASE_URL).update_query_dict(
+        {"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)}
+    ),
+    echo=False,
+    poolclass=InstrumentedPool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    # asyncpg's own prepared-statement cache; set 0 behind PgBouncer in transaction mode
+    connect_args={"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+)
 
 # Create async session factory
 AsyncSessionLocal = async_sessionmaker(
@@ -23,3 +73,26 @@ async def get_db():
             yield session
         finally:
             await session.close()
+
+def pool_stats() -> dict:
+    """Live gauges of the connection pool, served at GET /stats/db."""
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        # Connections open beyond pool_size (negative while the pool is still filling)
+        "overflow": pool.overflow(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "timeouts": pool.timeouts,
+        "wait_time_seconds": pool.wait_time.stats(),
+    }
+
+@metrics.collector
+def _pool_metrics():
+    pool = engine.pool
+    yield from metrics.render_metric("db_pool_size", "Configured pool size", "gauge", pool.size())
+    yield from metrics.render_metric("db_pool_checked_out", "Connections checked out", "gauge", pool.checkedout())
+    yield from metrics.render_metric("db_pool_overflow", "Connections open beyond the pool size", "gauge", pool.overflow())
+    yield from metrics.render_metric("db_pool_timeouts_total", "Checkouts that hit DB_POOL_TIMEOUT", "counter", pool.timeouts)
+    yield from metrics.render_metric("db_pool_wait_seconds", "Time to check out a connection", "histogram", pool.wait_time)
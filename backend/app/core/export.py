@@ -0,0 +1,96 @@
+import zlib
+from typing import AsyncIterator, Optional
+from uuid import UUID
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, select, text
+
+from app.core.config import settings
+from app.core.database import engine
+from app.core.json_rows import columns, dumps
+from app.models.chat import Chat
+from app.models.message import Message
+from app.schemas.message import MessageResponse
+
+# Streaming export of chat history as JSON Lines (NDJSON), optionally gzip.
+#
+# Rows are read through an asyncpg server-side cursor in EXPORT_BATCH_SIZE
+# batches and each batch is encoded and sent before the next is fetched, so
+# memory per export is one batch however long the history is. The whole
+# export reads one REPEATABLE READ snapshot: a workspace export is
+# consistent across its chats. Each running export holds one pooled
+# connection until the client has received everything.
+#
+# Each line is one message, encoded like GET /messages/ (see
+# app/core/json_rows.py), oldest first per chat. Deleted chats and cleared
+# messages not yet purged are left out, as in every other read.
+
+FORMATS = {
+    # format query parameter: (media type, file extension)
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "jsonl.gz": ("application/gzip", "jsonl.gz"),
+}
+
+COLUMNS = columns(MessageResponse, Message)
+
+
+async def _batches(chats: Select) -> AsyncIterator[bytes]:
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="REPEATABLE READ", postgresql_readonly=True)
+        # A cursor opened through the wire protocol is planned for its whole
+        # result, so a large chat gets a bitmap scan and a sort (spilled to
+        # disk) before the first row. The index already yields the order.
+        await conn.execute(text("SET LOCAL enable_sort = off"))
+        chats = (await conn.execute(chats.order_by(Chat.created_at, Chat.id))).all()
+
+        # One cursor per chat: each is a range scan of the (chat_id,
+        # created_at, id) index, already in order, so nothing is sorted
+        for chat in chats:
+            query = select(*COLUMNS).where(Message.chat_id == chat.id)
+            if chat.cleared_at is not None:
+                query = query.where(Message.created_at > chat.cleared_at)
+            query = query.order_by(Message.created_at, Message.id)
+            result = await conn.stream(query.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+            async for rows in result.partitions():
+                yield b"".join(dumps(row._asdict()) + b"\n" for row in rows)
+        await conn.rollback()
+
+
+def _gzip(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    async def compressed():
+        # wbits=31: gzip container rather than raw zlib
+        compressor = zlib.compressobj(settings.EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31)
+        async for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    return compressed()
+
+
+def stream(
+    format: str,
+    chat_id: Optional[UUID] = None,
+    workspace_id: Optional[UUID] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Body of an export of one chat or of a whole workspace, in `format`
+    (a FORMATS key). Ownership must be checked by the caller.
+    """
+    chats = select(Chat.id, Chat.cleared_at).where(Chat.deleted_at.is_(None))
+    if chat_id is not None:
+        chats = chats.where(Chat.id == chat_id)
+    if workspace_id is not None:
+        chats = chats.where(Chat.workspace_id == workspace_id)
+    chunks = _batches(chats)
+    return _gzip(chunks) if format == "jsonl.gz" else chunks
+
+
+def response(format: str, filename: str, **scope: Optional[UUID]) -> StreamingResponse:
+    """Download response for stream(format, **scope), saved as `filename` plus the format's extension."""
+    media_type, extension = FORMATS[format]
+    return StreamingResponse(
+        stream(format, **scope),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{extension}"'},
+    )
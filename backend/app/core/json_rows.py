@@ -0,0 +1,49 @@
+import json
+from datetime import datetime
+from typing import Any, Iterable, List, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional, faster: pip install orjson
+    orjson = None
+
+# Lean read path for list endpoints. The query selects only the columns of
+# the response schema, as plain rows (no ORM entities or identity map), and
+# the rows are encoded straight to JSON bytes, skipping response_model
+# validation. The body is byte-for-byte what FastAPI renders for the same
+# schema: fields in schema order, compact separators, UTF-8, UTC datetimes
+# ending in "Z". The columns must already have the schema's types; nothing
+# is validated on the way out.
+
+
+def columns(schema: Type[BaseModel], model: Any) -> List[Any]:
+    """The attributes of `model` named like the fields of `schema`, in field order."""
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def _default(value: Any) -> str:
+    # asyncpg's UUID type (orjson only knows uuid.UUID itself), and datetimes for the stdlib
+    if isinstance(value, datetime):
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    return str(value)
+
+
+def dumps(obj: Any) -> bytes:
+    """`obj` as compact JSON bytes; UUIDs as strings, datetimes as ISO 8601."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_UTC_Z)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def response(rows: Iterable[Any], schema: Type[BaseModel]) -> Response:
+    """
+    A JSON array of `rows` as `schema` objects. Each row starts with the
+    columns(schema, ...) in order; extra trailing columns (e.g. a sort key
+    needed for the cursor) are left out.
+    """
+    fields = tuple(schema.model_fields)
+    return Response(dumps([dict(zip(fields, row)) for row in rows]), media_type="application/json")
@@ -0,0 +1,302 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import Insert, bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.exc import DBAPIError, IntegrityError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.tokens import count_tokens
+from app.models.chat import Chat
+from app.models.message import Message, MessageRole
+
+logger = logging.getLogger(__name__)
+
+# Write-behind persistence for chat messages. add() buffers a row and returns;
+# one worker inserts buffered rows from every chat as a single INSERT
+# statement per transaction (insert_statement()), every MESSAGE_FLUSH_INTERVAL
+# seconds or as soon as MESSAGE_FLUSH_BATCH_SIZE rows are waiting.
+#
+# Durability: with MESSAGE_WAIT_FOR_COMMIT=false (default) add() returns
+# before the row is committed, so a crash loses at most the rows of the last
+# flush window. With it true, add() waits for its batch to commit (group
+# commit): nothing acknowledged is lost, at up to one flush interval of extra
+# latency. On shutdown the buffer is flushed synchronously (stop()).
+#
+# Failures: transient errors (connection lost, timeouts, deadlocks) keep the
+# batch, retried with exponential backoff up to MESSAGE_FLUSH_RETRY_MAX_DELAY.
+# Rows the database refuses (e.g. a NUL character) are found by splitting the
+# batch, and only those are dropped; their add() fails with MessageRejected.
+# At MESSAGE_BUFFER_MAX buffered rows add() flushes before buffering, and
+# raises if that flush fails, so the buffer never grows past the limit.
+#
+# Readers that must see their own writes either merge pending() rows
+# (open_turn) or flush() first when has_pending() (list_messages). The
+# buffer is per process: with several workers, a request served by another
+# worker sees a buffered row only once it is flushed (one flush interval),
+# unless MESSAGE_WAIT_FOR_COMMIT is set. Every direct insert of a message
+# (open_turn, POST /messages/) takes its row from new_row(), so it shares
+# the created_at clock of the buffered ones and orders correctly against them.
+
+
+class MessageDropped(Exception):
+    """The message's chat was deleted before the message was flushed."""
+
+
+class MessageRejected(Exception):
+    """The database refused the message (e.g. invalid content); it was not saved."""
+
+
+# (row, commit future or None)
+_Entry = Tuple[Dict[str, Any], Optional[asyncio.Future]]
+
+_buffer: List[_Entry] = []
+# The batch currently being inserted; still visible through pending()
+_flushing: List[_Entry] = []
+_flush_lock: Optional[asyncio.Lock] = None
+_has_rows: Optional[asyncio.Event] = None
+_batch_full: Optional[asyncio.Event] = None
+_worker: Optional[asyncio.Task] = None
+_last_created_at: Optional[datetime] = None
+
+
+def _init() -> None:
+    global _flush_lock, _has_rows, _batch_full
+    if _flush_lock is None:
+        _flush_lock = asyncio.Lock()
+        _has_rows = asyncio.Event()
+        _batch_full = asyncio.Event()
+
+
+def _ensure_worker() -> None:
+    global _worker
+    _init()
+    if _worker is None:
+        if _buffer:
+            _has_rows.set()
+        _worker = asyncio.get_running_loop().create_task(_run(), name="message-writer")
+
+
+async def start() -> None:
+    _ensure_worker()
+
+
+async def stop() -> None:
+    """Stops the worker, then flushes whatever is still buffered."""
+    global _worker
+    if _worker is None:
+        return
+    worker, _worker = _worker, None
+    worker.cancel()
+    await asyncio.gather(worker, return_exceptions=True)
+    try:
+        await flush()
+    except Exception as e:
+        logger.error(f"Lost {len(_buffer)} buffered message(s) on shutdown: {e}")
+        for _, committed in _buffer:
+            if committed is not None and not committed.done():
+                committed.set_exception(e)
+
+
+def _created_at() -> datetime:
+    # Assigned at add() time, not by the database at flush time, so rows of one
+    # batch keep their order; strictly increasing within this process.
+    global _last_created_at
+    now = datetime.now(timezone.utc)
+    if _last_created_at is not None and now <= _last_created_at:
+        now = _last_created_at + timedelta(microseconds=1)
+    _last_created_at = now
+    return now
+
+
+def now() -> datetime:
+    """The next created_at value; a mark taken here orders correctly against message rows."""
+    return _created_at()
+
+
+def new_row(chat_id: UUID, role: MessageRole, content: str) -> Dict[str, Any]:
+    """A messages row with its id, token_count and created_at assigned, for add() or a direct insert."""
+    return {
+        "id": uuid.uuid4(),
+        "chat_id": chat_id,
+        "role": MessageRole(role).value,
+        "content": content,
+        "token_count": count_tokens(content),
+        "created_at": _created_at(),
+    }
+
+
+async def add(
+    chat_id: UUID,
+    role: MessageRole,
+    content: str,
+    wait_for_commit: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """
+    Buffers a message and returns its row (id, created_at and token_count
+    included). `wait_for_commit` overrides MESSAGE_WAIT_FOR_COMMIT.
+    """
+    _ensure_worker()
+    while len(_flushing) + len(_buffer) >= settings.MESSAGE_BUFFER_MAX:
+        # Backpressure: the database is not keeping up (or is down). Raises
+        # when the flush fails, before anything more is buffered.
+        await flush()
+    row = new_row(chat_id, role, content)
+    if wait_for_commit is None:
+        wait_for_commit = settings.MESSAGE_WAIT_FOR_COMMIT
+    committed = asyncio.get_running_loop().create_future() if wait_for_commit else None
+    _buffer.append((row, committed))
+    _has_rows.set()
+    if len(_buffer) >= settings.MESSAGE_FLUSH_BATCH_SIZE:
+        _batch_full.set()
+    if committed is not None:
+        await committed
+    return row
+
+
+def pending(chat_id: UUID) -> List[Dict[str, Any]]:
+    """Rows of `chat_id` not yet committed, oldest first."""
+    return [row for row, _ in _flushing + _buffer if row["chat_id"] == chat_id]
+
+
+def has_pending(chat_id: UUID) -> bool:
+    return any(row["chat_id"] == chat_id for row, _ in _flushing + _buffer)
+
+
+async def flush() -> int:
+    """Inserts everything buffered so far; returns the number of rows committed."""
+    global _buffer, _flushing
+    _init()
+    async with _flush_lock:
+        if not _buffer:
+            return 0
+        batch, _buffer = _buffer, []
+        _flushing = batch
+        try:
+            inserted, rejected = await _insert(batch)
+        except Exception as e:
+            if _is_transient(e):
+                # Keep the rows, in order, for the next flush
+                _buffer = batch + _buffer
+                _has_rows.set()
+                raise
+            # Not going to succeed on a retry either
+            logger.error(f"Dropped {len(batch)} buffered message(s), insert failed: {e}")
+            inserted, rejected = 0, {row["id"]: MessageRejected(str(e)) for row, _ in batch}
+        finally:
+            _flushing = []
+        if not _buffer:
+            _has_rows.clear()
+        if len(_buffer) < settings.MESSAGE_FLUSH_BATCH_SIZE:
+            _batch_full.clear()
+
+    for row, committed in batch:
+        if committed is not None and not committed.done():
+            if row["id"] in rejected:
+                committed.set_exception(rejected[row["id"]])
+            else:
+                committed.set_result(None)
+    return inserted
+
+
+def insert_statement(rows: List[Dict[str, Any]]) -> Insert:
+    """
+    One INSERT ... SELECT FROM unnest(<one array per column>) for all `rows`
+    (as made by new_row()). Unlike an executemany, which asyncpg runs once per
+    row, it is a single statement with six parameters at any batch size, so
+    statement-level triggers (the activity counters) fire once per flush.
+    Rows already stored are skipped, so a batch retried after a commit whose
+    reply was lost (or after part of it went in) is not duplicated.
+    """
+    table = Message.__table__
+    columns = list(rows[0])
+    source = func.unnest(*(
+        bindparam(f"{name}_values", [row[name] for row in rows], type_=ARRAY(table.c[name].type))
+        for name in columns
+    )).table_valued(*columns).render_derived()
+    return insert(table).from_select(columns, select(*source.c)).on_conflict_do_nothing()
+
+
+def _sqlstate(error: DBAPIError) -> str:
+    return getattr(error.orig, "sqlstate", None) or ""
+
+
+def _is_transient(error: Exception) -> bool:
+    # SQLSTATE classes: 08 connection, 40 deadlock/serialization, 53 out of
+    # resources, 57 shutdown/cancel, 58 system error
+    if isinstance(error, DBAPIError):
+        return (
+            error.connection_invalidated
+            or isinstance(error, (OperationalError, InterfaceError))
+            or _sqlstate(error)[:2] in ("08", "40", "53", "57", "58")
+        )
+    return isinstance(error, (OSError, asyncio.TimeoutError, PoolTimeoutError))
+
+
+async def _insert(batch: List[_Entry]) -> Tuple[int, Dict[UUID, Exception]]:
+    async with AsyncSessionLocal() as db:
+        return await _insert_rows(db, [row for row, _ in batch])
+
+
+async def _insert_rows(db, rows: List[Dict[str, Any]]) -> Tuple[int, Dict[UUID, Exception]]:
+    # Returns the number of rows inserted and the refused ones (id -> reason)
+    try:
+        await db.execute(insert_statement(rows))
+        await db.commit()
+        return len(rows), {}
+    except DBAPIError as e:
+        await db.rollback()
+        if not (isinstance(e, IntegrityError) or _sqlstate(e).startswith("22")):
+            raise
+        error = e
+
+    if isinstance(error, IntegrityError):
+        # A chat was deleted while its messages were buffered: drop just those rows
+        chat_ids = {row["chat_id"] for row in rows}
+        existing = set((await db.execute(select(Chat.id).where(Chat.id.in_(chat_ids)))).scalars())
+        rejected = {
+            row["id"]: MessageDropped(str(row["chat_id"])) for row in rows if row["chat_id"] not in existing
+        }
+        if rejected:
+            logger.warning(f"Dropped {len(rejected)} buffered message(s) of deleted chats")
+            keep = [row for row in rows if row["id"] not in rejected]
+            inserted, refused = await _insert_rows(db, keep) if keep else (0, {})
+            return inserted, {**rejected, **refused}
+
+    # Data error (22xxx), e.g. a NUL character: split the batch until the
+    # offending rows are alone, insert the rest
+    if len(rows) == 1:
+        row = rows[0]
+        logger.error(f"Dropped message {row['id']} of chat {row['chat_id']}, refused by the database: {error.orig}")
+        return 0, {row["id"]: MessageRejected(str(error.orig))}
+    middle = len(rows) // 2
+    first, first_refused = await _insert_rows(db, rows[:middle])
+    second, second_refused = await _insert_rows(db, rows[middle:])
+    return first + second, {**first_refused, **second_refused}
+
+
+async def _run() -> None:
+    failures = 0
+    while True:
+        await _has_rows.wait()
+        try:
+            await asyncio.wait_for(_batch_full.wait(), settings.MESSAGE_FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        try:
+            await flush()
+            failures = 0
+        except Exception as e:
+            # Only transient errors get here (flush() drops what cannot succeed)
+            delay = min(
+                settings.MESSAGE_FLUSH_RETRY_DELAY * 2 ** failures, settings.MESSAGE_FLUSH_RETRY_MAX_DELAY
+            )
+            failures += 1
+            logger.error(f"Message flush failed, retrying in {delay:.1f}s: {e}")
+            await asyncio.sleep(delay)
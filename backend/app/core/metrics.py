@@ -0,0 +1,206 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Upper bounds (seconds) suited to waits and latencies from ~1 ms to ~30 s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# In-process metrics with Prometheus text exposition (GET /metrics).
+# Hot-path updates are plain attribute arithmetic on pre-resolved children
+# (resolve labels once with .labels(...) where possible); all formatting
+# happens at scrape time. Single event loop per worker, so no locking.
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. observe() is a bisect and two additions, cheap
+    enough for per-request and per-checkout hot paths. Counts are per bucket
+    (not cumulative); the last slot counts observations above every bound.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total = 0
+        out = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            out.append((_format_value(bound), total))
+        out.append(("+Inf", self.count))
+        return out
+
+    def stats(self) -> Dict[str, object]:
+        return {"count": self.count, "sum": self.sum, "buckets": dict(self.cumulative())}
+
+
+class Family:
+    """A named metric with a fixed set of label names; one child per label combination."""
+
+    def __init__(self, name: str, help: str, kind: str, factory: Callable, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            child = self._children[values] = self._factory()
+        return child
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for values, child in self._children.items():
+            labels = dict(zip(self.labelnames, values))
+            if self.kind == "histogram":
+                yield from render_histogram(self.name, labels, child)
+            else:
+                yield f"{self.name}{_format_labels(labels)} {_format_value(child.value)}"
+
+
+_families: List[Family] = []
+# Scrape-time callbacks for values owned elsewhere (pool gauges, ...)
+_collectors: List[Callable[[], Iterable[str]]] = []
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Family:
+    return _register(Family(name, help, "counter", Counter, labelnames))
+
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = ()) -> Family:
+    return _register(Family(name, help, "gauge", Gauge, labelnames))
+
+
+def histogram(
+    name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+) -> Family:
+    return _register(Family(name, help, "histogram", lambda: Histogram(buckets), labelnames))
+
+
+def collector(fn: Callable[[], Iterable[str]]) -> Callable[[], Iterable[str]]:
+    _collectors.append(fn)
+    return fn
+
+
+def _register(family: Family) -> Family:
+    _families.append(family)
+    return family
+
+
+def render() -> str:
+    """All metrics in the Prometheus text format (version 0.0.4)."""
+    lines: List[str] = []
+    for family in _families:
+        lines.extend(family.render())
+    for fn in _collectors:
+        lines.extend(fn())
+    lines.append("")
+    return "\n".join(lines)
+
+
+def render_histogram(name: str, labels: Dict[str, str], hist: Histogram) -> Iterable[str]:
+    for bound, count in hist.cumulative():
+        yield f"{name}_bucket{_format_labels({**labels, 'le': bound})} {count}"
+    yield f"{name}_sum{_format_labels(labels)} {_format_value(hist.sum)}"
+    yield f"{name}_count{_format_labels(labels)} {hist.count}"
+
+
+def render_metric(name: str, help: str, kind: str, value) -> Iterable[str]:
+    """One unlabelled metric: `value` is a number, or a Histogram for kind "histogram"."""
+    yield f"# HELP {name} {help}"
+    yield f"# TYPE {name} {kind}"
+    if kind == "histogram":
+        yield from render_histogram(name, {}, value)
+    else:
+        yield f"{name} {_format_value(value)}"
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+HTTP_REQUEST_DURATION = histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the response body is complete (whole stream for streaming routes)",
+    ("method", "route", "status"),
+)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware timing every HTTP request by route template, so the
+    label set stays bounded. Stores the start time as request.state.started_at
+    for handlers that measure their own phases (stream TTFT).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        scope.setdefault("state", {})["started_at"] = start
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - start)
@@ -0,0 +1,285 @@
+import hashlib
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+import httpx
+
+from app.core import metrics, sse
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Single long-lived client shared by every request on this worker.
+# Opened/closed from the FastAPI lifespan in app/main.py.
+_client: Optional[httpx.AsyncClient] = None
+
+
+REQUEST_DURATION = metrics.histogram(
+    "openrouter_request_duration_seconds",
+    "OpenRouter call latency; for streams, until the last delta",
+    ("operation",),
+)
+STREAM_DURATION = REQUEST_DURATION.labels("stream")
+COMPLETE_DURATION = REQUEST_DURATION.labels("complete")
+FIRST_TOKEN = metrics.histogram(
+    "openrouter_first_token_seconds", "OpenRouter stream latency until the first content delta"
+).labels()
+TOKENS_PER_SECOND = metrics.histogram(
+    "openrouter_stream_tokens_per_second",
+    "Generation speed after the first token, counting one token per content delta",
+    buckets=(1, 5, 10, 25, 50, 75, 100, 150, 200, 300, 500, 1000),
+).labels()
+ERRORS = metrics.counter(
+    "openrouter_errors_total", "Failed OpenRouter calls by HTTP status or exception type", ("operation", "reason")
+)
+MALFORMED_CHUNKS = metrics.counter(
+    "openrouter_malformed_chunks_total", "Stream events whose data was not valid JSON; skipped"
+).labels()
+
+# Bytes of a malformed event's payload quoted in its log line
+MALFORMED_EXCERPT_BYTES = 200
+
+
+def _count_error(operation: str, error: Exception) -> None:
+    reason = str(error.status_code) if isinstance(error, OpenRouterError) else type(error).__name__
+    ERRORS.labels(operation, reason).inc()
+
+
+class OpenRouterError(Exception):
+    def __init__(self, status_code: int, detail: str = ""):
+        self.status_code = status_code
+        self.detail = detail
+        super().__init__(f"OpenRouter API Error: {status_code} - {detail}")
+
+
+def build_client(**overrides: Any) -> httpx.AsyncClient:
+    """
+    Builds the pooled upstream client from settings.
+    Keyword overrides are passed straight to httpx.AsyncClient (used by benchmarks).
+    """
+    options: Dict[str, Any] = {
+        "base_url": settings.OPENROUTER_BASE_URL,
+        "http2": settings.OPENROUTER_HTTP2,
+        "limits": httpx.Limits(
+            max_connections=settings.OPENROUTER_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENROUTER_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OPENROUTER_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(
+            connect=settings.OPENROUTER_CONNECT_TIMEOUT,
+            read=settings.OPENROUTER_READ_TIMEOUT,
+            write=settings.OPENROUTER_WRITE_TIMEOUT,
+            pool=settings.OPENROUTER_POOL_TIMEOUT,
+        ),
+        "headers": {
+            "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
+            "HTTP-Referer": "http://localhost:8000",
+            "X-Title": settings.PROJECT_NAME,
+        },
+    }
+    options.update(overrides)
+    return httpx.AsyncClient(**options)
+
+
+async def open_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = build_client()
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        # Outside the app lifespan (scripts, shells): create lazily.
+        logger.warning("OpenRouter client used before startup; creating it lazily")
+        _client = build_client()
+    return _client
+
+
+class StreamParser:
+    """
+    Content deltas out of the raw bytes of an OpenRouter completion stream,
+    fed exactly as read from the socket. Malformed events are logged with
+    an excerpt, counted in openrouter_malformed_chunks_total and skipped.
+    `complete` tells whether upstream finished the answer ([DONE] or a
+    finish_reason), as opposed to the connection just ending.
+    """
+
+    def __init__(self):
+        self._decoder = sse.SSEDecoder()
+        self.done = False
+        self.finish_reason: Optional[str] = None
+        self.malformed = 0
+
+    @property
+    def complete(self) -> bool:
+        return self.done or self.finish_reason is not None
+
+    def feed(self, raw: bytes) -> Sequence[str]:
+        if self.done:
+            return ()
+        events = self._decoder.feed(raw)
+        if not events:
+            # Most reads end mid-event: no list for them
+            return ()
+        deltas = []
+        for event in events:
+            if event.data == b"[DONE]":
+                self.done = True
+                break
+            try:
+                chunk = sse.loads(event.data)
+            except ValueError as e:
+                self.malformed += 1
+                MALFORMED_CHUNKS.inc()
+                logger.warning(
+                    f"Skipped malformed OpenRouter stream chunk ({e}): {event.data[:MALFORMED_EXCERPT_BYTES]!r}"
+                )
+                continue
+            if chunk.get("choices"):
+                choice = chunk["choices"][0]
+                content = choice.get("delta", {}).get("content")
+                if content:
+                    deltas.append(content)
+                if choice.get("finish_reason"):
+                    self.finish_reason = choice["finish_reason"]
+        return deltas
+
+
+async def stream_completion(
+    messages: List[Dict[str, str]],
+    model: str,
+    parser: Optional[StreamParser] = None,
+    **params: Any,
+) -> AsyncIterator[str]:
+    """
+    Streams a chat completion and yields the content deltas as they arrive.
+    Raises OpenRouterError if upstream answers with a non-200 status. Pass
+    a `parser` to inspect it afterwards (complete, malformed).
+    """
+    if parser is None:
+        parser = StreamParser()
+    data = {"model": model, "messages": messages, "stream": True, **params}
+    start = time.perf_counter()
+    first_token_at = None
+    deltas = 0
+
+    try:
+        # Raw socket reads go straight to the incremental parser: no text decoding
+        # or line splitting by httpx, and JSON is parsed from bytes. Identity
+        # encoding keeps the raw bytes parseable.
+        async with get_client().stream(
+            "POST", "/chat/completions", json=data, headers={"Accept-Encoding": "identity"}
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise OpenRouterError(response.status_code, response.text)
+
+            async for raw in response.aiter_raw():
+                for content in parser.feed(raw):
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        FIRST_TOKEN.observe(first_token_at - start)
+                    deltas += 1
+                    yield content
+                if parser.done:
+                    return
+    except Exception as e:
+        _count_error("stream", e)
+        raise
+    finally:
+        end = time.perf_counter()
+        STREAM_DURATION.observe(end - start)
+        if deltas > 1:
+            # OpenRouter sends about one token per delta
+            TOKENS_PER_SECOND.observe((deltas - 1) / max(end - first_token_at, 1e-6))
+
+
+# Exact-match cache of deterministic completions, keyed on completion_key().
+# Opt-in: only call sites using stream_completion_cached() read or fill it.
+completion_cache = TTLCache(
+    max_entries=settings.COMPLETION_CACHE_MAX_ENTRIES,
+    max_bytes=settings.COMPLETION_CACHE_MAX_BYTES,
+    ttl=settings.COMPLETION_CACHE_TTL,
+    sizeof=len,
+)
+
+
+def completion_key(messages: List[Dict[str, str]], model: str, params: Dict[str, Any]) -> str:
+    """
+    SHA-256 of the model, request parameters and messages. Message content is
+    normalized (line endings, surrounding whitespace) so formatting noise
+    from prompt templates does not split otherwise identical requests.
+    """
+    normalized = [
+        {"role": m["role"], "content": m["content"].replace("\r\n", "\n").strip()}
+        for m in messages
+    ]
+    payload = json.dumps(
+        [model, params, normalized], sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def stream_completion_cached(
+    messages: List[Dict[str, str]],
+    model: str,
+    use_cache: bool = True,
+    **params: Any,
+) -> AsyncIterator[str]:
+    """
+    stream_completion() through completion_cache. A hit is replayed at once as
+    a single delta. Only deterministic requests (temperature=0) are cached, and
+    only answers upstream finished ([DONE] or a finish_reason): a connection
+    that ends early leaves a cut-off answer, which is not stored.
+    use_cache=False skips the lookup but still refreshes the entry.
+    """
+    if params.get("temperature") != 0:
+        async for content in stream_completion(messages, model, **params):
+            yield content
+        return
+
+    key = completion_key(messages, model, params)
+    if use_cache:
+        cached = completion_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    chunks = []
+    parser = StreamParser()
+    async for content in stream_completion(messages, model, parser, **params):
+        chunks.append(content)
+        yield content
+    if chunks and parser.complete:
+        completion_cache.set(key, "".join(chunks))
+    elif chunks:
+        logger.warning("OpenRouter stream ended before the answer was finished; not cached")
+
+
+async def complete(messages: List[Dict[str, str]], model: str, **params: Any) -> str:
+    """Non-streaming chat completion; returns the assistant message content."""
+    data = {"model": model, "messages": messages, **params}
+    start = time.perf_counter()
+    try:
+        response = await get_client().post("/chat/completions", json=data)
+        if response.status_code != 200:
+            raise OpenRouterError(response.status_code, response.text)
+    except Exception as e:
+        _count_error("complete", e)
+        raise
+    finally:
+        COMPLETE_DURATION.observe(time.perf_counter() - start)
+    body = response.json()
+    return body["choices"][0]["message"].get("content") or ""
@@ -0,0 +1,127 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Keyset ("seek") pagination over (created_at, id), or (<sort key>, id) for
+# another timestamp sort key such as Chat.last_activity_at.
+#
+# A listing has a canonical order (ascending or descending on the key, id).
+# Each page is a contiguous window of it; the response carries opaque cursors
+# for the window right before (X-Prev-Cursor) and right after (X-Next-Cursor),
+# each present only when more rows may exist in that direction. Every page is
+# one range scan on a (<parent>_id, <sort key>, id) index.
+
+PREV = "prev"
+NEXT = "next"
+CURSOR_HEADERS = ["X-Prev-Cursor", "X-Next-Cursor"]
+
+
+def encode_cursor(direction: str, created_at: datetime, row_id: UUID) -> str:
+    raw = json.dumps([direction, created_at.isoformat(), str(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, datetime, UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in (PREV, NEXT):
+            raise ValueError(direction)
+        return direction, datetime.fromisoformat(created_at), UUID(row_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+async def keyset_page(
+    db: AsyncSession,
+    query: Select,
+    model: Any,
+    limit: int,
+    cursor: Optional[str] = None,
+    descending: bool = False,
+    start_at_end: bool = False,
+    sort_key: str = "created_at",
+) -> Tuple[List[Any], Optional[str], Optional[str]]:
+    """
+    Fetches one page of `query` (already filtered, unordered) in canonical order.
+
+    Without a cursor the first page is returned, or the last one when
+    `start_at_end` is set (e.g. the newest messages of a chat).
+    `sort_key` names a timestamp attribute of `model` (column or hybrid).
+    `query` selects either `model` itself or columns, which must then
+    include `id` and one labeled `sort_key`.
+    Returns (rows, prev_cursor, next_cursor).
+    """
+    sort_column = getattr(model, sort_key)
+    key = tuple_(sort_column, model.id)
+
+    if cursor:
+        direction, created_at, row_id = decode_cursor(cursor)
+        # "after" in canonical order means greater for ascending, smaller for descending
+        after = (direction == NEXT) != descending
+        query = query.where(key > (created_at, row_id) if after else key < (created_at, row_id))
+    else:
+        direction = PREV if start_at_end else NEXT
+
+    # Walk forwards for NEXT, backwards for PREV, then restore canonical order
+    scan_desc = descending if direction == NEXT else not descending
+    if scan_desc:
+        query = query.order_by(sort_column.desc(), model.id.desc())
+    else:
+        query = query.order_by(sort_column.asc(), model.id.asc())
+
+    result = await db.execute(query.limit(limit + 1))
+    # Entities for select(model), plain rows for a column select (json_rows)
+    rows = list(result.scalars() if query.column_descriptions[0]["expr"] is model else result)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == PREV:
+        rows.reverse()
+
+    if not rows:
+        return rows, None, None
+
+    first, last = rows[0], rows[-1]
+    more_before = has_more if direction == PREV else cursor is not None
+    more_after = has_more if direction == NEXT else cursor is not None
+    prev_cursor = encode_cursor(PREV, getattr(first, sort_key), first.id) if more_before else None
+    next_cursor = encode_cursor(NEXT, getattr(last, sort_key), last.id) if more_after else None
+    return rows, prev_cursor, next_cursor
+
+
+# Ranked listings (search hits) page forwards only, by (rank DESC, id DESC);
+# rank must be recomputed identically for the cursor to stay valid.
+
+def encode_rank_cursor(rank: float, row_id: UUID) -> str:
+    raw = json.dumps([NEXT, rank, str(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_rank_cursor(cursor: str) -> Tuple[float, UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, rank, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if direction != NEXT or not isinstance(rank, (int, float)):
+            raise ValueError(direction)
+        return float(rank), UUID(row_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def set_cursor_headers(response: Response, prev_cursor: Optional[str], next_cursor: Optional[str]) -> None:
+    if prev_cursor:
+        response.headers["X-Prev-Cursor"] = prev_cursor
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, or_, select, tuple_, update
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.chat import Chat
+from app.models.message import Message
+
+logger = logging.getLogger(__name__)
+
+# Background removal of soft-deleted chats and cleared messages. The
+# endpoints only set Chat.deleted_at / Chat.cleared_at, which hides the rows
+# from every read at once. This worker then deletes the hidden messages in
+# PURGE_BATCH_SIZE batches, one short transaction each with a
+# PURGE_BATCH_DELAY pause in between, so no request waits on a large delete
+# and locks and WAL are spread out. Finally it deletes the chat (the
+# ON DELETE CASCADE foreign key takes any late stragglers with it) or resets
+# cleared_at.
+#
+# All state lives in the chats table, so an interrupted purge resumes on
+# the next start. The endpoints wake the worker; it also rescans every
+# PURGE_POLL_INTERVAL seconds for work left by other workers. Two workers
+# purging the same chat only repeat each other's deletes.
+
+MESSAGES_PURGED = metrics.counter(
+    "chat_purge_messages_deleted_total", "Messages removed by the background purger"
+).labels()
+CHATS_PURGED = metrics.counter(
+    "chat_purge_completed_total", "Chat purges finished, by kind (deleted or cleared)", ("kind",)
+)
+
+_wake: Optional[asyncio.Event] = None
+_worker: Optional[asyncio.Task] = None
+
+
+def _ensure_worker() -> None:
+    global _wake, _worker
+    if _worker is None:
+        _wake = asyncio.Event()
+        _wake.set()  # scan for leftovers right away
+        _worker = asyncio.get_running_loop().create_task(_run(), name="chat-purger")
+
+
+async def start() -> None:
+    _ensure_worker()
+
+
+async def stop() -> None:
+    global _worker
+    if _worker is not None:
+        worker, _worker = _worker, None
+        worker.cancel()
+        # Whatever is left is picked up again on the next start
+        await asyncio.gather(worker, return_exceptions=True)
+
+
+def schedule() -> None:
+    """Wakes the worker after a chat was deleted or cleared."""
+    # Started by the app lifespan; lazily outside it (scripts, shells)
+    _ensure_worker()
+    _wake.set()
+
+
+async def _run() -> None:
+    while True:
+        try:
+            await asyncio.wait_for(_wake.wait(), settings.PURGE_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+        try:
+            await purge_pending()
+        except Exception as e:
+            logger.error(f"Chat purge failed, retrying later: {e}")
+
+
+async def purge_pending() -> int:
+    """Purges every deleted or cleared chat; returns the number of messages removed."""
+    async with AsyncSessionLocal() as db:
+        chat_ids = list((await db.execute(
+            select(Chat.id).where(or_(Chat.deleted_at.is_not(None), Chat.cleared_at.is_not(None)))
+        )).scalars())
+    removed = 0
+    for chat_id in chat_ids:
+        removed += await purge_chat(chat_id)
+    return removed
+
+
+async def purge_chat(chat_id: UUID) -> int:
+    """
+    Deletes the hidden messages of one chat in throttled batches, then the
+    chat itself (if deleted) or its cleared_at mark. Returns the number of
+    messages removed.
+    """
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(
+            select(Chat.deleted_at, Chat.cleared_at).where(Chat.id == chat_id)
+        )).one_or_none()
+    if row is None or (row.deleted_at is None and row.cleared_at is None):
+        return 0
+    # Deletion wins over a clear of the same chat
+    cleared_at = None if row.deleted_at is not None else row.cleared_at
+
+    removed = 0
+    after: Optional[Tuple[datetime, UUID]] = None
+    while True:
+        batch, after = await _delete_batch(chat_id, cleared_at, after)
+        removed += batch
+        MESSAGES_PURGED.inc(batch)
+        if batch < settings.PURGE_BATCH_SIZE:
+            break
+        await asyncio.sleep(settings.PURGE_BATCH_DELAY)
+
+    async with AsyncSessionLocal() as db:
+        if cleared_at is None:
+            await db.execute(delete(Chat).where(Chat.id == chat_id, Chat.deleted_at.is_not(None)))
+        else:
+            # Rows that landed behind the keyset cursor (normally none), and the
+            # mark itself unless the chat was cleared again meanwhile
+            await db.execute(delete(Message).where(Message.chat_id == chat_id, Message.created_at <= cleared_at))
+            await db.execute(
+                update(Chat).where(Chat.id == chat_id, Chat.cleared_at == cleared_at).values(cleared_at=None)
+            )
+        await db.commit()
+    CHATS_PURGED.labels("cleared" if cleared_at is not None else "deleted").inc()
+    logger.info(f"Purged {removed} message(s) of chat {chat_id}")
+    return removed
+
+
+async def _delete_batch(
+    chat_id: UUID,
+    cleared_at: Optional[datetime],
+    after: Optional[Tuple[datetime, UUID]],
+) -> Tuple[int, Optional[Tuple[datetime, UUID]]]:
+    # Oldest first along the (chat_id, created_at, id) index, resuming after
+    # the last deleted key, so later batches do not rescan dead index entries
+    victims = select(Message.id).where(Message.chat_id == chat_id)
+    if cleared_at is not None:
+        victims = victims.where(Message.created_at <= cleared_at)
+    if after is not None:
+        victims = victims.where(tuple_(Message.created_at, Message.id) > tuple_(*after))
+    victims = victims.order_by(Message.created_at, Message.id).limit(settings.PURGE_BATCH_SIZE)
+
+    async with AsyncSessionLocal() as db:
+        deleted = (await db.execute(
+            # chat_id too, so a partitioned messages table is pruned to the chat's partition
+            delete(Message).where(Message.chat_id == chat_id, Message.id.in_(victims.scalar_subquery()))
+            .returning(Message.created_at, Message.id)
+            .execution_options(synchronize_session=False)
+        )).all()
+        await db.commit()
+    if not deleted:
+        return 0, after
+    return len(deleted), max((row.created_at, row.id) for row in deleted)
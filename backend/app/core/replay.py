@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import re
+import uuid
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+from uuid import UUID
+
+from app.core import background
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Resumable Server-Sent Events. A generation runs as a background task that
+# drains the upstream into a ReplayBuffer; HTTP responses are only readers of
+# that buffer. A dropped client therefore never stops (or re-pays for) the
+# generation, and can reconnect with Last-Event-ID to pick up where it left off.
+# Buffers live in this process only: resuming needs the same worker.
+
+
+class ReplayGap(Exception):
+    """The events after the requested id were already dropped from the buffer."""
+
+
+class ReplayBuffer:
+    """
+    Numbered events of one generation, kept for reconnecting readers.
+
+    Ids start at 1. Once the retained payload exceeds `max_bytes`, the oldest
+    events are dropped; readers that still needed them get a ReplayGap.
+    """
+
+    def __init__(self, owner_id: UUID, max_bytes: int):
+        self.id = uuid.uuid4().hex
+        self.owner_id = owner_id
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.last_id = 0
+        self.done = False
+        # (id, event type or None for plain data, data)
+        self._events: Deque[Tuple[int, Optional[str], str]] = deque()
+        self._wakeup = asyncio.Event()
+
+    @property
+    def first_id(self) -> int:
+        return self._events[0][0] if self._events else self.last_id + 1
+
+    def append(self, data: str, event: Optional[str] = None) -> None:
+        self.last_id += 1
+        self._events.append((self.last_id, event, data))
+        self.nbytes += len(data)
+        while self.nbytes > self.max_bytes and len(self._events) > 1:
+            self.nbytes -= len(self._events.popleft()[2])
+        self._notify()
+
+    def finish(self) -> None:
+        self.done = True
+        self._notify()
+
+    def _notify(self) -> None:
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+
+    async def events(self, after: int = 0) -> AsyncIterator[Tuple[int, Optional[str], str]]:
+        """Yields every event with id > `after`, then live ones until the generation ends."""
+        while True:
+            if after < self.first_id - 1:
+                raise ReplayGap(f"events {after + 1}..{self.first_id - 1} were dropped")
+            for entry in [e for e in self._events if e[0] > after]:
+                yield entry
+                after = entry[0]
+            if self.done and after >= self.last_id:
+                return
+            if after >= self.last_id:
+                await self._wakeup.wait()
+
+
+# Registry of generations, re-registered on every event so the TTL counts from
+# the last activity and the byte bound sees each buffer's current size.
+_buffers = TTLCache(
+    max_entries=settings.STREAM_REPLAY_MAX_STREAMS,
+    max_bytes=settings.STREAM_REPLAY_MAX_BYTES,
+    ttl=settings.STREAM_REPLAY_TTL,
+    sizeof=lambda buffer: buffer.nbytes,
+)
+_active: Dict[str, ReplayBuffer] = {}
+
+
+def start(owner_id: UUID, chunks: AsyncIterator[str]) -> ReplayBuffer:
+    """Drains `chunks` into a new buffer in the background, independent of any client."""
+    buffer = ReplayBuffer(owner_id, settings.STREAM_REPLAY_MAX_STREAM_BYTES)
+    _buffers.set(buffer.id, buffer)
+    background.spawn(_drain(buffer, chunks), name=f"stream-{buffer.id}")
+    return buffer
+
+
+def append(buffer: ReplayBuffer, data: str, event: Optional[str] = None) -> None:
+    buffer.append(data, event)
+    _buffers.set(buffer.id, buffer)
+
+
+async def _drain(buffer: ReplayBuffer, chunks: AsyncIterator[str]) -> None:
+    _active[buffer.id] = buffer
+    try:
+        async for chunk in chunks:
+            append(buffer, chunk)
+    except Exception as e:
+        logger.error(f"Stream {buffer.id} failed: {e}")
+        append(buffer, "Stream Error", event="error")
+    finally:
+        _active.pop(buffer.id, None)
+        append(buffer, "", event="done")
+        buffer.finish()
+
+
+def get(stream_id: str) -> Optional[ReplayBuffer]:
+    return _buffers.get(stream_id)
+
+
+_LINE_BREAK_RE = re.compile(r"\r\n|\r|\n")
+
+
+def format_event(event_id: int, event: Optional[str], data: str) -> str:
+    lines = [f"id: {event_id}"]
+    if event:
+        lines.append(f"event: {event}")
+    # Multi-line payloads become one data field per line; clients rejoin them with "\n"
+    lines.extend(f"data: {line}" for line in _LINE_BREAK_RE.split(data))
+    return "\n".join(lines) + "\n\n"
+
+
+async def sse(buffer: ReplayBuffer, after: int = 0) -> AsyncIterator[str]:
+    """Server-Sent Events body replaying `buffer` from id `after` onwards."""
+    try:
+        async for event_id, event, data in buffer.events(after):
+            yield format_event(event_id, event, data)
+    except ReplayGap as e:
+        yield format_event(buffer.last_id, "error", f"Replay unavailable: {e}")
+
+
+def parse_last_event_id(value: Optional[str]) -> int:
+    try:
+        return max(0, int(value)) if value else 0
+    except ValueError:
+        return 0
+
+
+def stats() -> Dict[str, int]:
+    return {**_buffers.stats(), "active": len(_active)}
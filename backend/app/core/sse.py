@@ -0,0 +1,97 @@
+import json
+from typing import Any, Callable, List, NamedTuple, Optional
+
+try:
+    import orjson
+except ImportError:  # optional, faster: pip install orjson
+    orjson = None
+
+
+def _stdlib_loads(data: bytes) -> Any:
+    # The stdlib parses str faster than bytes (no encoding sniffing)
+    return json.loads(data.decode("utf-8"))
+
+
+# JSON decoder for event payloads; both raise ValueError subclasses on bad input
+loads: Callable[[bytes], Any] = orjson.loads if orjson is not None else _stdlib_loads
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+class ServerSentEvent(NamedTuple):
+    event: str
+    data: bytes
+    id: Optional[str]
+
+
+class SSEDecoder:
+    """
+    Incremental text/event-stream parser over raw bytes, per the WHATWG rules:
+    CR, LF and CRLF line endings, ":" comment lines, multi-line data joined
+    with LF, and event/id fields. Feed it chunks exactly as read from the
+    socket; events are returned once their terminating blank line arrives.
+    Payloads stay bytes: orjson parses them without an intermediate str.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        # Where to resume looking for a blank line, so slow reads are not rescanned
+        self._scanned = 0
+        self._pending_cr = False
+        self.last_event_id: Optional[str] = None
+        self.retry: Optional[int] = None
+
+    def feed(self, chunk: bytes) -> List[ServerSentEvent]:
+        if self._pending_cr:
+            chunk = b"\r" + chunk
+            self._pending_cr = False
+        if b"\r" in chunk:
+            # A trailing CR may be the first half of a CRLF split across reads
+            if chunk.endswith(b"\r"):
+                chunk = chunk[:-1]
+                self._pending_cr = True
+            chunk = chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+        buffer = self._buffer
+        buffer += chunk
+        end = buffer.rfind(b"\n\n", max(0, self._scanned - 1))
+        if end < 0:
+            self._scanned = len(buffer)
+            return []
+
+        # Every block up to the last blank line is one complete event
+        blocks = bytes(buffer[:end]).split(b"\n\n")
+        del buffer[:end + 2]
+        self._scanned = 0
+        events = []
+        for block in blocks:
+            if block[:6] == b"data: " and b"\n" not in block:
+                # Fast path: a single data line, the shape of every OpenRouter chunk
+                events.append(ServerSentEvent("message", block[6:], self.last_event_id))
+            elif block:
+                event = self._parse_block(block)
+                if event is not None:
+                    events.append(event)
+        return events
+
+    def _parse_block(self, block: bytes) -> Optional[ServerSentEvent]:
+        data: List[bytes] = []
+        event_type = "message"
+        for line in block.split(b"\n"):
+            if not line or line[0] == 0x3A:  # ":" starts a comment (keep-alives)
+                continue
+            name, _, value = line.partition(b":")
+            if value[:1] == b" ":
+                value = value[1:]
+            if name == b"data":
+                data.append(value)
+            elif name == b"event":
+                event_type = value.decode("utf-8", "replace") or "message"
+            elif name == b"id":
+                if b"\0" not in value:
+                    self.last_event_id = value.decode("utf-8", "replace")
+            elif name == b"retry":
+                if value.isdigit():
+                    self.retry = int(value)
+        if not data:
+            return None
+        return ServerSentEvent(event_type, b"\n".join(data), self.last_event_id)
@@ -0,0 +1,138 @@
+import logging
+from typing import Set
+from uuid import UUID
+
+from sqlalchemy import and_, exists, func, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import background, openrouter
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.tokens import MESSAGE_TOKEN_OVERHEAD, count_tokens
+from app.models.chat import Chat
+from app.models.message import Message
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on messages folded into the summary per update
+MAX_FOLD_MESSAGES = 200
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an AI assistant. "
+    "Merge the new messages into the existing summary. "
+    "Keep facts, names, numbers, decisions, user preferences and open questions. "
+    "Drop greetings and filler. Write concise plain prose."
+)
+
+# Chats with an update queued or running in this process
+_pending: Set[UUID] = set()
+
+
+def unsummarized(chat: Chat):
+    """Filter for the messages of `chat` not yet folded into its summary (nor cleared)."""
+    condition = Message.chat_id == chat.id
+    if chat.cleared_at is not None:
+        condition = and_(condition, Message.created_at > chat.cleared_at)
+    if chat.summarized_until_id is not None:
+        condition = and_(
+            condition,
+            tuple_(Message.created_at, Message.id) > tuple_(chat.summarized_until_at, chat.summarized_until_id),
+        )
+    return condition
+
+
+def should_summarize(unsummarized_tokens: int) -> bool:
+    return 0 < settings.SUMMARY_TRIGGER_TOKENS < unsummarized_tokens
+
+
+def schedule(chat_id: UUID) -> None:
+    """Queues a background summary update; no-op if one is already pending for this chat."""
+    if chat_id in _pending:
+        return
+    _pending.add(chat_id)
+    background.spawn(_run(chat_id), name=f"summarize-{chat_id}")
+
+
+async def _run(chat_id: UUID) -> None:
+    try:
+        async with AsyncSessionLocal() as db:
+            await update_summary(db, chat_id)
+    except Exception as e:
+        logger.error(f"Summary update failed for chat {chat_id}: {e}")
+    finally:
+        _pending.discard(chat_id)
+
+
+async def update_summary(db: AsyncSession, chat_id: UUID) -> bool:
+    """
+    Folds every unsummarized message except the newest
+    SUMMARY_KEEP_RECENT_TOKENS worth into Chat.summary.
+    Returns True if the summary advanced.
+    """
+    chat = await db.get(Chat, chat_id)
+    if chat is None or chat.deleted_at is not None:
+        return False
+
+    newest_first = (Message.created_at.desc(), Message.id.desc())
+    recent = (
+        select(
+            Message.id,
+            Message.role,
+            Message.content,
+            Message.created_at,
+            func.sum(Message.token_count + MESSAGE_TOKEN_OVERHEAD)
+                .over(order_by=newest_first).label("running_tokens"),
+        )
+        .where(unsummarized(chat))
+        .subquery()
+    )
+    result = await db.execute(
+        select(recent)
+        .where(recent.c.running_tokens > settings.SUMMARY_KEEP_RECENT_TOKENS)
+        .order_by(recent.c.created_at.asc(), recent.c.id.asc())
+        .limit(MAX_FOLD_MESSAGES)
+    )
+    rows = result.all()
+    # End the read transaction so no pooled connection is held during the LLM call
+    await db.commit()
+    if not rows:
+        return False
+
+    transcript = "\n".join(f"{row.role}: {row.content}" for row in rows)
+    summary = (await openrouter.complete(
+        [
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": f"Existing summary:\n{chat.summary or '(none)'}\n\nNew messages:\n{transcript}"
+            },
+        ],
+        settings.SUMMARY_MODEL,
+        temperature=0,
+        max_tokens=settings.SUMMARY_MAX_TOKENS,
+    )).strip()
+    if not summary:
+        return False
+
+    # Optimistic: only advance from the pointer we read, only if the chat was
+    # not cleared meanwhile and the folded messages still exist, so neither a
+    # concurrent update nor a cleared chat is overwritten.
+    last = rows[-1]
+    result = await db.execute(
+        update(Chat)
+        .where(
+            Chat.id == chat_id,
+            Chat.summarized_until_id.is_not_distinct_from(chat.summarized_until_id),
+            Chat.cleared_at.is_not_distinct_from(chat.cleared_at),
+            Chat.deleted_at.is_(None),
+            exists().where(Message.chat_id == chat_id, Message.id == last.id),
+        )
+        .values(
+            summary=summary,
+            summary_token_count=count_tokens(summary),
+            summarized_until_at=last.created_at,
+            summarized_until_id=last.id,
+        )
+    )
+    await db.commit()
+    return result.rowcount == 1
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import bindparam, update
+
+from app.core import openrouter
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.chat import Chat
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TITLE = "New Chat"
+MAX_TITLE_CHARS = 80
+
+TITLE_SYSTEM_PROMPT = (
+    "You write short chat titles. For each numbered message, write a 3-5 word title "
+    "summarizing it. Respond only with a JSON object mapping each number to its title, "
+    'e.g. {"1": "First title", "2": "Second title"}.'
+)
+
+# Auto-titling runs off the request path: stream endpoints enqueue the first
+# message of a chat, and one worker batches pending chats from many users
+# into a single upstream completion, retrying the ones that fail.
+
+
+@dataclass
+class TitleJob:
+    chat_id: UUID
+    message: str
+    attempts: int = 0
+
+
+_queue: Optional[asyncio.Queue] = None
+_worker: Optional[asyncio.Task] = None
+# Chats queued or awaiting retry, so repeated first messages enqueue once
+_queued: Set[UUID] = set()
+# Long-pollers waiting for a chat's title (see wait_for_title)
+_waiters: Dict[UUID, List[asyncio.Future]] = {}
+
+
+def _ensure_worker() -> None:
+    global _queue, _worker
+    if _worker is None:
+        _queue = asyncio.Queue()
+        _worker = asyncio.get_running_loop().create_task(_run(), name="chat-titles")
+
+
+async def start() -> None:
+    _ensure_worker()
+
+
+async def stop() -> None:
+    global _queue, _worker
+    if _worker is not None:
+        worker, _worker = _worker, None
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+        if _queue.qsize():
+            logger.warning(f"Dropped {_queue.qsize()} pending chat title(s) on shutdown")
+        _queue = None
+        _queued.clear()
+
+
+def enqueue(chat_id: UUID, message: str) -> None:
+    if chat_id in _queued:
+        return
+    # Started by the app lifespan; lazily outside it (scripts, shells)
+    _ensure_worker()
+    _queued.add(chat_id)
+    _queue.put_nowait(TitleJob(chat_id, message))
+
+
+def _put(job: TitleJob) -> None:
+    if _queue is not None:
+        _queue.put_nowait(job)
+
+
+async def wait_for_title(chat_id: UUID, timeout: float) -> Optional[str]:
+    """Waits up to `timeout` seconds for this process to title the chat."""
+    future = asyncio.get_running_loop().create_future()
+    _waiters.setdefault(chat_id, []).append(future)
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        waiters = _waiters.get(chat_id, [])
+        if future in waiters:
+            waiters.remove(future)
+        if not waiters:
+            _waiters.pop(chat_id, None)
+
+
+def _notify(chat_id: UUID, title: Optional[str]) -> None:
+    for future in _waiters.pop(chat_id, []):
+        if not future.done():
+            future.set_result(title)
+
+
+async def _run() -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _queue.get()]
+        deadline = loop.time() + settings.TITLE_BATCH_WINDOW
+        while len(batch) < settings.TITLE_BATCH_SIZE:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(_queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        attempts = [job.attempts for job in batch]
+        try:
+            await _process(batch)
+        except Exception as e:
+            # Unexpected: _process() handles upstream and save errors itself.
+            # Retry only jobs it neither titled nor already rescheduled.
+            logger.error(f"Chat title batch failed: {e}")
+            for job, before in zip(batch, attempts):
+                if job.attempts == before and job.chat_id in _queued:
+                    _retry(job)
+
+
+async def _process(batch: List[TitleJob]) -> None:
+    try:
+        titles = await _generate_titles([job.message for job in batch])
+    except Exception as e:
+        logger.error(f"Auto-rename failed for {len(batch)} chat(s): {e}")
+        titles = {}
+
+    done = []
+    for number, job in enumerate(batch, 1):
+        title = titles.get(number)
+        if title:
+            done.append((job, title))
+        else:
+            _retry(job)
+
+    if done:
+        try:
+            await _save_titles(done)
+        except Exception as e:
+            logger.error(f"Saving {len(done)} chat title(s) failed: {e}")
+            for job, _ in done:
+                _retry(job)
+            return
+        for job, title in done:
+            _queued.discard(job.chat_id)
+            _notify(job.chat_id, title)
+
+
+def _retry(job: TitleJob) -> None:
+    job.attempts += 1
+    if job.attempts > settings.TITLE_MAX_RETRIES:
+        logger.error(f"Giving up on title for chat {job.chat_id} after {job.attempts} attempts")
+        _queued.discard(job.chat_id)
+        _notify(job.chat_id, None)
+        return
+    delay = settings.TITLE_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+    asyncio.get_running_loop().call_later(delay, _put, job)
+
+
+async def _generate_titles(messages: List[str]) -> Dict[int, str]:
+    numbered = "\n".join(
+        f"{number}. {message[:500]}" for number, message in enumerate(messages, 1)
+    )
+    content = await openrouter.complete(
+        [
+            {"role": "system", "content": TITLE_SYSTEM_PROMPT},
+            {"role": "user", "content": numbered},
+        ],
+        settings.TITLE_MODEL,
+        temperature=0,
+        max_tokens=20 * len(messages) + 20,
+    )
+    return parse_titles(content, len(messages))
+
+
+def parse_titles(content: str, expected: int) -> Dict[int, str]:
+    titles = {}
+    try:
+        raw = json.loads(content[content.index("{"):content.rindex("}") + 1])
+        for key, value in raw.items():
+            number = int(key)
+            if 1 <= number <= expected and isinstance(value, str):
+                titles[number] = value
+    except ValueError:
+        # Not JSON; a lone message's reply is usually the bare title
+        if expected == 1:
+            titles[1] = content
+    return {
+        number: clean
+        for number, title in titles.items()
+        if (clean := title.strip().replace('"', '')[:MAX_TITLE_CHARS].strip())
+    }
+
+
+async def _save_titles(done: List[tuple]) -> None:
+    table = Chat.__table__
+    # Only replace the placeholder, never a title the user set meanwhile
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"), table.c.title == DEFAULT_TITLE)
+        .values(title=bindparam("b_title"))
+    )
+    async with AsyncSessionLocal() as db:
+        await db.execute(stmt, [{"b_id": job.chat_id, "b_title": title} for job, title in done])
+        await db.commit()
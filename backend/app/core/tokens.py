@@ -0,0 +1,108 @@
+import base64
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Any, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Fixed per-message cost of the chat template, added on top of the stored
+# content token_count when budgeting context. Llama 3:
+# <|start_header_id|>role<|end_header_id|>\n\n ... <|eot_id|>
+MESSAGE_TOKEN_OVERHEAD = 5
+
+# BPE rank files (tiktoken format) are not distributed with this repo: the
+# Llama 3 tokenizer is under Meta's Llama 3 Community License. Each deploy
+# fetches it once (python -m app.core.tokens, with an HF_TOKEN of an account
+# that accepted the license) and load() checks it against the hash below, so
+# counts are exact and the app never needs the network at runtime.
+TOKENIZER_DIR = Path(__file__).resolve().parents[2] / "tokenizers"
+
+# Encoding -> (pre-tokenization split pattern, source URL, sha256 of the file)
+ENCODINGS = {
+    "llama3": (
+        r"(?i:'s|'t|'re|'ve|'m|'ll|'d)|[^\r\n\p{L}\p{N}]?\p{L}+|\p{N}{1,3}"
+        r"| ?[^\s\p{L}\p{N}]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+",
+        "https://huggingface.co/meta-llama/Meta-Llama-3-8B/resolve/main/original/tokenizer.model",
+        "82e9d31979e92ab929cd544440f129d9ecd797b69e327f80f17e1c50d5551b55",
+    ),
+}
+
+_encoding: Optional[Any] = None
+
+
+def _encoding_spec() -> tuple:
+    name = settings.TOKENIZER_ENCODING
+    if name not in ENCODINGS:
+        raise ValueError(f"Unknown TOKENIZER_ENCODING '{name}', expected one of {sorted(ENCODINGS)}")
+    return ENCODINGS[name]
+
+
+def tokenizer_path() -> Path:
+    if settings.TOKENIZER_PATH:
+        return Path(settings.TOKENIZER_PATH)
+    return TOKENIZER_DIR / f"{settings.TOKENIZER_ENCODING}.tiktoken"
+
+
+def load() -> None:
+    """
+    Loads TOKENIZER_ENCODING once per process; raises if it cannot be loaded.
+    Called at app startup, so a missing or broken tokenizer fails the boot
+    rather than the first request. Other entry points (migrations, scripts)
+    load it on first use.
+    """
+    global _encoding
+    if _encoding is not None:
+        return
+    import tiktoken
+
+    name = settings.TOKENIZER_ENCODING
+    pattern, _, sha256 = _encoding_spec()
+    path = tokenizer_path()
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        raise FileNotFoundError(
+            f"Tokenizer file for '{name}' not found at {path}; fetch it with `python -m app.core.tokens`"
+        ) from None
+    if hashlib.sha256(data).hexdigest() != sha256:
+        raise ValueError(f"Tokenizer file {path} is not the '{name}' rank file (sha256 mismatch)")
+    ranks = {}
+    for line in data.splitlines():
+        if line.strip():
+            token, rank = line.split()
+            ranks[base64.b64decode(token)] = int(rank)
+    _encoding = tiktoken.Encoding(name, pat_str=pattern, mergeable_ranks=ranks, special_tokens={})
+    logger.info(f"Loaded tokenizer '{name}' from {path} ({len(ranks)} tokens)")
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is None:
+        load()
+    # Special-token text counts as the plain text it is
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def fetch() -> Path:
+    """Downloads TOKENIZER_ENCODING's rank file to tokenizer_path(), checking its hash."""
+    import httpx
+
+    _, url, sha256 = _encoding_spec()
+    path = tokenizer_path()
+    headers = {"Authorization": f"Bearer {os.environ['HF_TOKEN']}"} if os.environ.get("HF_TOKEN") else {}
+    response = httpx.get(url, headers=headers, follow_redirects=True, timeout=60)
+    response.raise_for_status()
+    if hashlib.sha256(response.content).hexdigest() != sha256:
+        raise ValueError(f"Downloaded {url} does not match the expected sha256")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".part")
+    partial.write_bytes(response.content)
+    partial.replace(path)
+    return path
+
+
+if __name__ == "__main__":
+    print(f"Fetched {fetch()}")
@@ -5,14 +5,56 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
 from app.core.database import get_db
 from app.core import security
+from app.core.cache import TTLCache
 from app.models.user import User
 from app.schemas.user import TokenData
-from sqlalchemy import select
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+import time
 import uuid
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# token -> detached User, so verified callers skip the JWT decode and user lookup.
+# Entries never outlive the token's own `exp`. Indexed by user id, so
+# invalidate_user() drops a user's tokens without a scan.
+principal_cache = TTLCache(
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl=settings.PRINCIPAL_CACHE_TTL,
+    group=lambda user: user.id,
+)
+
+def invalidate_token(token: str) -> None:
+    principal_cache.pop(token)
+
+def invalidate_user(user_id: uuid.UUID) -> int:
+    """Drops every cached token of a user (e.g. after deletion or a password change)."""
+    return principal_cache.pop_group(user_id)
+
+# Any ORM change to a User (attribute update, session.delete()) invalidates it
+# once the transaction commits, so the next request reads the committed row.
+# Bulk UPDATE/DELETE statements bypass the ORM: call invalidate_user() after
+# them. Invalidation is per process; other workers drop the user at the TTL.
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    changed = [obj.id for obj in (*session.dirty, *session.deleted) if isinstance(obj, User)]
+    if changed:
+        session.info.setdefault("changed_users", set()).update(changed)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop("changed_users", ()):
+        invalidate_user(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session):
+    session.info.pop("changed_users", None)
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
+    user = principal_cache.get(token)
+    if user is not None:
+        return user
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -33,4 +75,9 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     
     if user is None:
         raise credentials_exception
+
+    # Detach so the cached instance is never tied to (or refreshed by) this session
+    db.expunge(user)
+    exp = payload.get("exp")
+    principal_cache.set(token, user, ttl=exp - time.time() if exp else None)
     return user
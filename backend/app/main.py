@@ -1,8 +1,46 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from app.api import auth, workspace, chat, message
 from app.core.config import settings
+from app.core.database import pool_stats
+from app.core import background, message_writer, metrics, openrouter, purger, replay, security, titles, tokens
+from app.core.pagination import CURSOR_HEADERS
+from app.dependencies import principal_cache
+import tavily_client
 
-app = FastAPI(title=settings.PROJECT_NAME)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fails the boot if the tokenizer cannot be loaded, instead of counting wrong
+    tokens.load()
+    # Startup: one pooled, keep-alive upstream client per worker
+    await openrouter.open_client()
+    await tavily_client.open_client(
+        max_connections=settings.TAVILY_MAX_CONNECTIONS,
+        max_concurrency=settings.TAVILY_MAX_CONCURRENCY,
+        timeout=settings.TAVILY_TIMEOUT,
+        acquire_timeout=settings.TAVILY_ACQUIRE_TIMEOUT,
+        search_url=settings.TAVILY_SEARCH_URL,
+    )
+    await titles.start()
+    await message_writer.start()
+    # Resumes purges interrupted by a restart
+    await purger.start()
+    try:
+        yield
+    finally:
+        # Shutdown: let background jobs finish, then close pooled connections
+        await titles.stop()
+        await purger.stop()
+        await background.shutdown()
+        # Synchronous flush of buffered messages, after generations finished
+        await message_writer.stop()
+        await tavily_client.close_client()
+        await openrouter.close_client()
+        security.shutdown_password_executor()
+
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -13,8 +51,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=CURSOR_HEADERS + ["X-Title-Pending", "X-Stream-Id"],
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(auth.router)
 app.include_router(workspace.router)
 app.include_router(chat.router)
@@ -23,3 +65,27 @@ app.include_router(message.router)
 @app.get("/")
 async def root():
     return {"message": "AI Chat Platform Backend API"}
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    if not settings.METRICS_ENABLED:
+        return Response(status_code=404)
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/stats/db", include_in_schema=False)
+async def db_stats():
+    if not settings.STATS_ENABLED:
+        return Response(status_code=404)
+    return pool_stats()
+
+@app.get("/stats/caches", include_in_schema=False)
+async def cache_stats():
+    if not settings.STATS_ENABLED:
+        return Response(status_code=404)
+    return {
+        "principal": principal_cache.stats(),
+        "search": chat.search_cache.stats(),
+        "search_flight": chat.search_flight.stats(),
+        "completion": openrouter.completion_cache.stats(),
+        "stream_replay": replay.stats(),
+    }
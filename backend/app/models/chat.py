@@ -1,16 +1,60 @@
 import uuid
-from sqlalchemy import String, DateTime, func, ForeignKey
+from datetime import datetime
+from sqlalchemy import String, Integer, DateTime, func, ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.core.database import Base
 
 class Chat(Base):
     __tablename__ = "chats"
+    __table_args__ = (
+        # Serves "chats of a workspace ordered by (created_at, id)" as one range scan
+        Index("ix_chats_workspace_id_created_at_id", "workspace_id", "created_at", "id"),
+        # Chats with rows left for the background purger (app/core/purger.py)
+        Index(
+            "ix_chats_purge_pending", "id",
+            postgresql_where=text("deleted_at IS NOT NULL OR cleared_at IS NOT NULL"),
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title: Mapped[str | None] = mapped_column(String, nullable=True)
-    workspace_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("workspaces.id"), nullable=False, index=True)
+    workspace_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("workspaces.id", ondelete="CASCADE"), nullable=False)
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
+    # Rolling summary of every message up to and including (summarized_until_at, summarized_until_id);
+    # maintained in the background by app/core/summaries.py
+    summary: Mapped[str | None] = mapped_column(String, nullable=True)
+    summary_token_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    summarized_until_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    summarized_until_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), nullable=True)
+
+    # Soft delete: a deleted chat is hidden from every read at once, and
+    # messages created at or before cleared_at are hidden the same way. The
+    # rows are removed in the background by app/core/purger.py, which then
+    # deletes the chat or resets cleared_at.
+    deleted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    cleared_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    # Activity counters over the visible messages, maintained by triggers on
+    # messages in the inserting/deleting transaction (migration 8h9i0j1k2l3m)
+    message_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    last_message_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    @hybrid_property
+    def last_activity_at(self) -> datetime:
+        """Sort key for "recently active first": the newest message, or creation for empty chats."""
+        return self.last_message_at or self.created_at
+
+    @last_activity_at.inplace.expression
+    @classmethod
+    def _last_activity_at_expression(cls):
+        return func.coalesce(cls.last_message_at, cls.created_at)
+
     workspace = relationship("Workspace", back_populates="chats")
-    messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan")
+    messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan", passive_deletes=True)
+
+
+# Serves "chats of a workspace by last activity" (list_chats?sort=activity) as one range scan
+Index("ix_chats_workspace_id_last_activity", Chat.workspace_id, Chat.last_activity_at, Chat.id)
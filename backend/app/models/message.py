@@ -1,21 +1,49 @@
 import uuid
-from sqlalchemy import String, DateTime, func, ForeignKey, Enum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import String, Integer, DateTime, func, ForeignKey, Enum, Index, Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.core.database import Base
+from app.core.tokens import count_tokens
 import enum
 
+# Text search configuration baked into Message.search_vector; changing it
+# needs a migration that redefines the column
+SEARCH_CONFIG = "english"
+
 class MessageRole(str, enum.Enum):
     USER = "user"
     ASSISTANT = "assistant"
 
+def _content_token_count(context) -> int:
+    return count_tokens(context.get_current_parameters()["content"])
+
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Serves "messages of a chat ordered by (created_at, id)" as one range scan
+        Index("ix_messages_chat_id_created_at_id", "chat_id", "created_at", "id"),
+        # Full-text search over message content (GET /messages/search)
+        Index("ix_messages_search_vector", "search_vector", postgresql_using="gin"),
+        # Hash partitions (migration 9i0j1k2l3m4n): every query for one chat
+        # must filter on chat_id to be pruned to that chat's partition
+        {"postgresql_partition_by": "HASH (chat_id)"},
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    chat_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("chats.id"), nullable=False, index=True)
+    # Part of the key: a partitioned table's primary key must include the partition key
+    chat_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("chats.id", ondelete="CASCADE"), primary_key=True, nullable=False
+    )
     role: Mapped[MessageRole] = mapped_column(String, nullable=False)
     content: Mapped[str] = mapped_column(String, nullable=False)
+    # Computed once on insert; used for SQL-side context budgeting
+    token_count: Mapped[int] = mapped_column(Integer, nullable=False, default=_content_token_count)
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # Maintained by Postgres on every insert/update; only loaded when asked for
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{SEARCH_CONFIG}'::regconfig, content)", persisted=True),
+        deferred=True,
+    )
 
     chat = relationship("Chat", back_populates="messages")
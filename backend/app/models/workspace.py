@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import String, DateTime, func, ForeignKey
+from sqlalchemy import String, Integer, DateTime, func, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.core.database import Base
@@ -9,8 +9,10 @@ class Workspace(Base):
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name: Mapped[str] = mapped_column(String, nullable=False)
-    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id"), nullable=False, index=True)
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # Visible (not soft-deleted) chats, maintained by triggers on chats
+    chat_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
 
     owner = relationship("User", back_populates="workspaces")
-    chats = relationship("Chat", back_populates="workspace", cascade="all, delete-orphan")
+    chats = relationship("Chat", back_populates="workspace", cascade="all, delete-orphan", passive_deletes=True)
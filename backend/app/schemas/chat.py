@@ -14,6 +14,8 @@ class ChatResponse(ChatBase):
     id: UUID
     created_at: datetime
     title: Optional[str]
+    message_count: int = 0
+    last_message_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -21,3 +23,9 @@ class ChatResponse(ChatBase):
 class ChatStreamRequest(BaseModel):
     chat_id: UUID
     message: str
+    # Skip cached live-search results (time-sensitive questions)
+    bypass_search_cache: bool = False
+    # Skip the cached answer for the same search context and question
+    bypass_completion_cache: bool = False
+    # Both of the above (kept for existing clients)
+    bypass_cache: bool = False
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from uuid import UUID
 from datetime import datetime
+from typing import Optional
 from app.models.message import MessageRole
 
 class MessageBase(BaseModel):
@@ -17,3 +18,15 @@ class MessageResponse(MessageBase):
 
     class Config:
         from_attributes = True
+
+class MessageSearchHit(BaseModel):
+    id: UUID
+    chat_id: UUID
+    chat_title: Optional[str]
+    workspace_id: UUID
+    workspace_name: str
+    role: MessageRole
+    created_at: datetime
+    rank: float
+    # HTML-escaped excerpt with matching terms wrapped in <mark>
+    highlight: str
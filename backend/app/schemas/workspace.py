@@ -12,6 +12,7 @@ class WorkspaceResponse(WorkspaceBase):
     id: UUID
     user_id: UUID
     created_at: datetime
+    chat_count: int = 0
 
     class Config:
         from_attributes = True
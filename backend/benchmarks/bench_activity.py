@@ -0,0 +1,236 @@
+"""
+Sidebar listing by recent activity: aggregating messages vs the denormalized counters.
+
+Seeds one workspace with --chats chats and --messages messages (COPY,
+Zipf-ish over chats, so a few chats are busy and most are quiet), then:
+- listing: the first --limit chats ordered by last activity with message
+  counts, once as an aggregate over messages (what the schema required
+  before) and once as the keyset query of GET /chats/?sort=activity over
+  the trigger-maintained columns; p50/p95 and whether the plan reads
+  ix_chats_workspace_id_last_activity
+- write cost: write-behind flushes (message_writer.insert_statement, --batch
+  rows over up to 50 chats each) with the counter triggers enabled vs
+  disabled, plus the same rows as an executemany (one statement, and one
+  trigger run, per row), in rows/s
+- consistency: after the inserts, a purge-style batched delete and a chat
+  soft delete, the counters are compared with a recount
+
+The dataset is removed afterwards. Needs a migrated DATABASE_URL and a role
+allowed to disable triggers (table owner).
+
+    python -m benchmarks.bench_activity --chats 2000 --messages 300000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, insert, select, text, update
+
+from app.core import message_writer
+from app.core.database import AsyncSessionLocal, engine
+from app.models.chat import Chat
+from app.models.message import Message
+from app.models.user import User
+from app.models.workspace import Workspace
+from benchmarks.bench_search import explain, plan_uses
+from benchmarks.common import percentile
+
+EMAIL = "activity-bench@example.com"
+
+
+async def seed(args, rng: random.Random):
+    user_id = uuid.uuid4()
+    workspace_id = uuid.uuid4()
+    chat_ids = [uuid.uuid4() for _ in range(args.chats)]
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+    weights = [1 / (rank + 1) for rank in range(args.chats)]
+    async with engine.connect() as conn:
+        raw = (await conn.get_raw_connection()).driver_connection
+        await raw.copy_records_to_table("users", columns=["id", "email", "hashed_password"], records=[(user_id, EMAIL, "x")])
+        await raw.copy_records_to_table("workspaces", columns=["id", "name", "user_id"], records=[(workspace_id, "bench", user_id)])
+        await raw.copy_records_to_table(
+            "chats", columns=["id", "title", "workspace_id", "created_at"],
+            records=[(chat_id, f"chat {n}", workspace_id, start + timedelta(minutes=n)) for n, chat_id in enumerate(chat_ids)],
+        )
+        picks = rng.choices(chat_ids, weights=weights, k=args.messages)
+        await raw.copy_records_to_table(
+            "messages", columns=["id", "chat_id", "role", "content", "token_count", "created_at"],
+            records=[
+                (uuid.uuid4(), chat_id, "user", "activity bench message", 5, start + timedelta(seconds=i * 5))
+                for i, chat_id in enumerate(picks)
+            ],
+        )
+        await conn.commit()
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE chats"))
+        await conn.execute(text("VACUUM ANALYZE messages"))
+    return workspace_id, chat_ids
+
+
+async def drop(db) -> None:
+    users = select(User.id).where(User.email == EMAIL)
+    await db.execute(delete(Workspace).where(Workspace.user_id.in_(users)))
+    await db.execute(delete(User).where(User.email == EMAIL))
+    await db.commit()
+
+
+def aggregate_query(workspace_id: uuid.UUID, limit: int):
+    stats = (
+        select(Message.chat_id, func.count().label("message_count"), func.max(Message.created_at).label("last_message_at"))
+        .join(Chat, Chat.id == Message.chat_id)
+        .where(Chat.workspace_id == workspace_id)
+        .group_by(Message.chat_id)
+        .subquery()
+    )
+    activity = func.coalesce(stats.c.last_message_at, Chat.created_at)
+    return (
+        select(Chat.id, Chat.title, stats.c.message_count, stats.c.last_message_at)
+        .outerjoin(stats, stats.c.chat_id == Chat.id)
+        .where(Chat.workspace_id == workspace_id, Chat.deleted_at.is_(None))
+        .order_by(activity.desc(), Chat.id.desc())
+        .limit(limit)
+    )
+
+
+def counters_query(workspace_id: uuid.UUID, limit: int):
+    # The first page of list_chats(sort="activity")
+    return (
+        select(Chat.id, Chat.title, Chat.message_count, Chat.last_message_at)
+        .where(Chat.workspace_id == workspace_id, Chat.deleted_at.is_(None))
+        .order_by(Chat.last_activity_at.desc(), Chat.id.desc())
+        .limit(limit)
+    )
+
+
+async def time_query(query, repeat: int) -> dict:
+    async with AsyncSessionLocal() as db:
+        plan = await explain(db, query)
+        rows = (await db.execute(query)).all()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            await db.execute(query)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "rows": [(str(r.id), r.message_count, r.last_message_at) for r in rows],
+        "uses_activity_index": plan_uses(plan, "ix_chats_workspace_id_last_activity"),
+        **{f"p{p}_ms": round(percentile(timings, p) * 1000, 2) for p in (50, 95)},
+    }
+
+
+async def insert_rate(chat_ids, args, rng: random.Random, triggers: bool, executemany: bool = False) -> float:
+    async with engine.connect() as conn:
+        await conn.execute(text(f"ALTER TABLE messages {'ENABLE' if triggers else 'DISABLE'} TRIGGER messages_activity_insert"))
+        await conn.commit()
+    try:
+        rows_written = 0
+        start = time.perf_counter()
+        for _ in range(args.batches):
+            chats = rng.sample(chat_ids, min(50, len(chat_ids)))
+            now = datetime.now(timezone.utc)
+            rows = [
+                {"id": uuid.uuid4(), "chat_id": rng.choice(chats), "role": "assistant",
+                 "content": "flush bench message", "token_count": 4, "created_at": now + timedelta(microseconds=i)}
+                for i in range(args.batch)
+            ]
+            async with AsyncSessionLocal() as db:
+                if executemany:
+                    await db.execute(insert(Message.__table__), rows)
+                else:
+                    await db.execute(message_writer.insert_statement(rows))
+                await db.commit()
+            rows_written += len(rows)
+        return rows_written / (time.perf_counter() - start)
+    finally:
+        async with engine.connect() as conn:
+            await conn.execute(text("ALTER TABLE messages ENABLE TRIGGER messages_activity_insert"))
+            await conn.commit()
+
+
+async def recount(db, workspace_id: uuid.UUID) -> dict:
+    counted = (await db.execute(
+        select(Chat.id, Chat.message_count, Chat.last_message_at,
+               select(func.count()).where(Message.chat_id == Chat.id).scalar_subquery(),
+               select(func.max(Message.created_at)).where(Message.chat_id == Chat.id).scalar_subquery())
+        .where(Chat.workspace_id == workspace_id, Chat.deleted_at.is_(None))
+    )).all()
+    mismatched = [row for row in counted if (row[1], row[2]) != (row[3], row[4])]
+    workspace = await db.get(Workspace, workspace_id)
+    return {
+        "chats_checked": len(counted),
+        "chat_counters_mismatched": len(mismatched),
+        "workspace_chat_count": workspace.chat_count,
+        "workspace_chat_count_ok": workspace.chat_count == len(counted),
+    }
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    async with AsyncSessionLocal() as db:
+        await drop(db)
+    workspace_id, chat_ids = await seed(args, rng)
+    try:
+        aggregate = await time_query(aggregate_query(workspace_id, args.limit), args.repeat)
+        counters = await time_query(counters_query(workspace_id, args.limit), args.repeat)
+        same_page = aggregate.pop("rows") == counters.pop("rows")
+
+        # Alternate to spread cache and autovacuum effects over both modes
+        rates = {"flush_triggers_on": [], "flush_triggers_off": [], "executemany_triggers_on": []}
+        for _ in range(2):
+            rates["flush_triggers_on"].append(await insert_rate(chat_ids, args, rng, triggers=True))
+            rates["flush_triggers_off"].append(await insert_rate(chat_ids, args, rng, triggers=False))
+            rates["executemany_triggers_on"].append(
+                await insert_rate(chat_ids, args, rng, triggers=True, executemany=True)
+            )
+        # Rows inserted with the trigger disabled are not counted; resync them
+        async with AsyncSessionLocal() as db:
+            await db.execute(text(
+                "UPDATE chats c SET message_count = s.n, last_message_at = s.newest FROM "
+                "(SELECT chat_id, count(*) AS n, max(created_at) AS newest FROM messages GROUP BY chat_id) s "
+                "WHERE c.id = s.chat_id AND c.workspace_id = :ws"
+            ), {"ws": workspace_id})
+            await db.commit()
+
+        # Deletes and a soft delete go through the triggers too
+        async with AsyncSessionLocal() as db:
+            busiest = chat_ids[0]
+            newest = select(Message.id).where(Message.chat_id == busiest).order_by(Message.created_at.desc()).limit(500)
+            await db.execute(delete(Message).where(Message.id.in_(newest.scalar_subquery())))
+            await db.execute(update(Chat).where(Chat.id == chat_ids[1]).values(deleted_at=func.now()))
+            await db.commit()
+            consistency = await recount(db, workspace_id)
+
+        return {
+            "chats": args.chats,
+            "messages": args.messages,
+            "listing": {"aggregate_over_messages": aggregate, "denormalized_counters": counters, "same_page": same_page},
+            "insert_rows_per_s": {mode: round(sum(r) / len(r)) for mode, r in rates.items()},
+            "batch_rows": args.batch,
+            "consistency": consistency,
+        }
+    finally:
+        async with AsyncSessionLocal() as db:
+            await drop(db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Activity listing and counter trigger cost")
+    parser.add_argument("--chats", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=300_000)
+    parser.add_argument("--limit", type=int, default=50, help="sidebar page size")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--batch", type=int, default=500, help="rows per flush-shaped INSERT")
+    parser.add_argument("--batches", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
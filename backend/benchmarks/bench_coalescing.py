@@ -0,0 +1,120 @@
+"""
+Cost of streaming tokens to clients, with and without chunk coalescing.
+
+Runs the real app under uvicorn against benchmarks.fake_openrouter and
+streams --streams concurrent /chats/stream answers of --tokens tokens each,
+once with coalescing disabled (STREAM_COALESCE_MIN_BYTES=0) and once with
+the configured defaults. Reports, per 1k streamed tokens, the app process's
+write syscalls and bytes written (/proc/<pid>/io) and CPU time
+(/proc/<pid>/stat), plus client-side chunk counts, TTFT and the largest gap
+between chunks. Linux only.
+
+Needs a migrated DATABASE_URL.
+
+    python -m benchmarks.bench_coalescing --streams 20 --tokens 1000 --token-delay 0.005
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import httpx
+
+from benchmarks.common import bootstrap_chat, percentile, spawn, spawn_app, stop
+
+
+def process_counters(pid: int) -> dict:
+    with open(f"/proc/{pid}/io") as f:
+        io = dict(line.split(": ") for line in f.read().splitlines())
+    with open(f"/proc/{pid}/stat") as f:
+        # Fields after the parenthesised command name; utime/stime are 14/15 overall
+        fields = f.read().rsplit(")", 1)[1].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    return {
+        "write_syscalls": int(io["syscw"]),
+        "bytes_written": int(io["wchar"]),
+        "cpu_s": (int(fields[11]) + int(fields[12])) / ticks,
+    }
+
+
+async def one_stream(client: httpx.AsyncClient, setup: dict) -> dict:
+    start = time.perf_counter()
+    first = None
+    last = start
+    max_gap = 0.0
+    chunks = 0
+    async with client.stream(
+        "POST", "/chats/stream",
+        json={"chat_id": setup["chat"]["id"], "message": "Tell me a long story."},
+        headers=setup["headers"],
+    ) as response:
+        async for _ in response.aiter_raw():
+            now = time.perf_counter()
+            if first is None:
+                first = now - start
+            else:
+                max_gap = max(max_gap, now - last)
+            last = now
+            chunks += 1
+    return {"ttft": first or 0.0, "max_gap": max_gap, "chunks": chunks}
+
+
+async def run(base_url: str, pid: int, streams: int, tokens: int) -> dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+        setups = await asyncio.gather(*(bootstrap_chat(client) for _ in range(streams)))
+        # Warm up connections and the tokenizer outside the measured window
+        await one_stream(client, setups[0])
+
+        before = process_counters(pid)
+        results = await asyncio.gather(*(one_stream(client, s) for s in setups))
+        after = process_counters(pid)
+
+    per_1k = 1000 / (streams * tokens)
+    ttfts = sorted(r["ttft"] for r in results)
+    return {
+        "write_syscalls_per_1k_tokens": round((after["write_syscalls"] - before["write_syscalls"]) * per_1k, 1),
+        "bytes_written_per_1k_tokens": round((after["bytes_written"] - before["bytes_written"]) * per_1k),
+        "cpu_ms_per_1k_tokens": round((after["cpu_s"] - before["cpu_s"]) * 1000 * per_1k, 2),
+        "client_chunks_per_1k_tokens": round(sum(r["chunks"] for r in results) * per_1k, 1),
+        "ttft_ms_p50": round(percentile(ttfts, 50) * 1000, 1),
+        "max_gap_ms": round(max(r["max_gap"] for r in results) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token stream coalescing on vs off")
+    parser.add_argument("--streams", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--app-port", type=int, default=8120)
+    parser.add_argument("--upstream-port", type=int, default=8121)
+    args = parser.parse_args()
+
+    upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+    upstream = spawn(
+        ["-m", "benchmarks.fake_openrouter", "--port", str(args.upstream_port),
+         "--tokens", str(args.tokens), "--first-token-delay", "0.05",
+         "--token-delay", str(args.token_delay)],
+        args.upstream_port,
+    )
+    results = {}
+    try:
+        for label, min_bytes in (("per-token", "0"), ("coalesced", None)):
+            env = {"OPENROUTER_BASE_URL": f"{upstream_url}/api/v1", "OPENROUTER_HTTP2": "false"}
+            if min_bytes is not None:
+                env["STREAM_COALESCE_MIN_BYTES"] = min_bytes
+            app = spawn_app(args.app_port, env)
+            try:
+                results[label] = asyncio.run(
+                    run(f"http://127.0.0.1:{args.app_port}", app.pid, args.streams, args.tokens)
+                )
+            finally:
+                stop(app)
+    finally:
+        stop(upstream)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
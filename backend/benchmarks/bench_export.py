@@ -0,0 +1,210 @@
+"""
+Memory of a full-history export: materialized JSON array vs the streaming export.
+
+Seeds one workspace with --messages messages over --chats chats (COPY),
+then exports it:
+- before: what list_messages did for a whole history, in a child process:
+  every ORM Message loaded, validated into MessageResponse, encoded and
+  dumped as one JSON array
+- after: GET /workspaces/{id}/export (ndjson and jsonl.gz) from the real
+  app under uvicorn, read by a streaming client
+
+Memory is the server process' resident set: its growth over the idle
+process, sampled every --sample-every lines while the export runs, and the
+peak (VmHWM). Flat memory means the samples stay level however far in the
+export is. It also checks the line counts, and that a cleared and a
+deleted chat are left out.
+
+The dataset is removed afterwards. Needs a migrated DATABASE_URL.
+
+    python -m benchmarks.bench_export --messages 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import delete, select, text
+
+from app.core.database import AsyncSessionLocal, engine
+from app.models.chat import Chat
+from app.models.message import Message
+from app.models.user import User
+from benchmarks.common import bootstrap_chat, spawn_app, stop
+
+
+def rss_kb(pid: int, field: str = "VmRSS") -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise RuntimeError(f"no {field} for pid {pid}")
+
+
+async def seed(client: httpx.AsyncClient, setup: dict, args) -> list:
+    headers, workspace_id = setup["headers"], setup["workspace"]["id"]
+    chat_ids = [setup["chat"]["id"]]
+    for _ in range(args.chats - 1):
+        chat = await client.post("/chats/", json={"workspace_id": workspace_id, "title": "bench"}, headers=headers)
+        chat_ids.append(chat.json()["id"])
+    start = datetime.now(timezone.utc) - timedelta(days=7)
+    content = "export bench message " * 10
+    async with engine.connect() as conn:
+        raw = (await conn.get_raw_connection()).driver_connection
+        await raw.copy_records_to_table(
+            "messages", columns=["id", "chat_id", "role", "content", "token_count", "created_at"],
+            records=(
+                (uuid.uuid4(), uuid.UUID(chat_ids[i % len(chat_ids)]), "user" if i % 2 else "assistant",
+                 content, 40, start + timedelta(milliseconds=i))
+                for i in range(args.messages)
+            ),
+        )
+        await conn.commit()
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE messages"))
+    return chat_ids
+
+
+async def stream_export(client: httpx.AsyncClient, url: str, headers: dict, server_pid: int, sample_every: int) -> dict:
+    idle_kb = rss_kb(server_pid)
+    gzipped = url.endswith("jsonl.gz")
+    decompressor = zlib.decompressobj(31) if gzipped else None
+    lines, body_bytes, samples = 0, 0, []
+    next_sample = sample_every
+    start = time.perf_counter()
+    first_byte = None
+    async with client.stream("GET", url, headers=headers) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_raw():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            body_bytes += len(chunk)
+            lines += (decompressor.decompress(chunk) if gzipped else chunk).count(b"\n")
+            if lines >= next_sample:
+                samples.append(round((rss_kb(server_pid) - idle_kb) / 1024, 1))
+                next_sample += sample_every
+    elapsed = time.perf_counter() - start
+    return {
+        "lines": lines,
+        "body_mb": round(body_bytes / 2**20, 1),
+        "first_byte_ms": round(first_byte * 1000, 1),
+        "elapsed_s": round(elapsed, 2),
+        "rows_per_s": round(lines / elapsed),
+        "server_rss_growth_mb_samples": samples,
+        "server_peak_growth_mb": round((rss_kb(server_pid, "VmHWM") - idle_kb) / 1024, 1),
+    }
+
+
+async def materialize(workspace_id: str) -> dict:
+    # The pre-export path: ORM rows, then response models, then one JSON array
+    from fastapi.encoders import jsonable_encoder
+    from app.schemas.message import MessageResponse
+
+    idle_kb = rss_kb(os.getpid())
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        messages = (await db.execute(
+            select(Message).join(Chat, Chat.id == Message.chat_id)
+            .where(Chat.workspace_id == uuid.UUID(workspace_id), Chat.deleted_at.is_(None))
+            .order_by(Message.chat_id, Message.created_at, Message.id)
+        )).scalars().all()
+        body = json.dumps(jsonable_encoder([MessageResponse.model_validate(m) for m in messages])).encode()
+    return {
+        "rows": len(messages),
+        "body_mb": round(len(body) / 2**20, 1),
+        "elapsed_s": round(time.perf_counter() - start, 2),
+        # ru_maxrss is in KiB on Linux
+        "peak_growth_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - idle_kb) / 1024, 1),
+    }
+
+
+async def visibility_check(client: httpx.AsyncClient, setup: dict) -> dict:
+    # A second workspace: one chat cleared (then written to), one deleted, one untouched
+    headers = setup["headers"]
+    workspace = (await client.post("/workspaces/", json={"name": "visibility"}, headers=headers)).json()
+    chats = [
+        (await client.post("/chats/", json={"workspace_id": workspace["id"], "title": "v"}, headers=headers)).json()["id"]
+        for _ in range(3)
+    ]
+    for chat_id in chats:
+        for n in range(3):
+            await client.post("/messages/", json={"chat_id": chat_id, "role": "user", "content": f"m{n}"}, headers=headers)
+    await client.post(f"/chats/{chats[0]}/clear", headers=headers)
+    await client.post("/messages/", json={"chat_id": chats[0], "role": "user", "content": "after clear"}, headers=headers)
+    await client.delete(f"/chats/{chats[1]}", headers=headers)
+    body = (await client.get(f"/workspaces/{workspace['id']}/export", headers=headers)).content
+    exported = [json.loads(line) for line in body.splitlines()]
+    return {
+        "exported": len(exported),
+        "expected": 4,
+        "ok": sorted(m["content"] for m in exported) == ["after clear", "m0", "m1", "m2"],
+    }
+
+
+async def drop(email: str) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(User).where(User.email == email))
+        await db.commit()
+
+
+async def run(args) -> dict:
+    server = spawn_app(args.port)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=600) as client:
+            setup = await bootstrap_chat(client)
+            try:
+                await seed(client, setup, args)
+                workspace_id, headers = setup["workspace"]["id"], setup["headers"]
+                # Also warms the server (imports, pool, the export path) on a
+                # small export, so the peak below is the large exports' own
+                visibility = await visibility_check(client, setup)
+
+                after = {}
+                for format in ("ndjson", "jsonl.gz"):
+                    after[format] = await stream_export(
+                        client, f"/workspaces/{workspace_id}/export?format={format}",
+                        headers, server.pid, args.sample_every,
+                    )
+                child = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_export", "--materialize", workspace_id],
+                    capture_output=True, text=True, check=True,
+                )
+                results = {
+                    "messages": args.messages,
+                    "chats": args.chats,
+                    "before_materialized_array": json.loads(child.stdout),
+                    "after_streaming_export": after,
+                    "visibility": visibility,
+                }
+            finally:
+                await drop(setup["creds"]["email"])
+    finally:
+        stop(server)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-history export memory: materialized vs streaming")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--sample-every", type=int, default=100_000, help="lines between server RSS samples")
+    parser.add_argument("--port", type=int, default=8041)
+    parser.add_argument("--materialize", metavar="WORKSPACE_ID", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.materialize:
+        print(json.dumps(asyncio.run(materialize(args.materialize))))
+        return
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Throughput and server CPU of the list endpoints, ORM + response_model vs plain rows.
+
+Seeds one user with --rows workspaces, a workspace with --rows chats and a
+chat with --rows messages (COPY), then loads each list endpoint at its
+--rows page size:
+- GET /messages/?chat_id=...&limit=N
+- GET /chats/?workspace_id=...&limit=N (and sort=activity)
+- GET /workspaces/
+
+Each endpoint gets --concurrency closed-loop clients for --duration seconds
+against the real app under uvicorn (one worker). Reports requests/s and
+the server process' CPU time per 1k rows returned (utime + stime from
+/proc).
+
+With --baseline <git ref>, the same data is served by that revision too
+(checked out into a temporary git worktree), e.g. the commit before the
+json_rows read path, and the response bodies and cursor headers of both
+are compared byte for byte.
+
+The dataset is removed afterwards. Needs a migrated DATABASE_URL.
+
+    python -m benchmarks.bench_list_endpoints --rows 200 --baseline <ref>
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+import httpx
+from sqlalchemy import delete, text
+
+from app.core.database import AsyncSessionLocal, engine
+from app.models.user import User
+from benchmarks.common import bootstrap_chat, percentile, spawn_app, stop
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as stat:
+        # Fields after the parenthesized command name; utime and stime are 14 and 15
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+async def seed(setup: dict, rows: int) -> None:
+    user_id = uuid.UUID(setup["workspace"]["user_id"])
+    workspace_id = uuid.UUID(setup["workspace"]["id"])
+    chat_id = uuid.UUID(setup["chat"]["id"])
+    start = datetime.now(timezone.utc) - timedelta(days=1)
+    async with engine.connect() as conn:
+        raw = (await conn.get_raw_connection()).driver_connection
+        await raw.copy_records_to_table(
+            "workspaces", columns=["id", "name", "user_id", "created_at"],
+            records=[(uuid.uuid4(), f"workspace {n}", user_id, start + timedelta(seconds=n)) for n in range(rows - 1)],
+        )
+        await raw.copy_records_to_table(
+            "chats", columns=["id", "title", "workspace_id", "created_at"],
+            records=[(uuid.uuid4(), f"chat {n}", workspace_id, start + timedelta(seconds=n)) for n in range(rows - 1)],
+        )
+        await raw.copy_records_to_table(
+            "messages", columns=["id", "chat_id", "role", "content", "token_count", "created_at"],
+            records=[
+                (uuid.uuid4(), chat_id, "user" if n % 2 else "assistant",
+                 f"list bench message {n} " + "lorem ipsum " * 20, 60, start + timedelta(seconds=n))
+                # Twice a page, so the page carries cursors
+                for n in range(rows * 2)
+            ],
+        )
+        await conn.commit()
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for table in ("workspaces", "chats", "messages"):
+            await conn.execute(text(f"VACUUM ANALYZE {table}"))
+
+
+def endpoints(setup: dict, rows: int) -> Dict[str, str]:
+    workspace_id, chat_id = setup["workspace"]["id"], setup["chat"]["id"]
+    return {
+        "messages": f"/messages/?chat_id={chat_id}&limit={rows}",
+        "chats": f"/chats/?workspace_id={workspace_id}&limit={rows}",
+        "chats_by_activity": f"/chats/?workspace_id={workspace_id}&limit={rows}&sort=activity",
+        "workspaces": "/workspaces/",
+    }
+
+
+async def load(client: httpx.AsyncClient, url: str, headers: dict, pid: int, args) -> dict:
+    response = await client.get(url, headers=headers)
+    response.raise_for_status()
+    rows = len(response.json())
+    # What the client sees: body plus pagination headers
+    fingerprint = hashlib.sha256(response.content + json.dumps(
+        [response.headers.get(h) for h in ("content-type", "x-prev-cursor", "x-next-cursor")]
+    ).encode()).hexdigest()[:16]
+    for _ in range(20):  # warm up
+        await client.get(url, headers=headers)
+
+    latencies = []
+    deadline = time.perf_counter() + args.duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            (await client.get(url, headers=headers)).raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    cpu_before, started = cpu_seconds(pid), time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed, cpu = time.perf_counter() - started, cpu_seconds(pid) - cpu_before
+    latencies.sort()
+    return {
+        "rows": rows,
+        "requests_per_s": round(len(latencies) / elapsed),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "server_cpu_ms_per_1k_rows": round(cpu * 1000 / (len(latencies) * rows) * 1000, 2),
+        "fingerprint": fingerprint,
+    }
+
+
+async def run_revision(cwd: Optional[str], setup: dict, args) -> Dict[str, dict]:
+    server = spawn_app(args.port, cwd=cwd)
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=60, limits=limits) as client:
+            return {
+                name: await load(client, url, setup["headers"], server.pid, args)
+                for name, url in endpoints(setup, args.rows).items()
+            }
+    finally:
+        stop(server)
+
+
+async def run(args) -> dict:
+    server = spawn_app(args.port)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=60) as client:
+            setup = await bootstrap_chat(client)
+    finally:
+        stop(server)
+    try:
+        await seed(setup, args.rows)
+        results = {"current": await run_revision(None, setup, args)}
+        if args.baseline:
+            worktree = tempfile.mkdtemp(prefix="aibot-baseline-")
+            subprocess.run(["git", "worktree", "add", "--detach", worktree, args.baseline], check=True)
+            try:
+                results[args.baseline] = await run_revision(os.path.join(worktree, "backend"), setup, args)
+            finally:
+                subprocess.run(["git", "worktree", "remove", "--force", worktree], check=False)
+            results["same_responses"] = {
+                name: stats["fingerprint"] == results[args.baseline][name]["fingerprint"]
+                for name, stats in results["current"].items()
+            }
+        return results
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(User).where(User.email == setup["creds"]["email"]))
+            await db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List endpoint throughput and CPU per 1k rows")
+    parser.add_argument("--rows", type=int, default=200, help="page size, and rows seeded per listing")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--baseline", help="git ref to compare against (served from a temporary worktree)")
+    parser.add_argument("--port", type=int, default=8042)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
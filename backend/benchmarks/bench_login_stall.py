@@ -0,0 +1,114 @@
+"""
+Checks that a token stream keeps flowing while a burst of logins is hashed.
+
+Runs the real app under uvicorn against benchmarks.fake_openrouter, starts a
+slow /chats/stream, fires N concurrent /auth/login calls once the first token
+arrives, and reports the largest gap between stream chunks. With bcrypt on the
+event loop the gap grows to roughly N x one bcrypt verify; with the dedicated
+hashing pool it stays close to the upstream token interval.
+
+A check, not just a measurement: exits non-zero when the largest gap during
+the login burst exceeds --max-gap-ms (the event loop stalled).
+
+Needs a migrated DATABASE_URL.
+
+    python -m benchmarks.bench_login_stall --logins 20 --max-gap-ms 100
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+from sqlalchemy import delete
+
+from app.core.database import AsyncSessionLocal
+from app.models.user import User
+from benchmarks.common import bootstrap_chat, percentile, spawn, spawn_app, stop
+
+
+async def _stream_gaps(client, headers, chat_id, first_token: asyncio.Event) -> list:
+    gaps = []
+    last = None
+    async with client.stream(
+        "POST", "/chats/stream", json={"chat_id": chat_id, "message": "hi"}, headers=headers
+    ) as response:
+        async for _ in response.aiter_raw():
+            now = time.perf_counter()
+            if last is None:
+                first_token.set()
+            else:
+                gaps.append(now - last)
+            last = now
+    return gaps
+
+
+async def _timed_login(client, creds) -> float:
+    start = time.perf_counter()
+    response = await client.post("/auth/login", json=creds)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run(base_url: str, logins: int) -> dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        setup = await bootstrap_chat(client)
+        creds, headers, chat = setup["creds"], setup["headers"], setup["chat"]
+        try:
+            results = {}
+            for label, n in (("stream-only", 0), ("stream+logins", logins)):
+                first_token = asyncio.Event()
+                stream_task = asyncio.create_task(_stream_gaps(client, headers, chat["id"], first_token))
+                await first_token.wait()
+                login_times = sorted(await asyncio.gather(*(_timed_login(client, creds) for _ in range(n))))
+                gaps = sorted(await stream_task)
+                results[label] = {
+                    "chunks": len(gaps) + 1,
+                    "gap_ms_p50": round(percentile(gaps, 50) * 1000, 2),
+                    "gap_ms_max": round(gaps[-1] * 1000, 2) if gaps else 0.0,
+                    "login_ms_p50": round(percentile(login_times, 50) * 1000, 1),
+                    "login_ms_max": round(login_times[-1] * 1000, 1) if login_times else 0.0,
+                }
+            return results
+        finally:
+            async with AsyncSessionLocal() as db:
+                await db.execute(delete(User).where(User.email == creds["email"]))
+                await db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream gaps during a login burst")
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument(
+        "--max-gap-ms", type=float, default=100.0,
+        help="fail when the largest stream gap during the logins exceeds this",
+    )
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--upstream-port", type=int, default=8101)
+    args = parser.parse_args()
+
+    upstream = spawn(
+        ["-m", "benchmarks.fake_openrouter", "--port", str(args.upstream_port),
+         "--tokens", "400", "--first-token-delay", "0.01", "--token-delay", "0.01"],
+        args.upstream_port,
+    )
+    app = spawn_app(args.app_port, {
+        "OPENROUTER_BASE_URL": f"http://127.0.0.1:{args.upstream_port}/api/v1",
+        "OPENROUTER_HTTP2": "false",
+    })
+    try:
+        results = asyncio.run(run(f"http://127.0.0.1:{args.app_port}", args.logins))
+    finally:
+        stop(app, upstream)
+    results["logins"] = args.logins
+    print(json.dumps(results, indent=2))
+    gap = results["stream+logins"]["gap_ms_max"]
+    if gap > args.max_gap_ms:
+        raise SystemExit(
+            f"FAIL: stream stalled {gap} ms during {args.logins} logins (limit {args.max_gap_ms} ms)"
+        )
+    print(f"OK: largest stream gap {gap} ms during {args.logins} logins (limit {args.max_gap_ms} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Collection cost of the in-process metrics (app/core/metrics.py).
+
+Everything runs in-process, without sockets or a database, so the numbers
+are the instrumentation itself:
+
+- request: one ASGI request through a bare router, with and without
+  MetricsMiddleware; the difference is the per-request cost
+- stream: a 1-chunk stream with and without the chat.instrumented() wrapper
+  (TTFT, duration and in-flight gauge), plus the extra cost per chunk
+- observe / labels+observe: the histogram primitives on their own
+- render: one GET /metrics scrape with --series labelled series
+
+    python -m benchmarks.bench_metrics --requests 200000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route, Router
+
+from app.api.chat import instrumented
+from app.core import metrics
+
+
+def per_call_ns(fn, n: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(n)
+        best = min(best, time.perf_counter() - start)
+    return best / n * 1e9
+
+
+def bench_requests(n: int, repeat: int) -> dict:
+    async def ok(request):
+        return PlainTextResponse("ok")
+
+    bare = Router(routes=[Route("/", ok)])
+    wrapped = metrics.MetricsMiddleware(bare)
+    loop = asyncio.new_event_loop()
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    def run(app):
+        async def requests(count):
+            for _ in range(count):
+                scope = {
+                    "type": "http", "method": "GET", "path": "/", "root_path": "",
+                    "query_string": b"", "headers": [], "scheme": "http",
+                }
+                await app(scope, receive, send)
+        return lambda count: loop.run_until_complete(requests(count))
+
+    try:
+        without = per_call_ns(run(bare), n, repeat)
+        with_metrics = per_call_ns(run(wrapped), n, repeat)
+    finally:
+        loop.close()
+    return {
+        "without_ns": round(without),
+        "with_ns": round(with_metrics),
+        "overhead_ns": round(with_metrics - without),
+    }
+
+
+def bench_streams(n: int, chunks: int, repeat: int) -> dict:
+    loop = asyncio.new_event_loop()
+
+    async def source(count):
+        for _ in range(count):
+            yield "tok "
+
+    def run(wrap, count_chunks):
+        async def streams(count):
+            for _ in range(count):
+                gen = source(count_chunks)
+                if wrap:
+                    gen = instrumented(gen, "/bench", time.perf_counter())
+                async for _ in gen:
+                    pass
+        return lambda count: loop.run_until_complete(streams(count))
+
+    try:
+        one_bare = per_call_ns(run(False, 1), n, repeat)
+        one_wrapped = per_call_ns(run(True, 1), n, repeat)
+        many_bare = per_call_ns(run(False, chunks), n // chunks or 1, repeat)
+        many_wrapped = per_call_ns(run(True, chunks), n // chunks or 1, repeat)
+    finally:
+        loop.close()
+    per_chunk = ((many_wrapped - many_bare) - (one_wrapped - one_bare)) / (chunks - 1)
+    return {
+        "per_stream_overhead_ns": round(one_wrapped - one_bare),
+        "per_chunk_overhead_ns": round(per_chunk, 1),
+    }
+
+
+def bench_primitives(n: int, repeat: int) -> dict:
+    hist = metrics.Histogram()
+    family = metrics.histogram("bench_labelled_seconds", "benchmark only", ("method", "route", "status"))
+
+    def observe(count):
+        for _ in range(count):
+            hist.observe(0.0123)
+
+    def labels_observe(count):
+        for _ in range(count):
+            family.labels("GET", "/chats/", "200").observe(0.0123)
+
+    return {
+        "observe_ns": round(per_call_ns(observe, n, repeat)),
+        "labels_observe_ns": round(per_call_ns(labels_observe, n, repeat)),
+    }
+
+
+def bench_render(series: int, repeat: int) -> dict:
+    family = metrics.histogram("bench_render_seconds", "benchmark only", ("route",))
+    for i in range(series):
+        family.labels(f"/route/{i}").observe(0.01)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = metrics.render()
+        best = min(best, time.perf_counter() - start)
+    return {"series": series, "render_ms": round(best * 1e3, 2), "body_kib": round(len(body) / 1024, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request cost of the metrics registry")
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--chunks", type=int, default=100, help="chunks per stream for the per-chunk cost")
+    parser.add_argument("--series", type=int, default=200, help="labelled histogram series for the render cost")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(json.dumps({
+        "request": bench_requests(args.requests, args.repeat),
+        "stream": bench_streams(args.requests, args.chunks, args.repeat),
+        "primitives": bench_primitives(args.requests, args.repeat),
+        "render": bench_render(args.series, args.repeat),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Message insert throughput, and partition pruning of the message queries.
+
+Run it once before and once after the partitioning migration
+(9i0j1k2l3m4n) to compare:
+- inserts: --writers concurrent writers for --duration seconds each, over
+  --chats seeded chats. Flush-shaped writes (message_writer.insert_statement,
+  --batch rows over up to 50 chats) and single-row writes, like a turn's
+  user message. Reports rows/s.
+- pruning (meaningful once partitioned): the message queries of
+  app/api/message.py and app/api/chat.py, plus the export and purge
+  batches, are captured as the app sends them. The endpoints are driven
+  in-process, open_turn() and the purger called directly. Each one runs
+  again under EXPLAIN ANALYZE in a rolled-back transaction, with the
+  number of partitions it actually scanned. Per-chat statements should scan one
+  partition. Search across all of a user's chats scans the partitions
+  holding them, by design.
+
+The dataset is removed afterwards. Needs a migrated DATABASE_URL.
+
+    python -m benchmarks.bench_partitions --writers 8 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import delete, event, func, text, update
+
+from app.core import message_writer, purger
+from app.core.database import AsyncSessionLocal, engine
+from app.dependencies import invalidate_user
+from app.main import app
+from app.models.chat import Chat
+from app.models.message import MessageRole
+from app.models.user import User
+from benchmarks.common import bootstrap_chat
+
+# label -> captured (statement, parameters)
+captured: Dict[str, List[tuple]] = defaultdict(list)
+_label: Optional[str] = None
+
+
+def _capture(conn, cursor, statement, parameters, context, executemany):
+    if _label is not None and "messages" in statement:
+        captured[_label].append((statement, parameters))
+
+
+async def partitions() -> List[str]:
+    async with engine.connect() as conn:
+        return list((await conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'messages'::regclass ORDER BY 1"
+        ))).scalars())
+
+
+async def seed(setup: dict, chats: int, per_chat: int) -> List[uuid.UUID]:
+    workspace_id = uuid.UUID(setup["workspace"]["id"])
+    chat_ids = [uuid.UUID(setup["chat"]["id"])] + [uuid.uuid4() for _ in range(chats - 1)]
+    start = datetime.now(timezone.utc) - timedelta(days=1)
+    async with engine.connect() as conn:
+        raw = (await conn.get_raw_connection()).driver_connection
+        await raw.copy_records_to_table(
+            "chats", columns=["id", "title", "workspace_id", "created_at"],
+            records=[(chat_id, "bench", workspace_id, start) for chat_id in chat_ids[1:]],
+        )
+        await raw.copy_records_to_table(
+            "messages", columns=["id", "chat_id", "role", "content", "token_count", "created_at"],
+            records=[
+                (uuid.uuid4(), chat_id, "user", f"partition bench message {n} about hashing", 8,
+                 start + timedelta(seconds=n))
+                for chat_id in chat_ids for n in range(per_chat)
+            ],
+        )
+        await conn.commit()
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE messages"))
+    return chat_ids
+
+
+async def insert_rate(chat_ids: List[uuid.UUID], batch: int, args, seed: int) -> float:
+    deadline = time.perf_counter() + args.duration
+    written = 0
+
+    async def writer(rng: random.Random):
+        nonlocal written
+        while time.perf_counter() < deadline:
+            chats = rng.sample(chat_ids, min(50, len(chat_ids)))
+            rows = [
+                message_writer.new_row(rng.choice(chats), MessageRole.ASSISTANT, "insert bench reply")
+                for _ in range(batch)
+            ]
+            async with AsyncSessionLocal() as db:
+                await db.execute(message_writer.insert_statement(rows))
+                await db.commit()
+            written += batch
+
+    start = time.perf_counter()
+    await asyncio.gather(*(writer(random.Random(seed + n)) for n in range(args.writers)))
+    return written / (time.perf_counter() - start)
+
+
+async def drive(client: httpx.AsyncClient, setup: dict, chat_ids: List[uuid.UUID]) -> None:
+    # Every message query of the API and its background workers, once each
+    global _label
+    from app.api.chat import open_turn
+
+    headers, chat_id = setup["headers"], setup["chat"]["id"]
+    user_id = uuid.UUID(setup["workspace"]["user_id"])
+    steps = [
+        ("list_messages", lambda: client.get("/messages/", params={"chat_id": chat_id, "limit": 5}, headers=headers)),
+        ("list_messages_cursor", lambda: client.get(
+            "/messages/", params={"chat_id": chat_id, "limit": 5, "cursor": cursor}, headers=headers)),
+        ("search_one_chat", lambda: client.get(
+            "/messages/search", params={"q": "hashing", "chat_id": chat_id}, headers=headers)),
+        ("search_all_chats", lambda: client.get("/messages/search", params={"q": "hashing"}, headers=headers)),
+        ("open_turn", lambda: open_turn(user_id, uuid.UUID(chat_id), "partition bench turn")),
+        ("create_message", lambda: client.post(
+            "/messages/", json={"chat_id": chat_id, "role": "user", "content": "direct"}, headers=headers)),
+        ("export_chat", lambda: client.get(f"/chats/{chat_id}/export", headers=headers)),
+    ]
+    cursor = None
+    for label, step in steps:
+        _label = label
+        result = await step()
+        if label == "list_messages":
+            cursor = result.headers["X-Prev-Cursor"]
+    _label = None
+
+    # Purge batches of a cleared chat (marked directly, so the worker does not race us)
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(Chat).where(Chat.id == chat_ids[1]).values(cleared_at=func.now()))
+        await db.commit()
+    _label = "purge_chat"
+    await purger.purge_chat(chat_ids[1])
+    _label = None
+
+
+def scanned(plan: dict) -> set:
+    names = set()
+    if plan.get("Relation Name", "").startswith("messages") and plan.get("Actual Loops", 1) > 0:
+        names.add(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        names |= scanned(child)
+    return names
+
+
+async def explain_all(partition_names: List[str]) -> Dict[str, dict]:
+    report = {}
+    async with engine.connect() as conn:
+        raw = (await conn.get_raw_connection()).driver_connection
+        for label, statements in captured.items():
+            reads = []
+            for statement, parameters in statements:
+                transaction = raw.transaction()
+                await transaction.start()
+                try:
+                    # Rerunning an insert would collide with the row it wrote; its
+                    # plan alone shows the partitions the reads in it were left with
+                    options = "FORMAT JSON" if "INSERT INTO messages" in statement else "ANALYZE, FORMAT JSON"
+                    plan = await raw.fetchval(f"EXPLAIN ({options}) {statement}", *(parameters or ()))
+                    # Decoded already when the pool registers a json codec
+                    plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+                finally:
+                    await transaction.rollback()
+                tables = scanned(plan)
+                if partition_names:
+                    tables &= set(partition_names)
+                reads.append(len(tables))
+            # Per statement; a plain INSERT scans none (its rows are routed one by one)
+            report[label] = {"statements": len(statements), "partitions_scanned": reads}
+    return report
+
+
+async def run(args) -> dict:
+    names = await partitions()
+    event.listen(engine.sync_engine, "before_cursor_execute", _capture)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        setup = await bootstrap_chat(client)
+        try:
+            chat_ids = await seed(setup, args.chats, args.per_chat)
+            results = {
+                "partitions": len(names),
+                "insert_rows_per_s": {
+                    f"batch_{args.batch}": round(await insert_rate(chat_ids, args.batch, args, 1)),
+                    "single_row": round(await insert_rate(chat_ids, 1, args, 2)),
+                },
+                "writers": args.writers,
+            }
+            await drive(client, setup, chat_ids)
+            results["pruning"] = await explain_all(names)
+            return results
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", _capture)
+            await message_writer.stop()
+            async with AsyncSessionLocal() as db:
+                deleted = await db.execute(delete(User).where(User.email == setup["creds"]["email"]).returning(User.id))
+                await db.commit()
+            # The app runs in this process and caches the bench user's token
+            for user_id in deleted.scalars():
+                invalidate_user(user_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Message insert throughput and partition pruning")
+    parser.add_argument("--chats", type=int, default=2000)
+    parser.add_argument("--per-chat", type=int, default=50, help="messages seeded per chat")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=500, help="rows per flush-shaped INSERT")
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Requests/sec on GET /workspaces/ with and without the principal cache.
+
+Drives the app in-process (httpx ASGITransport) against the database in
+DATABASE_URL, so it measures handler + auth + DB cost without socket noise.
+The database must be migrated (alembic upgrade head).
+
+    python -m benchmarks.bench_principal_cache --concurrency 32 --duration 5
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+
+from app.dependencies import principal_cache
+from app.main import app
+
+
+async def _login(client: httpx.AsyncClient) -> dict:
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    await client.post("/auth/register", json={"email": email, "password": "bench"})
+    response = await client.post("/auth/login", json={"email": email, "password": "bench"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run(label: str, ttl: float, concurrency: int, duration: float) -> dict:
+    principal_cache.ttl = ttl
+    principal_cache.clear()
+    principal_cache.hits = principal_cache.misses = 0
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = await _login(client)
+        await client.post("/workspaces/", json={"name": "bench"}, headers=headers)
+
+        count = 0
+        errors = 0
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal count, errors
+            while time.perf_counter() < deadline:
+                response = await client.get("/workspaces/", headers=headers)
+                count += 1
+                errors += response.status_code != 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "mode": label,
+        "requests": count,
+        "errors": errors,
+        "requests_per_s": round(count / elapsed, 1),
+        "cache": principal_cache.stats(),
+    }
+
+
+async def main(args):
+    default_ttl = principal_cache.ttl
+    results = [
+        await run("no-cache", 0, args.concurrency, args.duration),
+        await run("cache", default_ttl, args.concurrency, args.duration),
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GET /workspaces/ with and without the principal cache")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,137 @@
+"""
+Time to first token of streaming turns as database latency grows.
+
+Routes the app's database connections through benchmarks.latency_proxy,
+which adds --delays seconds in each direction (so 2 x delay per round
+trip), and plays --turns sequential turns on /chats/stream and
+/chats/agent/stream against near-instant fake OpenRouter and Tavily
+servers, so TTFT is dominated by the pre-stream database work.
+
+With --baseline <git ref>, the same runs are made against that revision
+(checked out into a temporary git worktree), e.g. the commit before the
+single-statement turn prologue. `extra_round_trips` estimates the database
+round trips on the TTFT path: (TTFT at delay d - TTFT at 0) / 2d.
+
+Needs a migrated DATABASE_URL.
+
+    python -m benchmarks.bench_prologue --delays 0,0.001,0.005 --turns 40 --baseline <ref>
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import make_url
+
+from app.core.config import settings
+from benchmarks.common import bootstrap_chat, percentile, spawn, spawn_app, stop
+
+ENDPOINTS = ("/chats/stream", "/chats/agent/stream")
+
+
+def proxied_database_url(proxy_port: int) -> Tuple[str, str]:
+    """The DATABASE_URL through the proxy, and the proxy's target."""
+    url = make_url(settings.ASYNC_DATABASE_URL)
+    query = dict(url.query)
+    host = query.pop("host", None) or url.host or "localhost"
+    port = int(query.pop("port", None) or url.port or 5432)
+    target = f"{host}/.s.PGSQL.{port}" if host.startswith("/") else f"{host}:{port}"
+    proxied = url.set(host="127.0.0.1", port=proxy_port, query=query)
+    return proxied.render_as_string(hide_password=False), target
+
+
+async def play(base_url: str, turns: int) -> Dict[str, dict]:
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        setup = await bootstrap_chat(client)
+        for endpoint in ENDPOINTS:
+            ttfts = []
+            # The first turn warms connections, prepared statements and caches
+            for turn in range(turns + 1):
+                start = time.perf_counter()
+                async with client.stream(
+                    "POST", endpoint,
+                    json={"chat_id": setup["chat"]["id"], "message": f"Question {turn} about {endpoint}?"},
+                    headers=setup["headers"],
+                ) as response:
+                    response.raise_for_status()
+                    async for _ in response.aiter_raw():
+                        if turn:
+                            ttfts.append(time.perf_counter() - start)
+                        break
+            ttfts.sort()
+            results[endpoint] = {f"ttft_ms_p{p}": round(percentile(ttfts, p) * 1000, 2) for p in (50, 95)}
+    return results
+
+
+def run_revision(cwd: Optional[str], delays: List[float], args) -> Dict[str, dict]:
+    results = {}
+    for delay in delays:
+        database_url, target = proxied_database_url(args.proxy_port)
+        proxy = spawn(
+            ["-m", "benchmarks.latency_proxy", "--port", str(args.proxy_port),
+             "--target", target, "--delay", str(delay)],
+            args.proxy_port,
+        )
+        env = {
+            "DATABASE_URL": database_url,
+            "OPENROUTER_BASE_URL": f"http://127.0.0.1:{args.upstream_port}/api/v1",
+            "OPENROUTER_HTTP2": "false",
+            "TAVILY_SEARCH_URL": f"http://127.0.0.1:{args.tavily_port}/search",
+            "BCRYPT_ROUNDS": "4",
+        }
+        app = spawn_app(args.app_port, env, cwd)
+        try:
+            results[str(delay)] = asyncio.run(play(f"http://127.0.0.1:{args.app_port}", args.turns))
+        finally:
+            stop(app, proxy)
+
+    # Extra round trips on the TTFT path, from the slope against the added delay
+    base = results[str(delays[0])]
+    for delay in delays[1:]:
+        for endpoint, stats in results[str(delay)].items():
+            added = stats["ttft_ms_p50"] - base[endpoint]["ttft_ms_p50"]
+            stats["extra_round_trips"] = round(added / (2 * (delay - delays[0]) * 1000), 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming TTFT under injected database latency")
+    parser.add_argument("--delays", default="0,0.001,0.005", help="one-way delays in seconds")
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--baseline", help="git ref to compare against (run from a git checkout)")
+    parser.add_argument("--app-port", type=int, default=8140)
+    parser.add_argument("--upstream-port", type=int, default=8141)
+    parser.add_argument("--tavily-port", type=int, default=8142)
+    parser.add_argument("--proxy-port", type=int, default=8143)
+    args = parser.parse_args()
+    delays = [float(d) for d in args.delays.split(",")]
+
+    upstream = spawn(
+        ["-m", "benchmarks.fake_openrouter", "--port", str(args.upstream_port),
+         "--tokens", "5", "--first-token-delay", "0", "--token-delay", "0"],
+        args.upstream_port,
+    )
+    search = spawn(["-m", "benchmarks.fake_tavily", "--port", str(args.tavily_port), "--latency", "0"], args.tavily_port)
+    results = {}
+    try:
+        results["current"] = run_revision(None, delays, args)
+        if args.baseline:
+            worktree = tempfile.mkdtemp(prefix="aibot-baseline-")
+            subprocess.run(["git", "worktree", "add", "--detach", worktree, args.baseline], check=True)
+            try:
+                results[args.baseline] = run_revision(os.path.join(worktree, "backend"), delays, args)
+            finally:
+                subprocess.run(["git", "worktree", "remove", "--force", worktree], check=False)
+    finally:
+        stop(upstream, search)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Deleting a large chat: one DELETE in the request vs soft delete + background purge.
+
+Seeds chats with --messages messages each (COPY) and deletes them:
+- before: the old endpoint's statements (DELETE every message, then the
+  chat, in one transaction), timed as the request would be
+- after: DELETE /chats/{id} in-process (httpx ASGITransport), then the
+  background purge worker (app/core/purger.py) it wakes, until the chat
+  row is gone
+
+Reports request latency, the WAL written by the single transaction vs the
+largest purge batch, the per-batch transaction times (how long row locks
+are held at a time) and the total purge time. It also checks that:
+- the chat is hidden from reads at once
+- a purge stopped halfway (worker shutdown) resumes after a restart
+- clearing a chat hides the old messages but keeps new ones
+
+Needs a migrated DATABASE_URL.
+
+    python -m benchmarks.bench_purge --messages 200000 --batch-size 1000
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import delete, func, select, text
+
+from app.core import purger
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, engine
+from app.main import app
+from app.models.chat import Chat
+from app.models.message import Message
+from benchmarks.common import bootstrap_chat, percentile
+
+
+async def new_chat(client: httpx.AsyncClient, setup: dict) -> str:
+    response = await client.post(
+        "/chats/", json={"workspace_id": setup["workspace"]["id"], "title": "bench"}, headers=setup["headers"]
+    )
+    return response.json()["id"]
+
+
+async def seed(chat_id: str, count: int, start: datetime) -> None:
+    async with engine.connect() as conn:
+        raw = (await conn.get_raw_connection()).driver_connection
+        content = "purge bench message " * 10
+        await raw.copy_records_to_table(
+            "messages", columns=["id", "chat_id", "role", "content", "token_count", "created_at"],
+            records=[
+                (uuid.uuid4(), uuid.UUID(chat_id), "user" if i % 2 else "assistant", content, 40,
+                 start + timedelta(milliseconds=i))
+                for i in range(count)
+            ],
+        )
+        await conn.commit()
+
+
+async def wal_lsn(db) -> str:
+    return (await db.execute(text("SELECT pg_current_wal_lsn()"))).scalar_one()
+
+
+async def wal_bytes(db, since: str) -> int:
+    result = await db.execute(text("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), :since)"), {"since": since})
+    return int(result.scalar_one())
+
+
+async def count_messages(chat_id: str) -> int:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(
+            select(func.count()).select_from(Message).where(Message.chat_id == uuid.UUID(chat_id))
+        )).scalar_one()
+
+
+async def chat_exists(chat_id: str) -> bool:
+    async with AsyncSessionLocal() as db:
+        return await db.get(Chat, uuid.UUID(chat_id)) is not None
+
+
+async def wait_until(probe, expected, timeout: float = 600.0) -> None:
+    deadline = time.perf_counter() + timeout
+    while await probe() != expected:
+        if time.perf_counter() > deadline:
+            raise TimeoutError("purge did not finish")
+        await asyncio.sleep(0.02)
+
+
+async def cleared_at(chat_id: str):
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(Chat.cleared_at).where(Chat.id == uuid.UUID(chat_id)))).scalar_one()
+
+
+async def before(chat_id: str) -> dict:
+    async with AsyncSessionLocal() as db:
+        lsn = await wal_lsn(db)
+        await db.commit()
+        start = time.perf_counter()
+        await db.execute(delete(Message).where(Message.chat_id == uuid.UUID(chat_id)))
+        await db.execute(delete(Chat).where(Chat.id == uuid.UUID(chat_id)))
+        await db.commit()
+        elapsed = time.perf_counter() - start
+        return {"request_ms": round(elapsed * 1000, 1), "transaction_wal_mb": round(await wal_bytes(db, lsn) / 2**20, 1)}
+
+
+async def after(client: httpx.AsyncClient, setup: dict, chat_id: str) -> dict:
+    # Time each purge batch (one transaction each) and its WAL
+    batches = []
+    delete_batch = purger._delete_batch
+
+    async def timed_batch(*args):
+        async with AsyncSessionLocal() as db:
+            lsn = await wal_lsn(db)
+        start = time.perf_counter()
+        result = await delete_batch(*args)
+        elapsed = time.perf_counter() - start
+        async with AsyncSessionLocal() as db:
+            batches.append((elapsed, await wal_bytes(db, lsn)))
+        return result
+
+    purger._delete_batch = timed_batch
+    try:
+        start = time.perf_counter()
+        response = await client.delete(f"/chats/{chat_id}", headers=setup["headers"])
+        request_ms = (time.perf_counter() - start) * 1000
+        assert response.status_code == 204, response.text
+
+        hidden = (
+            (await client.get("/messages/", params={"chat_id": chat_id}, headers=setup["headers"])).status_code == 404
+            and chat_id not in {
+                c["id"] for c in (await client.get(
+                    "/chats/", params={"workspace_id": setup["workspace"]["id"]}, headers=setup["headers"]
+                )).json()
+            }
+        )
+
+        # The endpoint woke the purge worker; wait for it to finish
+        start = time.perf_counter()
+        await wait_until(lambda: chat_exists(chat_id), False)
+        purge_s = time.perf_counter() - start
+    finally:
+        purger._delete_batch = delete_batch
+
+    times = sorted(t for t, _ in batches)
+    return {
+        "request_ms": round(request_ms, 1),
+        "hidden_immediately": hidden,
+        "chat_row_gone": not await chat_exists(chat_id),
+        "purge_s": round(purge_s, 2),
+        "batches": len(batches),
+        "batch_ms": {f"p{p}": round(percentile(times, p) * 1000, 1) for p in (50, 99)},
+        "max_batch_wal_mb": round(max(w for _, w in batches) / 2**20, 2),
+    }
+
+
+async def resume_check(client: httpx.AsyncClient, setup: dict, messages: int, start_at: datetime) -> dict:
+    chat_id = await new_chat(client, setup)
+    await seed(chat_id, messages, start_at)
+    await client.delete(f"/chats/{chat_id}", headers=setup["headers"])
+    # Stop the worker partway, as a shutdown would, then start it again
+    while await count_messages(chat_id) > messages // 2:
+        await asyncio.sleep(0.02)
+    await purger.stop()
+    left = await count_messages(chat_id)
+    await purger.start()
+    await wait_until(lambda: chat_exists(chat_id), False)
+    return {
+        "left_after_stop": left,
+        "left_after_restart": await count_messages(chat_id),
+        "chat_row_gone": not await chat_exists(chat_id),
+    }
+
+
+async def clear_check(client: httpx.AsyncClient, setup: dict, messages: int, start_at: datetime) -> dict:
+    chat_id = await new_chat(client, setup)
+    await seed(chat_id, messages, start_at)
+    headers = setup["headers"]
+    await client.post(f"/chats/{chat_id}/clear", headers=headers)
+    visible_after_clear = len((await client.get("/messages/", params={"chat_id": chat_id}, headers=headers)).json())
+    await client.post("/messages/", json={"chat_id": chat_id, "role": "user", "content": "after clear"}, headers=headers)
+    await wait_until(lambda: cleared_at(chat_id), None)
+    remaining = (await client.get("/messages/", params={"chat_id": chat_id}, headers=headers)).json()
+    return {
+        "visible_after_clear": visible_after_clear,
+        "stored_after_purge": await count_messages(chat_id),
+        "visible_after_purge": [m["content"] for m in remaining],
+    }
+
+
+async def run(args) -> dict:
+    settings.PURGE_BATCH_SIZE = args.batch_size
+    settings.PURGE_BATCH_DELAY = args.batch_delay
+    start_at = datetime.now(timezone.utc) - timedelta(days=1)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        setup = await bootstrap_chat(client)
+        old_chat, new_chat_id = setup["chat"]["id"], await new_chat(client, setup)
+        for chat_id in (old_chat, new_chat_id):
+            await seed(chat_id, args.messages, start_at)
+        async with engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("VACUUM ANALYZE messages"))
+
+        results = {
+            "messages_per_chat": args.messages,
+            "batch_size": args.batch_size,
+            "batch_delay_s": args.batch_delay,
+            "before_single_delete": await before(old_chat),
+            "after_soft_delete_and_purge": await after(client, setup, new_chat_id),
+            "resume": await resume_check(client, setup, min(args.messages, 20000), start_at),
+            "clear": await clear_check(client, setup, min(args.messages, 5000), start_at),
+        }
+    await purger.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Large chat deletion: single DELETE vs background purge")
+    parser.add_argument("--messages", type=int, default=200_000, help="messages per deleted chat")
+    parser.add_argument("--batch-size", type=int, default=settings.PURGE_BATCH_SIZE)
+    parser.add_argument("--batch-delay", type=float, default=settings.PURGE_BATCH_DELAY)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
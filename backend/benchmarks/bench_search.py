@@ -0,0 +1,234 @@
+"""
+Latency of GET /messages/search on a large message table.
+
+Seeds --messages synthetic messages (default 1M) with COPY: --users users
+with --chats chats each, Zipf-distributed words from a pseudo-word
+vocabulary, so some terms match most messages and others a handful. The
+searching user owns --user-share of all messages; a second, "small" user
+owns an even share of the rest. The dataset is tagged and reused by later
+runs (--reseed rebuilds it, --drop deletes it afterwards).
+
+For common, mid-frequency, rare, AND and phrase queries it runs the
+endpoint's own SQL (build_search_query) --repeat times and reports
+p50/p95/p99 latency, the number of matching messages, and whether the plan
+reads the GIN index. It also pages through one result set with cursors and
+checks the pages against a single ordered query.
+
+Needs a migrated DATABASE_URL.
+
+    python -m benchmarks.bench_search --messages 1000000 --repeat 30
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from sqlalchemy import delete, func, select, text
+
+from app.api.message import build_search_query, run_search
+from app.core.database import AsyncSessionLocal, engine
+from app.models.chat import Chat
+from app.models.message import Message
+from app.models.user import User
+from app.models.workspace import Workspace
+from benchmarks.common import percentile
+
+EMAIL_PREFIX = "search-bench-"
+SYLLABLES = ["ka", "lo", "mi", "ren", "tu", "vas", "po", "zel", "din", "sha", "qua", "bri", "nof", "yel", "gor", "hex"]
+
+
+def vocabulary(size: int, rng: random.Random) -> List[str]:
+    # Deterministic for a given seed (no set iteration order), so reruns reuse the dataset
+    words = {}
+    while len(words) < size:
+        words["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))] = None
+    return list(words)
+
+
+async def dataset_users(db) -> List[User]:
+    result = await db.execute(select(User).where(User.email.like(f"{EMAIL_PREFIX}%")).order_by(User.email))
+    return list(result.scalars().all())
+
+
+async def drop_dataset(db) -> None:
+    users = select(User.id).where(User.email.like(f"{EMAIL_PREFIX}%"))
+    workspaces = select(Workspace.id).where(Workspace.user_id.in_(users))
+    chats = select(Chat.id).where(Chat.workspace_id.in_(workspaces))
+    await db.execute(delete(Message).where(Message.chat_id.in_(chats)))
+    await db.execute(delete(Chat).where(Chat.workspace_id.in_(workspaces)))
+    await db.execute(delete(Workspace).where(Workspace.user_id.in_(users)))
+    await db.execute(delete(User).where(User.email.like(f"{EMAIL_PREFIX}%")))
+    await db.commit()
+
+
+async def seed(args, vocab: List[str], rng: random.Random) -> None:
+    weights = [1 / (rank + 1) for rank in range(len(vocab))]
+    cum_weights = []
+    total = 0.0
+    for w in weights:
+        total += w
+        cum_weights.append(total)
+
+    # User 0 searches, user 1 is the small user; the rest is background
+    users = [(uuid.uuid4(), f"{EMAIL_PREFIX}{i:04d}@example.com") for i in range(args.users)]
+    chats = {user_id: [uuid.uuid4() for _ in range(args.chats)] for user_id, _ in users}
+    rest = (1 - args.user_share) / (args.users - 1)
+    share = [args.user_share] + [rest] * (args.users - 1)
+
+    async with engine.connect() as conn:
+        raw = (await conn.get_raw_connection()).driver_connection
+        await raw.copy_records_to_table(
+            "users", columns=["id", "email", "hashed_password"],
+            records=[(user_id, email, "x") for user_id, email in users],
+        )
+        await raw.copy_records_to_table(
+            "workspaces", columns=["id", "name", "user_id"],
+            records=[(user_id, "bench", user_id) for user_id, _ in users],
+        )
+        await raw.copy_records_to_table(
+            "chats", columns=["id", "title", "workspace_id"],
+            records=[(chat_id, f"chat {n}", user_id) for user_id, ids in chats.items() for n, chat_id in enumerate(ids)],
+        )
+
+        start = datetime.now(timezone.utc) - timedelta(days=90)
+        batch = 50_000
+        written = 0
+        seeded = time.perf_counter()
+        while written < args.messages:
+            records = []
+            for i in range(written, min(args.messages, written + batch)):
+                user_id = users[rng.choices(range(args.users), weights=share)[0]][0]
+                words = rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(5, 40))
+                content = " ".join(words)
+                records.append((
+                    uuid.uuid4(), rng.choice(chats[user_id]), "user" if i % 2 else "assistant",
+                    content, len(content) // 4, start + timedelta(seconds=i * 7),
+                ))
+            await raw.copy_records_to_table(
+                "messages", columns=["id", "chat_id", "role", "content", "token_count", "created_at"],
+                records=records,
+            )
+            written += len(records)
+            print(f"seeded {written}/{args.messages} ({time.perf_counter() - seeded:.0f}s)", flush=True)
+        await conn.commit()
+
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE messages"))
+        await conn.execute(text("ANALYZE chats"))
+        await conn.execute(text("ANALYZE workspaces"))
+
+
+async def explain(db, query) -> dict:
+    compiled = query.compile(dialect=engine.dialect)
+    params = [compiled.params[name] for name in compiled.positiontup]
+    raw = (await (await db.connection()).get_raw_connection()).driver_connection
+    plan = await raw.fetchval(f"EXPLAIN (FORMAT JSON) {compiled}", *params)
+    # SQLAlchemy's asyncpg setup may already decode json
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+
+
+def plan_uses(plan: dict, index: str) -> bool:
+    if plan.get("Index Name") == index:
+        return True
+    return any(plan_uses(child, index) for child in plan.get("Plans", []))
+
+
+async def measure(user_id: uuid.UUID, q: str, args) -> dict:
+    async with AsyncSessionLocal() as db:
+        query = build_search_query(user_id, q, args.limit + 1)
+        matches = (await db.execute(
+            select(func.count()).select_from(build_search_query(user_id, q, 10**9).subquery())
+        )).scalar_one()
+        plan = await explain(db, query)
+        await run_search(db, query)  # warm cache
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            rows = await run_search(db, query)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        return {
+            "matches": matches,
+            "returned": len(rows),
+            "gin_index_used": plan_uses(plan, "ix_messages_search_vector"),
+            **{f"p{p}_ms": round(percentile(timings, p) * 1000, 2) for p in (50, 95, 99)},
+        }
+
+
+async def check_pagination(user_id: uuid.UUID, q: str, page_size: int) -> dict:
+    async with AsyncSessionLocal() as db:
+        expected = [row.id for row in (await db.execute(build_search_query(user_id, q, 10**9))).all()]
+        seen = []
+        after = None
+        while True:
+            rows = (await db.execute(build_search_query(user_id, q, page_size + 1, after=after))).all()
+            seen.extend(row.id for row in rows[:page_size])
+            if len(rows) <= page_size:
+                break
+            after = (rows[page_size - 1].rank, rows[page_size - 1].id)
+    return {"query": q, "hits": len(expected), "pages_match_single_query": seen == expected}
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    vocab = vocabulary(args.vocabulary, rng)
+    async with AsyncSessionLocal() as db:
+        users = await dataset_users(db)
+        if users and (args.reseed or len(users) != args.users):
+            await drop_dataset(db)
+            users = []
+    if not users:
+        await seed(args, vocab, rng)
+        async with AsyncSessionLocal() as db:
+            users = await dataset_users(db)
+    else:
+        print("reusing the existing dataset (--reseed rebuilds it)", flush=True)
+
+    async with AsyncSessionLocal() as db:
+        total = (await db.execute(select(func.count()).select_from(Message))).scalar_one()
+
+    queries = {
+        "common term": vocab[0],
+        "mid term": vocab[100],
+        "rare term": vocab[5000],
+        "two terms (AND)": f"{vocab[3]} {vocab[60]}",
+        "phrase": f'"{vocab[1]} {vocab[2]}"',
+        "no match": "zzzzqx",
+    }
+    results = {}
+    for label, user in (("search user", users[0]), ("small user", users[1])):
+        results[label] = {name: await measure(user.id, q, args) for name, q in queries.items()}
+        print(f"{label}: done", flush=True)
+
+    pagination = await check_pagination(users[1].id, vocab[1000], page_size=7)
+
+    if args.drop:
+        async with AsyncSessionLocal() as db:
+            await drop_dataset(db)
+
+    return {"messages_in_table": total, "limit": args.limit, "results": results, "pagination": pagination}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text message search latency")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--chats", type=int, default=20, help="chats per user")
+    parser.add_argument("--user-share", type=float, default=0.1, help="fraction of messages owned by the searching user")
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=20, help="page size")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reseed", action="store_true", help="rebuild the dataset")
+    parser.add_argument("--drop", action="store_true", help="delete the dataset afterwards")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Throughput and allocations per event of upstream SSE parsing, old
+line-based path vs the parser stream_completion() runs
+(app/core/openrouter.StreamParser over app/core/sse.py).
+
+Replays benchmarks/fixtures/openrouter_stream.sse (OpenRouter wire format:
+keep-alive comments, one JSON chunk per token, a usage chunk and [DONE]),
+repeated and cut into fixed-size reads as they would come off the socket:
+- LF and CRLF line endings
+- --chunk-sizes read sizes; the small ones split events (and CRLFs) across reads
+- a malformed variant: every --malformed-every-th chunk truncated mid-JSON,
+  which the parser must count and skip
+Each parser extracts the content deltas; the results must be identical.
+
+Per case: MB/s and events/s (best of --repeat), and per event:
+- alloc_bytes: bytes allocated while parsing, from tracemalloc's peak
+  within each read (summed over reads, divided by events), minus what the
+  measuring itself costs (a parser that does nothing, same reads). Memory
+  freed and reused inside one read is counted once, as the allocator sees it.
+- retained_bytes: what is still allocated after the stream, minus the
+  returned deltas (0 = nothing kept per event)
+Malformed-chunk logging is silenced so the numbers are the parser's.
+
+    python -m benchmarks.bench_sse_parser --copies 50 --chunk-sizes 7,64,1400,16384
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+from httpx._decoders import LineDecoder, TextDecoder
+
+from app.core import openrouter, sse
+
+FIXTURE = Path(__file__).parent / "fixtures" / "openrouter_stream.sse"
+DONE = b"data: [DONE]\n\n"
+
+
+def line_based(reads: List[bytes]) -> List[str]:
+    """The previous path: httpx aiter_lines() (text decode + line split), then json.loads."""
+    text_decoder, line_decoder = TextDecoder(), LineDecoder()
+    out = []
+    for raw in reads:
+        for line in line_decoder.decode(text_decoder.decode(raw)):
+            if not line.startswith("data: "):
+                continue
+            line_content = line[6:]
+            if line_content == "[DONE]":
+                continue
+            try:
+                chunk = json.loads(line_content)
+            except json.JSONDecodeError:
+                continue
+            if chunk.get("choices"):
+                content = chunk["choices"][0].get("delta", {}).get("content")
+                if content:
+                    out.append(content)
+    return out
+
+
+def stream_parser(loads: Callable) -> Callable[[Iterable[bytes]], List[str]]:
+    """The real path: openrouter.StreamParser, with `loads` as the JSON backend."""
+    def parse(reads: Iterable[bytes]) -> List[str]:
+        sse.loads = loads
+        parser = openrouter.StreamParser()
+        out = []
+        for raw in reads:
+            out += parser.feed(raw)
+        return out
+    return parse
+
+
+class MeasuredReads:
+    """
+    The reads, handed out one by one. The parser asks for the next read
+    once it is done with the current one, so tracemalloc's peak between
+    two handouts is what parsing that read allocated.
+    """
+
+    def __init__(self, reads: List[bytes]):
+        self.reads = reads
+        self.alloc_bytes = 0
+
+    def __iter__(self) -> Iterator[bytes]:
+        for raw in self.reads:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            yield raw
+            self.alloc_bytes += tracemalloc.get_traced_memory()[1] - before
+
+
+def no_op(reads: Iterable[bytes]) -> List[str]:
+    for _ in reads:
+        pass
+    return []
+
+
+def allocated(parse: Callable, reads: List[bytes]) -> Tuple[int, List[str], int]:
+    measured = MeasuredReads(reads)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    out = parse(measured)
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    # The returned deltas are the result, not parser state
+    retained -= sys.getsizeof(out) + sum(sys.getsizeof(delta) for delta in out)
+    return measured.alloc_bytes, out, max(retained, 0)
+
+
+def measure(parse: Callable, reads: List[bytes], total_bytes: int, events: int, repeat: int) -> dict:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(reads)
+        best = min(best, time.perf_counter() - start)
+    alloc_bytes, _, retained = allocated(parse, reads)
+    overhead = allocated(no_op, reads)[0]
+    return {
+        "mb_per_s": round(total_bytes / best / 1e6, 1),
+        "events_per_s": round(events / best),
+        "alloc_bytes_per_event": round(max(alloc_bytes - overhead, 0) / events),
+        "retained_bytes_per_event": round(retained / events, 1),
+    }
+
+
+def corrupt(fixture: bytes, every: int) -> Tuple[bytes, int]:
+    """Every `every`-th JSON chunk cut off mid-object; returns the stream and how many were cut."""
+    blocks = fixture.split(b"\n\n")
+    cut = 0
+    for n, block in enumerate(blocks):
+        if block.startswith(b"data: {") and n % every == 0:
+            blocks[n] = block[:len(block) // 2]
+            cut += 1
+    return b"\n\n".join(blocks), cut
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upstream SSE parsing throughput and allocations per event")
+    parser.add_argument("--copies", type=int, default=50, help="fixture streams concatenated")
+    parser.add_argument("--chunk-sizes", default="7,64,1400,16384", help="socket read sizes")
+    parser.add_argument("--malformed-every", type=int, default=10, help="cut every Nth chunk in the malformed case")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    logging.getLogger(openrouter.__name__).setLevel(logging.ERROR)
+
+    # One [DONE] at the very end: the parser stops reading there
+    fixture = FIXTURE.read_bytes().replace(DONE, b"")
+    malformed, cut = corrupt(fixture, args.malformed_every)
+    parsers = {"aiter_lines+json": line_based, "StreamParser+json": stream_parser(sse._stdlib_loads)}
+    if sse.JSON_BACKEND != "json":
+        parsers[f"StreamParser+{sse.JSON_BACKEND}"] = stream_parser(sse.loads)
+    default_loads = sse.loads
+
+    results = {}
+    for variant, body, bad in (("LF", fixture, 0), ("CRLF", fixture.replace(b"\n", b"\r\n"), 0),
+                               ("LF malformed", malformed, cut)):
+        stream = body * args.copies + DONE.replace(b"\n", b"\r\n" if variant == "CRLF" else b"\n")
+        events = stream.count(b"data: ")
+        for size in (int(s) for s in args.chunk_sizes.split(",")):
+            reads = [stream[i:i + size] for i in range(0, len(stream), size)]
+            expected = line_based(reads)
+            case = {}
+            for name, parse in parsers.items():
+                if parse(reads) != expected:
+                    raise SystemExit(f"{name} disagrees with the line-based parser ({variant}, {size})")
+                case[name] = measure(parse, reads, len(stream), events, args.repeat)
+            # Skipped and counted, once each
+            sse.loads = default_loads
+            check = openrouter.StreamParser()
+            for raw in reads:
+                check.feed(raw)
+            if check.malformed != bad * args.copies or not check.done:
+                raise SystemExit(f"StreamParser counted {check.malformed} malformed chunks, expected {bad * args.copies}")
+            results[f"{variant}, {size}-byte reads"] = case
+
+    print(json.dumps({
+        "stream_bytes": len(fixture) * args.copies,
+        "events": fixture.count(b"data: ") * args.copies + 1,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Prompt size and time-to-first-token over a long conversation, with and
+without rolling chat summaries.
+
+Runs the real app under uvicorn against benchmarks.fake_openrouter, whose
+stub model adds prefill time proportional to prompt size and records each
+prompt. Plays N sequential turns in one chat for each mode and reports
+mean prompt tokens and TTFT per block of turns.
+
+Needs a migrated DATABASE_URL.
+
+    python -m benchmarks.bench_summaries --turns 200
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from benchmarks.common import bootstrap_chat, percentile, spawn, spawn_app, stop
+
+
+async def play(base_url: str, upstream_url: str, turns: int, block: int) -> dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        setup = await bootstrap_chat(client)
+        await client.post(f"{upstream_url}/stats/reset")
+
+        ttfts = []
+        for turn in range(turns):
+            message = f"Turn {turn}: tell me something new about topic number {turn % 17}."
+            start = time.perf_counter()
+            first = None
+            async with client.stream(
+                "POST", "/chats/stream",
+                json={"chat_id": setup["chat"]["id"], "message": message},
+                headers=setup["headers"],
+            ) as response:
+                async for _ in response.aiter_raw():
+                    if first is None:
+                        first = time.perf_counter() - start
+            ttfts.append(first or 0.0)
+            # Let a scheduled background summary land before the next turn
+            await asyncio.sleep(0.05)
+
+        seen = (await client.get(f"{upstream_url}/stats")).json()
+
+    prompts = [r["prompt_tokens"] for r in seen if r["stream"]]
+    summary_calls = [r["prompt_tokens"] for r in seen if not r["stream"]]
+    blocks = []
+    for i in range(0, turns, block):
+        blocks.append({
+            "turns": f"{i + 1}-{min(i + block, turns)}",
+            "prompt_tokens_mean": round(statistics.mean(prompts[i:i + block]), 1),
+            "ttft_ms_mean": round(statistics.mean(ttfts[i:i + block]) * 1000, 1),
+        })
+    ttfts.sort()
+    return {
+        "prompt_tokens_total": sum(prompts),
+        "summary_calls": len(summary_calls),
+        "summary_prompt_tokens_total": sum(summary_calls),
+        "ttft_ms_p50": round(percentile(ttfts, 50) * 1000, 1),
+        "ttft_ms_p95": round(percentile(ttfts, 95) * 1000, 1),
+        "blocks": blocks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rolling summaries vs budget-only history")
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--block", type=int, default=40)
+    parser.add_argument("--tokens", type=int, default=80, help="stub reply length")
+    parser.add_argument("--prefill-per-1k", type=float, default=0.05)
+    parser.add_argument("--app-port", type=int, default=8110)
+    parser.add_argument("--upstream-port", type=int, default=8111)
+    args = parser.parse_args()
+
+    upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+    upstream = spawn(
+        ["-m", "benchmarks.fake_openrouter", "--port", str(args.upstream_port),
+         "--tokens", str(args.tokens), "--first-token-delay", "0.02", "--token-delay", "0",
+         "--prefill-per-1k", str(args.prefill_per_1k)],
+        args.upstream_port,
+    )
+    results = {}
+    try:
+        for label, trigger in (("budget-only", "0"), ("rolling-summary", None)):
+            env = {"OPENROUTER_BASE_URL": f"{upstream_url}/api/v1", "OPENROUTER_HTTP2": "false"}
+            if trigger is not None:
+                env["SUMMARY_TRIGGER_TOKENS"] = trigger
+            app = spawn_app(args.app_port, env)
+            try:
+                results[label] = asyncio.run(
+                    play(f"http://127.0.0.1:{args.app_port}", upstream_url, args.turns, args.block)
+                )
+            finally:
+                stop(app)
+    finally:
+        stop(upstream)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
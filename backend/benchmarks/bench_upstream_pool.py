@@ -0,0 +1,178 @@
+"""
+Compares a fresh httpx.AsyncClient per stream (the old stream_chat behaviour)
+against the shared pooled client from app.core.openrouter.
+
+Starts benchmarks.fake_openrouter in a subprocess, drives N concurrent
+workers that each run several streams back to back, and prints
+time-to-first-token percentiles and token throughput as JSON.
+
+    python -m benchmarks.bench_upstream_pool --concurrency 64 --streams 5 --tls
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Settings() needs these to import app modules; values are irrelevant here.
+for _key in ("POSTGRES_SERVER", "POSTGRES_USER", "POSTGRES_PASSWORD", "POSTGRES_DB",
+             "OPENROUTER_API_KEY", "TAVILY_API_KEY", "SECRET_KEY"):
+    os.environ.setdefault(_key, "bench")
+os.environ.setdefault("POSTGRES_PORT", "5432")
+
+import httpx  # noqa: E402
+
+from app.core import openrouter  # noqa: E402
+
+PAYLOAD = {
+    "model": "bench",
+    "messages": [{"role": "user", "content": "hello"}],
+    "stream": True,
+}
+
+
+def make_self_signed_cert(directory: str):
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    keyfile = os.path.join(directory, "key.pem")
+    certfile = os.path.join(directory, "cert.pem")
+    with open(keyfile, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ))
+    with open(certfile, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    return keyfile, certfile
+
+
+def start_server(port: int, args, tls_files=None) -> subprocess.Popen:
+    cmd = [
+        sys.executable, "-m", "benchmarks.fake_openrouter",
+        "--port", str(port),
+        "--tokens", str(args.tokens),
+        "--first-token-delay", str(args.first_token_delay),
+        "--token-delay", str(args.token_delay),
+    ]
+    if tls_files:
+        cmd += ["--ssl-keyfile", tls_files[0], "--ssl-certfile", tls_files[1]]
+    if args.http2:
+        cmd.append("--http2")
+    proc = subprocess.Popen(cmd)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("fake OpenRouter did not start")
+
+
+async def _one_stream(client: httpx.AsyncClient, url: str, ttfts: list) -> int:
+    start = time.perf_counter()
+    first = None
+    tokens = 0
+    async with client.stream("POST", url, json=PAYLOAD) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("data: ") and line[6:] != "[DONE]":
+                if first is None:
+                    first = time.perf_counter() - start
+                tokens += 1
+    ttfts.append(first or 0.0)
+    return tokens
+
+
+async def run(mode: str, base_url: str, concurrency: int, streams: int) -> dict:
+    url = f"{base_url}/chat/completions"
+    ttfts: list = []
+    shared = openrouter.build_client(base_url=base_url, verify=False) if mode == "pooled" else None
+
+    async def worker() -> int:
+        total = 0
+        for _ in range(streams):
+            if shared is not None:
+                total += await _one_stream(shared, url, ttfts)
+            else:
+                async with httpx.AsyncClient(verify=False) as client:
+                    total += await _one_stream(client, url, ttfts)
+        return total
+
+    start = time.perf_counter()
+    try:
+        totals = await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        if shared is not None:
+            await shared.aclose()
+    elapsed = time.perf_counter() - start
+
+    ttfts.sort()
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "streams": len(ttfts),
+        "elapsed_s": round(elapsed, 3),
+        "tokens_per_s": round(sum(totals) / elapsed, 1),
+        "streams_per_s": round(len(ttfts) / elapsed, 1),
+        "ttft_ms_p50": round(statistics.median(ttfts) * 1000, 2),
+        "ttft_ms_p95": round(ttfts[int(len(ttfts) * 0.95) - 1] * 1000, 2),
+        "ttft_ms_max": round(ttfts[-1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request vs pooled OpenRouter client")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--streams", type=int, default=5, help="sequential streams per worker")
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--first-token-delay", type=float, default=0.05)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--tls", action="store_true", help="serve over TLS to include handshake cost")
+    parser.add_argument("--http2", action="store_true", help="let the fake server negotiate HTTP/2 (implies --tls)")
+    args = parser.parse_args()
+    args.tls = args.tls or args.http2
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tls_files = make_self_signed_cert(tmp) if args.tls else None
+        scheme = "https" if args.tls else "http"
+        base_url = f"{scheme}://127.0.0.1:{args.port}/api/v1"
+        server = start_server(args.port, args, tls_files)
+        try:
+            results = [
+                asyncio.run(run(mode, base_url, args.concurrency, args.streams))
+                for mode in ("per-request", "pooled")
+            ]
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Helpers shared by the benchmark scripts: subprocess servers and percentiles."""
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence
+
+
+def wait_for_port(port: int, host: str = "127.0.0.1", timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"nothing listening on {host}:{port} after {timeout}s")
+
+
+def spawn(
+    args: Sequence[str], port: int, env: Optional[Dict[str, str]] = None, cwd: Optional[str] = None
+) -> subprocess.Popen:
+    """Runs `python <args>` with extra env vars and waits until `port` accepts connections."""
+    proc = subprocess.Popen([sys.executable, *args], env={**os.environ, **(env or {})}, cwd=cwd)
+    try:
+        wait_for_port(port)
+    except RuntimeError:
+        proc.kill()
+        raise
+    return proc
+
+
+def spawn_app(port: int, env: Optional[Dict[str, str]] = None, cwd: Optional[str] = None) -> subprocess.Popen:
+    """Runs the real backend (app.main:app) under uvicorn on `port`; `cwd` selects another checkout."""
+    return spawn(
+        ["-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        port,
+        env,
+        cwd,
+    )
+
+
+def stop(*procs: subprocess.Popen) -> None:
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def bootstrap_chat(client, password: str = "bench") -> dict:
+    """Registers a fresh user over HTTP and creates a workspace and chat for it."""
+    creds = {"email": f"bench-{uuid.uuid4().hex[:12]}@example.com", "password": password}
+    (await client.post("/auth/register", json=creds)).raise_for_status()
+    token = (await client.post("/auth/login", json=creds)).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    workspace = (await client.post("/workspaces/", json={"name": "bench"}, headers=headers)).json()
+    chat = (await client.post(
+        "/chats/", json={"workspace_id": workspace["id"], "title": "bench"}, headers=headers
+    )).json()
+    return {"creds": creds, "headers": headers, "workspace": workspace, "chat": chat}
@@ -0,0 +1,125 @@
+"""
+Local stand-in for the OpenRouter chat completions API.
+
+Streams OpenAI-style SSE chunks with a configurable first-token latency and
+token rate so streaming benchmarks never touch the real (paid) service.
+Optionally adds prefill time proportional to the prompt size, and records
+prompt sizes (GET /stats, POST /stats/reset) so benchmarks can report them.
+
+    python -m benchmarks.fake_openrouter --port 8001 --tokens 50 --token-delay 0.01
+"""
+import argparse
+import asyncio
+import json
+import os
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+TOKENS = int(os.environ.get("FAKE_OPENROUTER_TOKENS", "50"))
+FIRST_TOKEN_DELAY = float(os.environ.get("FAKE_OPENROUTER_FIRST_TOKEN_DELAY", "0.05"))
+TOKEN_DELAY = float(os.environ.get("FAKE_OPENROUTER_TOKEN_DELAY", "0.01"))
+PREFILL_PER_1K = float(os.environ.get("FAKE_OPENROUTER_PREFILL_PER_1K", "0"))
+
+app = FastAPI()
+
+# One entry per completion request: {"stream": bool, "prompt_tokens": int}
+requests_seen = []
+
+
+def _prompt_tokens(messages) -> int:
+    # Stub model: 4 chars ~= 1 token, plus a small per-message overhead
+    return sum(len(m.get("content") or "") // 4 + 4 for m in messages)
+
+
+@app.get("/stats")
+async def stats():
+    return requests_seen
+
+
+@app.post("/stats/reset")
+async def reset_stats():
+    requests_seen.clear()
+    return {"status": "success"}
+
+
+def _chunk(content: str) -> bytes:
+    body = {"choices": [{"index": 0, "delta": {"content": content}}]}
+    return f"data: {json.dumps(body)}\n\n".encode("utf-8")
+
+
+@app.post("/api/v1/chat/completions")
+async def chat_completions(request: Request):
+    payload = await request.json()
+    max_tokens = payload.get("max_tokens") or TOKENS
+    n_tokens = min(TOKENS, max_tokens)
+    prompt_tokens = _prompt_tokens(payload.get("messages", []))
+    requests_seen.append({"stream": bool(payload.get("stream")), "prompt_tokens": prompt_tokens})
+    first_token_delay = FIRST_TOKEN_DELAY + PREFILL_PER_1K * prompt_tokens / 1000
+
+    if not payload.get("stream"):
+        await asyncio.sleep(first_token_delay)
+        return JSONResponse({
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "tok " * n_tokens}}]
+        })
+
+    async def events():
+        await asyncio.sleep(first_token_delay)
+        for i in range(n_tokens):
+            if i and TOKEN_DELAY:
+                await asyncio.sleep(TOKEN_DELAY)
+            yield _chunk(f"tok{i} ")
+        yield b"data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def main():
+    global TOKENS, FIRST_TOKEN_DELAY, TOKEN_DELAY, PREFILL_PER_1K
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--tokens", type=int, default=TOKENS)
+    parser.add_argument("--first-token-delay", type=float, default=FIRST_TOKEN_DELAY)
+    parser.add_argument("--token-delay", type=float, default=TOKEN_DELAY)
+    parser.add_argument(
+        "--prefill-per-1k", type=float, default=PREFILL_PER_1K,
+        help="extra first-token delay in seconds per 1k prompt tokens",
+    )
+    parser.add_argument("--ssl-keyfile")
+    parser.add_argument("--ssl-certfile")
+    parser.add_argument(
+        "--http2", action="store_true",
+        help="serve with hypercorn so TLS clients can negotiate HTTP/2 (requires hypercorn)",
+    )
+    args = parser.parse_args()
+
+    TOKENS, FIRST_TOKEN_DELAY, TOKEN_DELAY = args.tokens, args.first_token_delay, args.token_delay
+    PREFILL_PER_1K = args.prefill_per_1k
+
+    if args.http2:
+        from hypercorn.asyncio import serve
+        from hypercorn.config import Config
+
+        config = Config()
+        config.bind = [f"{args.host}:{args.port}"]
+        config.certfile = args.ssl_certfile
+        config.keyfile = args.ssl_keyfile
+        config.loglevel = "WARNING"
+        asyncio.run(serve(app, config))
+        return
+
+    import uvicorn
+    uvicorn.run(
+        app,
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+        ssl_keyfile=args.ssl_keyfile,
+        ssl_certfile=args.ssl_certfile,
+    )
+
+
+if __name__ == "__main__":
+    main()
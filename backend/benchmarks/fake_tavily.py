@@ -0,0 +1,85 @@
+"""
+Local stand-in for the Tavily search API.
+
+Answers POST /search with Tavily-shaped results after a configurable
+latency (plus optional jitter), and fails a configurable fraction of
+requests with HTTP 500 so error paths can be load-tested too. Point the app
+at it with TAVILY_SEARCH_URL=http://127.0.0.1:<port>/search.
+
+    python -m benchmarks.fake_tavily --port 8002 --latency 0.3 --results 3
+"""
+import argparse
+import asyncio
+import os
+import random
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+LATENCY = float(os.environ.get("FAKE_TAVILY_LATENCY", "0.3"))
+JITTER = float(os.environ.get("FAKE_TAVILY_JITTER", "0"))
+RESULTS = int(os.environ.get("FAKE_TAVILY_RESULTS", "3"))
+ERROR_RATE = float(os.environ.get("FAKE_TAVILY_ERROR_RATE", "0"))
+SNIPPET_CHARS = int(os.environ.get("FAKE_TAVILY_SNIPPET_CHARS", "400"))
+
+app = FastAPI()
+
+searches = {"count": 0, "errors": 0}
+
+
+@app.get("/stats")
+async def stats():
+    return searches
+
+
+@app.post("/stats/reset")
+async def reset_stats():
+    searches.update(count=0, errors=0)
+    return {"status": "success"}
+
+
+@app.post("/search")
+async def search(request: Request):
+    payload = await request.json()
+    searches["count"] += 1
+    await asyncio.sleep(max(0.0, LATENCY + random.uniform(-JITTER, JITTER)))
+    if ERROR_RATE and random.random() < ERROR_RATE:
+        searches["errors"] += 1
+        return JSONResponse({"detail": "stand-in failure"}, status_code=500)
+
+    query = payload.get("query", "")
+    snippet = (f"About {query}: " + "lorem ipsum " * SNIPPET_CHARS)[:SNIPPET_CHARS]
+    results = [
+        {
+            "title": f"Result {i} for {query}",
+            "content": snippet,
+            "url": f"https://example.com/{i}",
+            "published_date": "2024-01-01",
+        }
+        for i in range(min(RESULTS, payload.get("max_results") or RESULTS))
+    ]
+    return {"query": query, "results": results}
+
+
+def main():
+    global LATENCY, JITTER, RESULTS, ERROR_RATE, SNIPPET_CHARS
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds per search")
+    parser.add_argument("--jitter", type=float, default=JITTER, help="+/- seconds added to the latency")
+    parser.add_argument("--results", type=int, default=RESULTS)
+    parser.add_argument("--error-rate", type=float, default=ERROR_RATE, help="fraction of searches answered with 500")
+    parser.add_argument("--snippet-chars", type=int, default=SNIPPET_CHARS)
+    args = parser.parse_args()
+
+    LATENCY, JITTER, RESULTS = args.latency, args.jitter, args.results
+    ERROR_RATE, SNIPPET_CHARS = args.error_rate, args.snippet_chars
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
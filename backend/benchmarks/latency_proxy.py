@@ -0,0 +1,81 @@
+"""
+TCP proxy that adds a fixed one-way delay in each direction, to emulate a
+database (or any upstream) on a slower network path. Every round trip
+through it costs 2 x --delay on top of the real one; byte order is kept.
+
+The target is host:port, or a Unix socket path (e.g. a local Postgres
+socket, /tmp/pgdata/.s.PGSQL.5432).
+
+    python -m benchmarks.latency_proxy --port 6543 --target /tmp/pgdata/.s.PGSQL.5432 --delay 0.002
+"""
+import argparse
+import asyncio
+import time
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, delay: float) -> None:
+    # Reads are stamped on arrival and released in order once their delay has
+    # passed, so back-to-back packets are not delayed cumulatively
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def release():
+        while True:
+            due, data = await queue.get()
+            if data is None:
+                break
+            wait = due - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            writer.write(data)
+            await writer.drain()
+
+    sender = asyncio.ensure_future(release())
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            queue.put_nowait((time.monotonic() + delay, data))
+    finally:
+        queue.put_nowait((0.0, None))
+        try:
+            await sender
+        except (ConnectionError, OSError):
+            pass
+        writer.close()
+
+
+def serve(port: int, target: str, delay: float, host: str = "127.0.0.1"):
+    async def handle(client_reader, client_writer):
+        if target.startswith("/"):
+            upstream_reader, upstream_writer = await asyncio.open_unix_connection(target)
+        else:
+            target_host, target_port = target.rsplit(":", 1)
+            upstream_reader, upstream_writer = await asyncio.open_connection(target_host, int(target_port))
+        await asyncio.gather(
+            _pipe(client_reader, upstream_writer, delay),
+            _pipe(upstream_reader, client_writer, delay),
+            return_exceptions=True,
+        )
+
+    return asyncio.start_server(handle, host, port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--target", required=True, help="host:port or a Unix socket path")
+    parser.add_argument("--delay", type=float, default=0.001, help="seconds added in each direction")
+    args = parser.parse_args()
+
+    async def run():
+        server = await serve(args.port, args.target, args.delay, args.host)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Load test of one app worker against local stand-ins for every dependency.
+
+Starts benchmarks.fake_openrouter, benchmarks.fake_tavily and the real app
+(uvicorn, one worker), then, for each scenario and concurrency level, runs
+a closed loop: `concurrency` virtual users, each with its own account and
+chat, issue back-to-back requests for --duration seconds.
+
+Scenarios:
+    login          POST /auth/login (bcrypt verification, token issue)
+    stream         POST /chats/stream
+    agent_stream   POST /chats/agent/stream (unique questions: search and completion cache misses)
+    list_messages  GET /messages/ (first page of a chat seeded with --seed-messages)
+
+Per run it reports throughput, error rate (HTTP errors, transport errors
+and in-band stream errors), and p50/p95/p99 of TTFT (first body byte) and
+total latency. Output is JSON with the git commit and all parameters, so
+runs can be diffed across commits:
+
+    python -m benchmarks.loadtest --concurrency 10,50,100 --duration 20 --output before.json
+
+Uses DATABASE_URL (migrated to head first), or a throwaway cluster with
+--local-postgres (see benchmarks/postgres.py).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.common import bootstrap_chat, percentile, spawn, spawn_app, stop
+from benchmarks.postgres import local_postgres
+
+SCENARIOS = ("login", "stream", "agent_stream", "list_messages")
+
+# Streams answer 200 and report failures in the body
+STREAM_ERROR_MARKERS = (
+    "Error: ",
+    "Stream Error: ",
+    "An error occurred while fetching or summarizing search results.",
+    "couldn’t find any relevant results",
+)
+
+_question_ids = itertools.count()
+
+
+class Result:
+    __slots__ = ("ttft", "total", "error")
+
+    def __init__(self, ttft: float, total: float, error: Optional[str]):
+        self.ttft = ttft
+        self.total = total
+        self.error = error
+
+
+async def timed(client: httpx.AsyncClient, method: str, url: str, stream: bool = False, **kwargs) -> Result:
+    start = time.perf_counter()
+    ttft = None
+    body = []
+    try:
+        async with client.stream(method, url, **kwargs) as response:
+            async for chunk in response.aiter_bytes():
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                body.append(chunk)
+    except httpx.HTTPError as e:
+        now = time.perf_counter() - start
+        return Result(ttft or now, now, type(e).__name__)
+    total = time.perf_counter() - start
+    error = None
+    if response.status_code >= 400:
+        error = f"http_{response.status_code}"
+    elif stream:
+        text = b"".join(body).decode("utf-8", "replace")
+        if any(marker in text for marker in STREAM_ERROR_MARKERS):
+            error = "in_band"
+    return Result(ttft if ttft is not None else total, total, error)
+
+
+def scenario_request(name: str, client: httpx.AsyncClient, user: dict):
+    chat_id = user["chat"]["id"]
+    if name == "login":
+        return timed(client, "POST", "/auth/login", json=user["creds"])
+    if name == "stream":
+        return timed(
+            client, "POST", "/chats/stream", stream=True, headers=user["headers"],
+            json={"chat_id": chat_id, "message": "Tell me a story."},
+        )
+    if name == "agent_stream":
+        return timed(
+            client, "POST", "/chats/agent/stream", stream=True, headers=user["headers"],
+            json={"chat_id": chat_id, "message": f"What happened today? #{next(_question_ids)}"},
+        )
+    if name == "list_messages":
+        return timed(client, "GET", "/messages/", headers=user["headers"], params={"chat_id": chat_id, "limit": 50})
+    raise ValueError(f"unknown scenario {name!r}")
+
+
+async def seed_messages(client: httpx.AsyncClient, user: dict, count: int) -> None:
+    for i in range(count):
+        role = "user" if i % 2 == 0 else "assistant"
+        (await client.post(
+            "/messages/",
+            json={"chat_id": user["chat"]["id"], "role": role, "content": f"seed message {i} " * 8},
+            headers=user["headers"],
+        )).raise_for_status()
+
+
+async def run_level(client: httpx.AsyncClient, name: str, users: List[dict], duration: float) -> dict:
+    # One untimed request per user warms connections, caches and the tokenizer
+    await asyncio.gather(*(scenario_request(name, client, user) for user in users))
+
+    results: List[Result] = []
+    deadline = time.perf_counter() + duration
+
+    async def virtual_user(user: dict) -> None:
+        while time.perf_counter() < deadline:
+            results.append(await scenario_request(name, client, user))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(virtual_user(user) for user in users))
+    elapsed = time.perf_counter() - start
+    return summarize(results, elapsed)
+
+
+def summarize(results: List[Result], elapsed: float) -> dict:
+    errors: Dict[str, int] = {}
+    for result in results:
+        if result.error:
+            errors[result.error] = errors.get(result.error, 0) + 1
+    ok = [r for r in results if not r.error]
+    ttfts = sorted(r.ttft for r in ok)
+    totals = sorted(r.total for r in ok)
+    return {
+        "requests": len(results),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(sum(errors.values()) / len(results), 4) if results else 0.0,
+        "errors": errors,
+        "ttft_ms": {f"p{p}": round(percentile(ttfts, p) * 1000, 1) for p in (50, 95, 99)},
+        "total_ms": {f"p{p}": round(percentile(totals, p) * 1000, 1) for p in (50, 95, 99)},
+    }
+
+
+async def run(base_url: str, scenarios: List[str], levels: List[int], args) -> dict:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        users = await asyncio.gather(*(bootstrap_chat(client) for _ in range(max(levels))))
+        if "list_messages" in scenarios:
+            await asyncio.gather(*(seed_messages(client, user, args.seed_messages) for user in users))
+
+        results = {}
+        for name in scenarios:
+            results[name] = {}
+            for level in levels:
+                results[name][str(level)] = await run_level(client, name, users[:level], args.duration)
+                print(f"{name} @ {level}: {json.dumps(results[name][str(level)])}", file=sys.stderr)
+        return results
+
+
+def git_revision() -> dict:
+    def git(*cmd):
+        try:
+            return subprocess.run(["git", *cmd], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed-loop load test of one app worker")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="10,50", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario and level")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout per request")
+    parser.add_argument("--seed-messages", type=int, default=100, help="messages per chat for list_messages")
+    parser.add_argument("--tokens", type=int, default=50, help="tokens per fake completion")
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--search-error-rate", type=float, default=0.0)
+    parser.add_argument("--bcrypt-rounds", type=int, default=None, help="override BCRYPT_ROUNDS for the app")
+    parser.add_argument("--local-postgres", action="store_true", help="run against a throwaway local cluster")
+    parser.add_argument("--app-port", type=int, default=8130)
+    parser.add_argument("--upstream-port", type=int, default=8131)
+    parser.add_argument("--tavily-port", type=int, default=8132)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    for name in scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    upstream = spawn(
+        ["-m", "benchmarks.fake_openrouter", "--port", str(args.upstream_port),
+         "--tokens", str(args.tokens), "--first-token-delay", str(args.first_token_delay),
+         "--token-delay", str(args.token_delay)],
+        args.upstream_port,
+    )
+    search = spawn(
+        ["-m", "benchmarks.fake_tavily", "--port", str(args.tavily_port),
+         "--latency", str(args.search_latency), "--error-rate", str(args.search_error_rate)],
+        args.tavily_port,
+    )
+    try:
+        with local_postgres(None if args.local_postgres else _database_url(parser)) as database_url:
+            env = {
+                "DATABASE_URL": database_url,
+                "OPENROUTER_BASE_URL": f"http://127.0.0.1:{args.upstream_port}/api/v1",
+                "OPENROUTER_HTTP2": "false",
+                "TAVILY_SEARCH_URL": f"http://127.0.0.1:{args.tavily_port}/search",
+                # Enough connections for the highest level; pool waits are not under test
+                "DB_POOL_SIZE": str(max(5, min(max(levels), 50))),
+            }
+            if args.bcrypt_rounds is not None:
+                env["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+            app = spawn_app(args.app_port, env)
+            try:
+                results = asyncio.run(run(f"http://127.0.0.1:{args.app_port}", scenarios, levels, args))
+            finally:
+                stop(app)
+    finally:
+        stop(upstream, search)
+
+    report = {
+        "meta": {
+            **git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {k: v for k, v in vars(args).items() if k != "output"},
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def _database_url(parser: argparse.ArgumentParser) -> str:
+    url = os.environ.get("DATABASE_URL")
+    if not url:
+        parser.error("set DATABASE_URL or pass --local-postgres")
+    return url
+
+
+if __name__ == "__main__":
+    main()
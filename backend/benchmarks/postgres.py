@@ -0,0 +1,80 @@
+"""
+Throwaway local Postgres for benchmarks.
+
+local_postgres() runs initdb into a temporary directory, starts the server
+on a private port with its socket in that directory, creates the database,
+migrates it to head with Alembic and yields an asyncpg DATABASE_URL. The
+cluster is stopped and deleted afterwards. Needs the Postgres server
+binaries (initdb, pg_ctl) on PATH or in $PG_BIN, and a non-root user.
+
+Given an existing URL, it only runs the migrations and yields it back.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _binary(name: str) -> str:
+    pg_bin = os.environ.get("PG_BIN")
+    path = os.path.join(pg_bin, name) if pg_bin else shutil.which(name)
+    if not path or not os.path.exists(path):
+        raise RuntimeError(f"{name} not found; install the Postgres server or set PG_BIN")
+    return path
+
+
+def migrate(database_url: str) -> None:
+    """alembic upgrade head against `database_url`."""
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "DATABASE_URL": database_url},
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+@contextmanager
+def local_postgres(
+    database_url: Optional[str] = None,
+    port: int = 55432,
+    database: str = "aibot_bench",
+) -> Iterator[str]:
+    if database_url:
+        migrate(database_url)
+        yield database_url
+        return
+
+    data_dir = tempfile.mkdtemp(prefix="aibot-bench-pg-")
+    pg_ctl = _binary("pg_ctl")
+    try:
+        subprocess.run(
+            [_binary("initdb"), "-D", data_dir, "-U", "postgres", "--auth=trust", "-E", "UTF8"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        # Unix socket only, tuned for throwaway data: durability is not under test
+        options = f"-p {port} -k {data_dir} -c listen_addresses='' -c fsync=off -c max_connections=500"
+        subprocess.run(
+            [pg_ctl, "-D", data_dir, "-o", options, "-l", os.path.join(data_dir, "server.log"), "-w", "start"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            subprocess.run(
+                [_binary("createdb"), "-h", data_dir, "-p", str(port), "-U", "postgres", database],
+                check=True,
+            )
+            url = f"postgresql+asyncpg://postgres@/{database}?host={data_dir}&port={port}"
+            migrate(url)
+            yield url
+        finally:
+            subprocess.run([pg_ctl, "-D", data_dir, "-m", "fast", "-w", "stop"], stdout=subprocess.DEVNULL)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
@@ -1,73 +1,186 @@
 import os
-import requests
+import asyncio
+import httpx
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
+TAVILY_SEARCH_URL = "https://api.tavily.com/search"
+
 class TavilySearchException(Exception):
     pass
 
-def search(query: str, max_results: int = 5, api_key: str = None) -> List[Dict[str, Any]]:
+class TavilyConfigError(TavilySearchException):
+    pass
+
+class TavilyTimeoutError(TavilySearchException):
+    pass
+
+class TavilyNetworkError(TavilySearchException):
+    pass
+
+class TavilyHTTPError(TavilySearchException):
+    def __init__(self, status_code: int, detail: str = ""):
+        self.status_code = status_code
+        super().__init__(f"API Error: {status_code} - {detail}")
+
+# Pooled client + concurrency limit shared by every async_search() on this loop.
+# Opened/closed from the FastAPI lifespan; created lazily with defaults otherwise.
+_client: Optional[httpx.AsyncClient] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_acquire_timeout: Optional[float] = None
+_search_url: str = TAVILY_SEARCH_URL
+
+
+def _build_client(max_connections: int = 20, timeout: float = 10.0) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+        timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+        headers={"Content-Type": "application/json"},
+    )
+
+
+async def open_client(
+    max_connections: int = 20,
+    max_concurrency: int = 10,
+    timeout: float = 10.0,
+    acquire_timeout: Optional[float] = None,
+    search_url: str = TAVILY_SEARCH_URL,
+) -> None:
     """
-    Search the web using Tavily API.
-    
+    Creates the shared pooled client.
+
     Args:
-        query: Search query string
-        max_results: Number of results to return
-        api_key: Optional API key override
-        
-    Returns:
-        List of dicts with keys: title, snippet, url, etc.
+        max_connections: Connection pool size
+        max_concurrency: Max in-flight searches; extra callers wait for a slot
+        timeout: Per-request timeout in seconds
+        acquire_timeout: Max seconds to wait for a slot (None waits forever)
+        search_url: Search endpoint (point it at a local stand-in for benchmarks)
     """
+    global _client, _semaphore, _acquire_timeout, _search_url
+    await close_client()
+    _client = _build_client(max_connections, timeout)
+    _semaphore = asyncio.Semaphore(max_concurrency)
+    _acquire_timeout = acquire_timeout
+    _search_url = search_url
+
+
+async def close_client() -> None:
+    global _client, _semaphore
+    if _client is not None:
+        client, _client = _client, None
+        _semaphore = None
+        await client.aclose()
+
+
+def _build_payload(query: str, max_results: int, api_key: Optional[str], search_depth: str) -> Dict[str, Any]:
     if not api_key:
         api_key = os.environ.get("TAVILY_API_KEY")
 
     if not api_key:
-        raise TavilySearchException("TAVILY_API_KEY not set")
+        raise TavilyConfigError("TAVILY_API_KEY not set")
 
-    url = "https://api.tavily.com/search"
-    headers = {
-        "Content-Type": "application/json"
-    }
-    payload = {
+    return {
         "api_key": api_key,
         "query": query,
-        "search_depth": "basic",
+        "search_depth": search_depth,
         "max_results": max_results,
         "include_answer": False,
         "include_raw_content": False,
         "include_images": False,
     }
-    
+
+
+def _parse_results(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Tavily returns { "results": [ { "title": ..., "content": ..., "url": ..., "published_date": ... } ] }
+    results = []
+    for item in data.get("results", []):
+        results.append({
+            "title": item.get("title", "No Title"),
+            "snippet": item.get("content", ""),
+            "url": item.get("url", ""),
+            "date": item.get("published_date")
+        })
+    return results
+
+
+async def _post(client: httpx.AsyncClient, payload: Dict[str, Any], url: str = TAVILY_SEARCH_URL) -> List[Dict[str, Any]]:
+    try:
+        response = await client.post(url, json=payload)
+    except httpx.TimeoutException as e:
+        raise TavilyTimeoutError(f"Timeout: {str(e)}") from e
+    except httpx.HTTPError as e:
+        raise TavilyNetworkError(f"Network Error: {str(e)}") from e
+
+    if response.status_code != 200:
+        raise TavilyHTTPError(response.status_code, response.text)
+
     try:
-        # logger.debug(f"Tavily Search Query: {query}")
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
-        
-        # logger.debug(f"Tavily Status Code: {response.status_code}")
-        if response.status_code != 200:
-             raise TavilySearchException(f"API Error: {response.status_code} - {response.text}")
-             
-        data = response.json()
-        items = data.get("results", [])
-        # logger.debug(f"Tavily Found {len(items)} results")
-        
-        results = []
-        
-        # Tavily returns { "results": [ { "title": ..., "content": ..., "url": ..., "published_date": ... } ] }
-        items = data.get("results", [])
-        
-        for item in items:
-            results.append({
-                "title": item.get("title", "No Title"),
-                "snippet": item.get("content", ""),
-                "url": item.get("url", ""),
-                "date": item.get("published_date") 
-            })
-            
-        return results
-
-    except requests.RequestException as e:
-        raise TavilySearchException(f"Network Error: {str(e)}")
+        return _parse_results(response.json())
     except Exception as e:
-        raise TavilySearchException(f"Unexpected Error: {str(e)}")
+        raise TavilySearchException(f"Unexpected Error: {str(e)}") from e
+
+
+async def async_search(
+    query: str,
+    max_results: int = 5,
+    api_key: str = None,
+    search_depth: str = "basic",
+) -> List[Dict[str, Any]]:
+    """
+    Search the web using Tavily API over the shared pooled client.
+
+    Args:
+        query: Search query string
+        max_results: Number of results to return
+        api_key: Optional API key override
+        search_depth: "basic" or "advanced"
+
+    Returns:
+        List of dicts with keys: title, snippet, url, date
+
+    Raises:
+        TavilySearchException (or one of its subclasses) on any failure.
+    """
+    payload = _build_payload(query, max_results, api_key, search_depth)
+
+    if _client is None:
+        logger.warning("Tavily client used before startup; creating it lazily")
+        await open_client()
+    client, semaphore, url = _client, _semaphore, _search_url
+
+    acquired = False
+    try:
+        if _acquire_timeout is None:
+            await semaphore.acquire()
+        else:
+            # Cancels the acquire itself (no wrapper task), so a permit granted
+            # as the deadline fires is either held here or handed back
+            try:
+                async with asyncio.timeout(_acquire_timeout):
+                    await semaphore.acquire()
+            except TimeoutError as e:
+                raise TavilyTimeoutError("Timed out waiting for a free search slot") from e
+        acquired = True
+        return await _post(client, payload, url)
+    finally:
+        if acquired:
+            semaphore.release()
+
+
+def search(query: str, max_results: int = 5, api_key: str = None, search_depth: str = "basic") -> List[Dict[str, Any]]:
+    """
+    Blocking wrapper around the async client, for scripts.
+    Must not be called from inside a running event loop.
+    """
+    payload = _build_payload(query, max_results, api_key, search_depth)
+
+    async def _run():
+        async with _build_client() as client:
+            return await _post(client, payload)
+
+    return asyncio.run(_run())